@@ -2,6 +2,8 @@ import datetime
 from zoneinfo import ZoneInfo
 from google.adk.agents import Agent
 
+from .business_tools import get_expense_breakdown, get_profit, get_sales_summary, get_top_products
+
 def get_weather(city: str) -> dict:
     """Retrieves the current weather report for a specified city.
 
@@ -55,13 +57,23 @@ def get_current_time(city: str) -> dict:
 
 
 root_agent = Agent(
-    name="weather_time_agent",
+    name="business_agent",
     model="gemini-2.0-flash",
     description=(
-        "Agent to answer questions about the time and weather in a city."
+        "Agent to answer questions about the business's sales, expenses and profit,"
+        " and about the time and weather in a city."
     ),
     instruction=(
-        "You are a helpful agent who can answer user questions about the time and weather in a city."
+        "You are a helpful agent who can answer user questions about the business's sales,"
+        " best-selling products, expenses and profit, and about the time and weather in a city."
+        " Always use the tools for business figures and quote the amounts they return."
     ),
-    tools=[get_weather, get_current_time],
+    tools=[
+        get_sales_summary,
+        get_top_products,
+        get_expense_breakdown,
+        get_profit,
+        get_weather,
+        get_current_time,
+    ],
 )
\ No newline at end of file
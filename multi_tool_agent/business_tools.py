@@ -0,0 +1,229 @@
+"""Business analytics tools backed by the web app's cached aggregates.
+
+The tools answer from the same layers as the dashboard and the Laba Rugi
+page: ``get_dashboard`` (computed once per data version and shared through
+the aggregate store) and ``get_laba_rugi`` (grouped SQL over an indexed date
+range, cached per data version). A chat turn therefore reuses results the
+app already computed instead of scanning the ledgers. The agent runs in
+its own process, so a cached result is only reused while the shared data
+versions (``cache.py``) show no write since it was computed; with shared
+versions turned off the tools skip the caches. The agent works for the web
+app's default business (``DEFAULT_TENANT_ID``).
+"""
+
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+# The web app package lives in ui_app/, next to this package.
+_UI_APP_DIR = Path(__file__).resolve().parent.parent / "ui_app"
+if str(_UI_APP_DIR) not in sys.path:
+    sys.path.insert(0, str(_UI_APP_DIR))
+
+from ui_app.backend.analytics import PERIOD_DAYS, get_dashboard, get_product_ids  # noqa: E402
+from ui_app.backend.cache import note_remote_change, shared_versions_enabled  # noqa: E402
+from ui_app.backend.money import format_rupiah  # noqa: E402
+from ui_app.backend.reports import get_laba_rugi  # noqa: E402
+from ui_app.backend.tenant import DEFAULT_TENANT_ID, use_tenant  # noqa: E402
+
+ALL_PRODUCTS = "All Products"
+MAX_TOP_PRODUCTS = 20
+
+# Tables the tools' cached results depend on
+_SOURCE_TABLES = ("penjualan", "belanja", "produk", "kategori_pengeluaran", "arsip")
+
+# Period labels as returned by get_laba_rugi
+_LABEL_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+_PERIOD_NAMES = {"day": "today", "month": "this month", "year": "this year"}
+
+
+def _period_error(period: str, allowed) -> dict:
+    return {
+        "status": "error",
+        "error_message": f"Unknown period '{period}'. Use one of: {', '.join(allowed)}.",
+    }
+
+
+def _skip_stale_caches():
+    """Without shared versions this process cannot see the web app's writes, so recompute."""
+    if not shared_versions_enabled():
+        note_remote_change(*_SOURCE_TABLES)
+
+
+def _sales_metrics(period: str, product: str) -> dict:
+    with use_tenant(DEFAULT_TENANT_ID):
+        _skip_stale_caches()
+        if product != ALL_PRODUCTS and product not in get_product_ids():
+            raise LookupError(f"There is no product named '{product}'.")
+        return get_dashboard(product, period)
+
+
+def get_sales_summary(period: str = "Last 30 Days", product: str = ALL_PRODUCTS) -> dict:
+    """Summarizes revenue, orders, average order value and items sold for a period.
+
+    Args:
+        period (str): "Last 7 Days", "Last 30 Days", "Last 90 Days" or "All Time".
+        product (str): A product name, or "All Products".
+
+    Returns:
+        dict: status and result or error msg.
+    """
+    if period not in PERIOD_DAYS:
+        return _period_error(period, PERIOD_DAYS)
+    try:
+        metrics = _sales_metrics(period, product)
+    except LookupError as e:
+        return {"status": "error", "error_message": str(e)}
+    except Exception as e:
+        print(f"Error getting sales summary: {e}")
+        return {"status": "error", "error_message": "Sales data is not available right now."}
+
+    window = metrics["growth_window"]["days"]
+    report = (
+        f"{product}, {period.lower()}: revenue {format_rupiah(metrics['total_revenue'])} from "
+        f"{metrics['total_orders']} orders ({metrics['items_sold']} items), average order "
+        f"{format_rupiah(metrics['average_order_value'])}. Revenue over the last {window} days "
+        f"changed {metrics['revenue_growth']:+.1f}% and orders {metrics['orders_growth']:+.1f}% "
+        f"compared with the {window} days before."
+    )
+    return {
+        "status": "success",
+        "report": report,
+        "revenue": format_rupiah(metrics["total_revenue"]),
+        "orders": metrics["total_orders"],
+        "items_sold": metrics["items_sold"],
+        "average_order_value": format_rupiah(metrics["average_order_value"]),
+        "revenue_growth_percent": round(metrics["revenue_growth"], 1),
+        "orders_growth_percent": round(metrics["orders_growth"], 1),
+    }
+
+
+def get_top_products(n: int = 5, period: str = "Last 30 Days") -> dict:
+    """Lists the best-selling products by revenue for a period.
+
+    Args:
+        n (int): How many products to list (1 to 20).
+        period (str): "Last 7 Days", "Last 30 Days", "Last 90 Days" or "All Time".
+
+    Returns:
+        dict: status and result or error msg.
+    """
+    if period not in PERIOD_DAYS:
+        return _period_error(period, PERIOD_DAYS)
+    n = max(1, min(int(n), MAX_TOP_PRODUCTS))
+    try:
+        metrics = _sales_metrics(period, ALL_PRODUCTS)
+    except Exception as e:
+        print(f"Error getting top products: {e}")
+        return {"status": "error", "error_message": "Sales data is not available right now."}
+
+    ranked = sorted(metrics["product_sales_data"], key=lambda entry: entry["revenue"], reverse=True)[:n]
+    if not ranked:
+        return {"status": "success", "report": f"No sales in the {period.lower()}.", "products": []}
+    products = [
+        {"product": entry["product"], "revenue": format_rupiah(entry["revenue"]), "quantity": entry["quantity"]}
+        for entry in ranked
+    ]
+    lines = [
+        f"{i}. {entry['product']}: {entry['revenue']} ({entry['quantity']} sold)"
+        for i, entry in enumerate(products, start=1)
+    ]
+    return {
+        "status": "success",
+        "report": f"Top {len(products)} products by revenue, {period.lower()}:\n" + "\n".join(lines),
+        "products": products,
+    }
+
+
+def _previous_start(period: str, today: date) -> date:
+    """First day of the period before the one that contains today."""
+    if period == "day":
+        return today - timedelta(days=1)
+    if period == "month":
+        return (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+    return date(today.year - 1, 1, 1)
+
+
+def _laba_rugi_by_label(period: str, today: date) -> dict:
+    with use_tenant(DEFAULT_TENANT_ID):
+        _skip_stale_caches()
+        rows = get_laba_rugi(period, _previous_start(period, today), today)
+    return {row.periode: row for row in rows}
+
+
+def get_expense_breakdown(period: str = "month") -> dict:
+    """Breaks down expenses by category for the current day, month or year.
+
+    Args:
+        period (str): "day", "month" or "year".
+
+    Returns:
+        dict: status and result or error msg.
+    """
+    if period not in _LABEL_FORMATS:
+        return _period_error(period, _LABEL_FORMATS)
+    today = date.today()
+    try:
+        current = _laba_rugi_by_label(period, today).get(today.strftime(_LABEL_FORMATS[period]))
+    except Exception as e:
+        print(f"Error getting expense breakdown: {e}")
+        return {"status": "error", "error_message": "Expense data is not available right now."}
+
+    name = _PERIOD_NAMES[period]
+    if current is None or not current.pengeluaran:
+        return {"status": "success", "report": f"No expenses recorded {name}.", "categories": []}
+    categories = sorted(current.pengeluaran_per_kategori.items(), key=lambda item: -item[1])
+    lines = [
+        f"- {kategori}: {format_rupiah(amount)} ({amount / current.pengeluaran * 100:.0f}%)"
+        for kategori, amount in categories
+    ]
+    return {
+        "status": "success",
+        "report": f"Expenses {name}: {format_rupiah(current.pengeluaran)}\n" + "\n".join(lines),
+        "total": format_rupiah(current.pengeluaran),
+        "categories": [
+            {"category": kategori, "amount": format_rupiah(amount)} for kategori, amount in categories
+        ],
+    }
+
+
+def get_profit(period: str = "month") -> dict:
+    """Reports revenue, expenses and net profit for the current day, month or year, with the previous one.
+
+    Args:
+        period (str): "day", "month" or "year".
+
+    Returns:
+        dict: status and result or error msg.
+    """
+    if period not in _LABEL_FORMATS:
+        return _period_error(period, _LABEL_FORMATS)
+    today = date.today()
+    label_format = _LABEL_FORMATS[period]
+    try:
+        by_label = _laba_rugi_by_label(period, today)
+    except Exception as e:
+        print(f"Error getting profit: {e}")
+        return {"status": "error", "error_message": "Profit data is not available right now."}
+
+    def totals(label: str) -> dict:
+        row = by_label.get(label)
+        return {
+            "revenue": row.pendapatan if row else 0,
+            "expenses": row.pengeluaran if row else 0,
+            "net_profit": row.laba_bersih if row else 0,
+        }
+
+    current = totals(today.strftime(label_format))
+    previous = totals(_previous_start(period, today).strftime(label_format))
+    report = (
+        f"{_PERIOD_NAMES[period].capitalize()}: revenue {format_rupiah(current['revenue'])}, expenses "
+        f"{format_rupiah(current['expenses'])}, net profit {format_rupiah(current['net_profit'])}. "
+        f"Previous {period}: net profit {format_rupiah(previous['net_profit'])}."
+    )
+    return {
+        "status": "success",
+        "report": report,
+        "current": {key: format_rupiah(value) for key, value in current.items()},
+        "previous": {key: format_rupiah(value) for key, value in previous.items()},
+    }
@@ -0,0 +1,122 @@
+"""Benchmark the vectorized dashboard kernels against the old Python loops.
+
+Run from the ``ui_app`` directory:
+
+    python -m benchmarks.analytics_bench [rows ...]
+
+Both implementations compute the same dashboard (totals, daily revenue,
+per-product sales, top 5 and growth) over synthetic sales.
+"""
+
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from ui_app.backend.analytics import SalesColumns, compute_dashboard
+from ui_app.backend.database import Penjualan
+
+PRODUCTS = 40
+DAYS = 730
+
+
+def make_columns(rows: int, seed: int = 0) -> SalesColumns:
+    rng = np.random.default_rng(seed)
+    today = date.today().toordinal()
+    dates = np.sort(rng.integers(today - DAYS, today + 1, rows)).astype(np.int32)
+    quantities = rng.integers(1, 20, rows).astype(np.int64)
+    prices = rng.integers(5, 500, rows).astype(np.int64) * 100_000  # Rp 500 - 50.000 in cents
+    return SalesColumns(
+        dates=dates,
+        products=rng.integers(0, PRODUCTS, rows).astype(np.int32),
+        quantities=quantities,
+        totals=quantities * prices,
+        product_names=[f"Produk {i}" for i in range(PRODUCTS)],
+        product_ids=list(range(1, PRODUCTS + 1)),
+        last_id=rows,
+    )
+
+
+def make_models(cols: SalesColumns):
+    return [
+        Penjualan(
+            id_penjualan=i,
+            id_produk=int(cols.products[i]),
+            nama_produk=cols.product_names[cols.products[i]],
+            kuantitas=int(cols.quantities[i]),
+            harga_saat_penjualan=0,
+            total=int(cols.totals[i]),
+            catatan="",
+            tanggal_penjualan=date.fromordinal(int(cols.dates[i])).isoformat(),
+        )
+        for i in range(len(cols))
+    ]
+
+
+def legacy_dashboard(sales, selected_product: str, days: int):
+    """The loop-based computation the dashboard state used before."""
+    data = sales
+    if selected_product != "All Products":
+        data = [sale for sale in data if sale.nama_produk == selected_product]
+    if days > 0:
+        cutoff = date.today() - timedelta(days=days)
+        data = [sale for sale in data if date.fromisoformat(sale.tanggal_penjualan) >= cutoff]
+
+    total_revenue = sum(sale.total for sale in data)
+    items_sold = sum(sale.kuantitas for sale in data)
+
+    window = days if days > 0 else 30
+    current_cutoff = date.today() - timedelta(days=window)
+    previous_cutoff = date.today() - timedelta(days=window * 2)
+    current = [s for s in sales if date.fromisoformat(s.tanggal_penjualan) >= current_cutoff]
+    previous = [
+        s for s in sales
+        if previous_cutoff <= date.fromisoformat(s.tanggal_penjualan) < current_cutoff
+    ]
+    if selected_product != "All Products":
+        current = [s for s in current if s.nama_produk == selected_product]
+        previous = [s for s in previous if s.nama_produk == selected_product]
+    revenue_pair = (sum(s.total for s in current), sum(s.total for s in previous))
+
+    daily = {}
+    for sale in data:
+        daily[sale.tanggal_penjualan] = daily.get(sale.tanggal_penjualan, 0) + sale.total
+    products = {}
+    for sale in data:
+        entry = products.setdefault(sale.nama_produk, {"revenue": 0, "quantity": 0})
+        entry["revenue"] += sale.total
+        entry["quantity"] += sale.kuantitas
+    top = sorted(products.items(), key=lambda item: item[1]["revenue"], reverse=True)[:5]
+    return total_revenue, items_sold, revenue_pair, sorted(daily.items()), top
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'filter':>14} {'loops (ms)':>12} {'numpy (ms)':>12} {'speedup':>9}")
+    for rows in sizes:
+        cols = make_columns(rows)
+        models = make_models(cols)
+        for product, period, days in (
+            ("All Products", "All Time", 0),
+            ("Produk 3", "Last 30 Days", 30),
+        ):
+            loops = timed(lambda: legacy_dashboard(models, product, days))
+            vectorized = timed(lambda: compute_dashboard(cols, product, period))
+            label = "all" if days == 0 else f"1 prod/{days}d"
+            print(
+                f"{rows:>10} {label:>14} {loops * 1000:>12.2f} "
+                f"{vectorized * 1000:>12.2f} {loops / vectorized:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 500_000])
@@ -0,0 +1,82 @@
+"""Measure how long importing the app takes, with a ``-X importtime`` breakdown.
+
+Run from the ``ui_app`` directory:
+
+    python -m benchmarks.startup_bench [budget_ms]
+
+Every backend worker imports ``ui_app.ui_app`` before serving, so this is the
+floor for a worker (re)start. The import runs in fresh interpreters; the
+fastest run is compared against the budget (default ``BUDGET_MS``), and the
+breakdown shows where the time goes by top-level package and for the app's
+own modules. The import must not connect to or create the database engine.
+Exits with status 1 when over budget or when the engine was created.
+"""
+
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BUDGET_MS = 1500
+RUNS = 3
+TOP = 15
+
+APP_DIR = Path(__file__).resolve().parents[1]
+PROBE = (
+    "import ui_app.ui_app\n"
+    "from ui_app.backend import database\n"
+    "print('engine-created' if database._engine is not None else 'engine-deferred')\n"
+)
+
+
+def run_import() -> Tuple[float, str, List[Tuple[str, int, int]]]:
+    """Import the app in a new interpreter; (wall seconds, probe output, [(module, self us, cumulative us)])."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - start
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    lines = result.stdout.strip().splitlines()
+    return wall, lines[-1] if lines else "", modules
+
+
+def main(budget_ms: float):
+    runs = [run_import() for _ in range(RUNS)]
+    wall, probe, modules = min(runs, key=lambda run: run[0])
+    cumulative = {name: total for name, _, total in modules}
+    app_ms = cumulative.get("ui_app.ui_app", 0) / 1000
+
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in modules:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"{'package':<24} {'self (ms)':>10}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:TOP]:
+        print(f"{package:<24} {self_us / 1000:>10.1f}")
+
+    print(f"\n{'app module':<40} {'self (ms)':>10} {'cumul. (ms)':>12}")
+    own = [module for module in modules if module[0].startswith("ui_app")]
+    for name, self_us, total_us in sorted(own, key=lambda module: module[1], reverse=True)[:TOP]:
+        print(f"{name:<40} {self_us / 1000:>10.1f} {total_us / 1000:>12.1f}")
+
+    print(f"\nimport ui_app.ui_app: {app_ms:.0f} ms (budget {budget_ms:.0f} ms), "
+          f"interpreter total {wall * 1000:.0f} ms, best of {RUNS}")
+    print(f"database engine: {probe.replace('engine-', '') or 'unknown'}")
+
+    failed = app_ms > budget_ms or probe != "engine-deferred"
+    if failed:
+        print("FAIL")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS)
@@ -0,0 +1,116 @@
+"""Aggregate results shared by every browser session.
+
+Dashboard states ask the store for small result payloads (totals, chart
+points, top products) instead of computing them per session. A result is
+computed once per data version of its source tables and reused by every
+session until one of those tables changes.
+
+By default results live in this process. With ``AGGREGATE_STORE_URL`` set
+to a ``redis://`` URL (and the optional ``redis`` package installed),
+results are stored in Redis as JSON and shared by every backend worker;
+the shared table versions (``cache.py``) are then counted in Redis, so a
+write in one worker invalidates the results of all of them. Payloads must therefore be
+JSON-serializable. Results and versions are kept per tenant.
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from .cache import VersionedCache, set_version_store, shared_version
+from .metrics import record_cache
+from .tenant import current_tenant
+
+AGGREGATE_STORE_URL = os.getenv("AGGREGATE_STORE_URL", "")
+AGGREGATE_TTL_SECONDS = int(os.getenv("AGGREGATE_TTL_SECONDS", "3600"))
+
+_PREFIX = "aggregates"
+
+
+class LocalAggregateStore:
+    """In-process store: one ``VersionedCache`` per result name."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._caches: Dict[str, VersionedCache] = {}
+
+    def get_or_compute(
+        self, name: str, key: Hashable, tables: Tuple[str, ...], compute: Callable[[], Any]
+    ) -> Any:
+        cache = self._caches.get(name)
+        if cache is None:
+            cache = self._caches.setdefault(
+                name, VersionedCache(f"aggregate_{name}", tables, self.max_entries)
+            )
+        return cache.get_or_compute(key, compute)
+
+
+class RedisVersionStore:
+    """Shared table versions in one Redis hash per tenant, read on every lookup."""
+
+    refresh_seconds = 0.0
+
+    def __init__(self, client):
+        self.client = client
+
+    def fetch(self, tenant: int) -> Dict[str, int]:
+        return {
+            table.decode(): int(version)
+            for table, version in self.client.hgetall(f"{_PREFIX}:versions:{tenant}").items()
+        }
+
+    def increment(self, tenant: int, tables: Tuple[str, ...]):
+        pipe = self.client.pipeline()
+        for table in tables:
+            pipe.hincrby(f"{_PREFIX}:versions:{tenant}", table, 1)
+        pipe.execute()
+
+
+class RedisAggregateStore:
+    """Store shared by backend workers through Redis.
+
+    Results are keyed by the shared versions of their tables and expire
+    after ``AGGREGATE_TTL_SECONDS``, so results for old versions clean up
+    after themselves.
+    """
+
+    def __init__(self, url: str, ttl: int = AGGREGATE_TTL_SECONDS):
+        import redis  # optional dependency
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        set_version_store(RedisVersionStore(self.client))
+
+    def get_or_compute(
+        self, name: str, key: Hashable, tables: Tuple[str, ...], compute: Callable[[], Any]
+    ) -> Any:
+        tenant = current_tenant()
+        try:
+            versions = shared_version(*tables)
+            redis_key = f"{_PREFIX}:{tenant}:{name}:{json.dumps([key, versions], default=str)}"
+            payload = self.client.get(redis_key)
+        except Exception as e:
+            print(f"Error reading aggregate store: {e}")
+            return compute()
+        if payload is not None:
+            record_cache(f"aggregate_{name}", True)
+            return json.loads(payload)
+        record_cache(f"aggregate_{name}", False)
+        value = compute()
+        try:
+            self.client.set(redis_key, json.dumps(value), ex=self.ttl)
+        except Exception as e:
+            print(f"Error writing aggregate store: {e}")
+        return value
+
+
+def _create_store():
+    if AGGREGATE_STORE_URL.startswith(("redis://", "rediss://")):
+        try:
+            return RedisAggregateStore(AGGREGATE_STORE_URL)
+        except ImportError as e:
+            print(f"Redis aggregate store is not available ({e}), using the in-process store")
+    return LocalAggregateStore()
+
+
+aggregate_store = _create_store()
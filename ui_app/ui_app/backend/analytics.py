@@ -0,0 +1,491 @@
+"""Vectorized sales analytics over columnar NumPy arrays.
+
+Sales are loaded into parallel arrays (date ordinals, product codes,
+quantities, totals in cents and order counts), sorted by date. Years moved
+to the cold archive (``archive.py``) are loaded from their daily rollups in
+``arsip_ringkasan``, one entry per day and product, so "All Time" and the
+forecasts built on these arrays still cover them. After new sales only the
+rows added since are read and appended; products changing or an archive
+run reloads everything. Dashboard
+metrics are computed from these arrays with masks, ``np.add.reduceat``,
+``np.bincount`` and ``np.argpartition`` instead of Python loops over model
+objects. ``get_dashboard`` shares the results of one filter selection
+between all sessions of a tenant through the aggregate store.
+"""
+
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, literal, select
+
+from .aggregate_store import aggregate_store
+from .cache import VersionedCache
+from .database import ArsipRingkasanDB, PenjualanDB, ProdukDB, ReadSessionLocal
+from .money import cents_column, divide_cents
+from .tenant import current_tenant
+
+# Colors assigned to products in charts, in product order.
+PRODUCT_COLORS = [
+    "#3b82f6",  # Blue
+    "#10b981",  # Emerald
+    "#f59e0b",  # Amber
+    "#ef4444",  # Red
+    "#8b5cf6",  # Violet
+    "#06b6d4",  # Cyan
+    "#f97316",  # Orange
+    "#84cc16",  # Lime
+    "#ec4899",  # Pink
+    "#6366f1",  # Indigo
+    "#14b8a6",  # Teal
+    "#f43f5e",  # Rose
+]
+
+PERIOD_DAYS = {
+    "All Time": 0,
+    "Last 7 Days": 7,
+    "Last 30 Days": 30,
+    "Last 90 Days": 90,
+}
+
+# One entry per tenant
+_columns_cache = VersionedCache("sales_columns", ("penjualan", "produk", "arsip"), max_entries=32)
+
+
+class SalesColumns:
+    """Sales as parallel arrays sorted by date.
+
+    An entry is one sale, or the daily rollup of one product's archived
+    sales, which counts as ``orders`` sales.
+
+    Attributes:
+        dates: ``date.toordinal()`` of each entry (int32).
+        products: Index into ``product_names`` of each entry (int32).
+        quantities: Units sold (int64).
+        totals: Total in cents (int64).
+        orders: Sales per entry, 1 unless archived (int64).
+        product_names: Product name per product code.
+        product_ids: ``id_produk`` per product code.
+        last_id: Highest ``id_penjualan`` loaded.
+        archived: Number of archived rollup entries.
+    """
+
+    def __init__(
+        self,
+        dates: np.ndarray,
+        products: np.ndarray,
+        quantities: np.ndarray,
+        totals: np.ndarray,
+        product_names: List[str],
+        product_ids: List[int],
+        last_id: int,
+        orders: Optional[np.ndarray] = None,
+        archived: int = 0,
+    ):
+        self.dates = dates
+        self.products = products
+        self.quantities = quantities
+        self.totals = totals
+        self.orders = np.ones(len(dates), dtype=np.int64) if orders is None else orders
+        self.product_names = product_names
+        self.product_ids = product_ids
+        self.last_id = last_id
+        self.archived = archived
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def product_code(self, name: str) -> int:
+        """Code of a product name, or -1 if the product has no sales."""
+        try:
+            return self.product_names.index(name)
+        except ValueError:
+            return -1
+
+
+def _sales_query():
+    return select(
+        PenjualanDB.id_penjualan,
+        PenjualanDB.tanggal_penjualan,
+        PenjualanDB.id_produk,
+        PenjualanDB.kuantitas,
+        cents_column(PenjualanDB.total),
+    ).where(PenjualanDB.id_tenant == current_tenant())
+
+
+def _row_arrays(rows: Sequence) -> Tuple[np.ndarray, ...]:
+    """(ids, dates, product ids, quantities, totals) arrays of ``_sales_query`` rows."""
+    count = len(rows)
+    return (
+        np.fromiter((row[0] for row in rows), dtype=np.int64, count=count),
+        np.fromiter((row[1].toordinal() for row in rows), dtype=np.int32, count=count),
+        np.fromiter((row[2] for row in rows), dtype=np.int32, count=count),
+        np.fromiter((row[3] or 0 for row in rows), dtype=np.int64, count=count),
+        np.fromiter((row[4] or 0 for row in rows), dtype=np.int64, count=count),
+    )
+
+
+def _archived_query():
+    """``_sales_query``-shaped rows (id 0) of the archived daily rollups, with their order counts."""
+    return select(
+        literal(0),
+        ArsipRingkasanDB.tanggal,
+        ArsipRingkasanDB.id_kunci,
+        ArsipRingkasanDB.kuantitas,
+        ArsipRingkasanDB.total_sen,
+        ArsipRingkasanDB.transaksi,
+    ).where(ArsipRingkasanDB.id_tenant == current_tenant(), ArsipRingkasanDB.tabel == "penjualan")
+
+
+def _load_sales_columns() -> SalesColumns:
+    db = ReadSessionLocal()
+    try:
+        names = dict(db.execute(
+            select(ProdukDB.id_produk, ProdukDB.nama_produk).where(ProdukDB.id_tenant == current_tenant())
+        ).all())
+        archived = db.execute(_archived_query()).all()
+        rows = db.execute(_sales_query()).all()
+    finally:
+        db.close()
+
+    ids, dates, product_ids, quantities, totals = _row_arrays(archived + rows)
+    orders = np.concatenate((
+        np.fromiter((row[5] for row in archived), dtype=np.int64, count=len(archived)),
+        np.ones(len(rows), dtype=np.int64),
+    ))
+    order = np.argsort(dates, kind="stable")
+    # Dense product codes, so per-product sums are a single bincount.
+    unique_ids, products = np.unique(product_ids[order], return_inverse=True)
+    return SalesColumns(
+        dates=dates[order],
+        products=products.astype(np.int32),
+        quantities=quantities[order],
+        totals=totals[order],
+        product_names=[names.get(int(pid), "") or "" for pid in unique_ids],
+        product_ids=[int(pid) for pid in unique_ids],
+        last_id=int(ids.max()) if len(ids) else 0,
+        orders=orders[order],
+        archived=len(archived),
+    )
+
+
+def _append_sales_columns(cols: SalesColumns, old_version, new_version) -> Optional[SalesColumns]:
+    """``cols`` plus the sales stored since it was loaded, or None if it needs a full reload.
+
+    Only a change of sales alone is applied this way. The tenant's row count
+    is checked, so a sale that committed out of id order (or any delete)
+    also falls back to a full reload. Products or the archive changing
+    always reload.
+    """
+    if old_version[1:] != new_version[1:]:
+        return None
+    known = set(cols.product_ids)
+    db = ReadSessionLocal()
+    try:
+        rows = db.execute(
+            _sales_query().where(PenjualanDB.id_penjualan > cols.last_id).order_by(PenjualanDB.id_penjualan)
+        ).all()
+        stored = db.execute(
+            select(func.count()).select_from(PenjualanDB).where(PenjualanDB.id_tenant == current_tenant())
+        ).scalar()
+        if len(cols) - cols.archived + len(rows) != stored:
+            return None
+        new_ids = {row[2] for row in rows} - known
+        names = dict(db.execute(
+            select(ProdukDB.id_produk, ProdukDB.nama_produk).where(ProdukDB.id_produk.in_(new_ids))
+        ).all()) if new_ids else {}
+    finally:
+        db.close()
+    if not rows:
+        return cols
+
+    ids, dates, product_ids, quantities, totals = _row_arrays(rows)
+    # Products selling for the first time get the next codes.
+    product_names, known_ids = list(cols.product_names), list(cols.product_ids)
+    codes = {pid: code for code, pid in enumerate(known_ids)}
+    for pid in product_ids.tolist():
+        if pid not in codes:
+            codes[pid] = len(known_ids)
+            known_ids.append(pid)
+            product_names.append(names.get(pid, "") or "")
+    products = np.fromiter((codes[pid] for pid in product_ids.tolist()), dtype=np.int32, count=len(rows))
+
+    merged = [
+        np.concatenate((cols.dates, dates)),
+        np.concatenate((cols.products, products)),
+        np.concatenate((cols.quantities, quantities)),
+        np.concatenate((cols.totals, totals)),
+        np.concatenate((cols.orders, np.ones(len(rows), dtype=np.int64))),
+    ]
+    # New sales are usually dated today; back-dated ones need a re-sort.
+    if (len(cols) and dates.min() < cols.dates[-1]) or np.any(np.diff(dates) < 0):
+        order = np.argsort(merged[0], kind="stable")
+        merged = [column[order] for column in merged]
+    dates, products, quantities, totals, orders = merged
+    return SalesColumns(
+        dates, products, quantities, totals, product_names, known_ids,
+        max(cols.last_id, int(ids.max())), orders, cols.archived,
+    )
+
+
+def get_sales_columns() -> SalesColumns:
+    """Get the current tenant's columnar sales data, reloaded in full only after products or the archive change."""
+    return _columns_cache.get_or_refresh("all", _load_sales_columns, _append_sales_columns)
+
+
+# Kernels -------------------------------------------------------------------
+
+
+def filter_mask(
+    cols: SalesColumns,
+    product_code: Optional[int] = None,
+    start_ordinal: Optional[int] = None,
+    end_ordinal: Optional[int] = None,
+) -> np.ndarray:
+    """Boolean mask of sales matching a product and a half-open date range."""
+    mask = np.ones(len(cols), dtype=bool)
+    if product_code is not None:
+        mask &= cols.products == product_code
+    if start_ordinal is not None:
+        mask &= cols.dates >= start_ordinal
+    if end_ordinal is not None:
+        mask &= cols.dates < end_ordinal
+    return mask
+
+
+def totals_summary(cols: SalesColumns, mask: np.ndarray) -> Dict[str, int]:
+    """Revenue (cents), order count and items sold of the masked sales."""
+    return {
+        "revenue": int(cols.totals[mask].sum()),
+        "orders": int(cols.orders[mask].sum()),
+        "items": int(cols.quantities[mask].sum()),
+    }
+
+
+def daily_sums(cols: SalesColumns, mask: np.ndarray):
+    """Per-day revenue of the masked sales.
+
+    Relies on the arrays being sorted by date: the start of each run of equal
+    dates is a segment boundary for ``np.add.reduceat``.
+
+    Returns:
+        (day ordinals, revenue in cents) arrays, one entry per day with sales.
+    """
+    dates = cols.dates[mask]
+    if len(dates) == 0:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(dates)) + 1))
+    return dates[starts], np.add.reduceat(cols.totals[mask], starts)
+
+
+def product_sums(cols: SalesColumns, mask: np.ndarray):
+    """Per-product revenue (cents) and quantity of the masked sales.
+
+    ``bincount`` accumulates in float64, which is exact for sums below 2**53.
+
+    Returns:
+        (revenue, quantity) arrays indexed by product code.
+    """
+    size = len(cols.product_names)
+    products = cols.products[mask]
+    revenue = np.bincount(products, weights=cols.totals[mask], minlength=size)
+    quantity = np.bincount(products, weights=cols.quantities[mask], minlength=size)
+    return np.rint(revenue).astype(np.int64), np.rint(quantity).astype(np.int64)
+
+
+def top_n(values: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n largest values, largest first."""
+    if n <= 0 or len(values) == 0:
+        return np.empty(0, dtype=np.int64)
+    n = min(n, len(values))
+    candidates = np.argpartition(values, len(values) - n)[len(values) - n:]
+    return candidates[np.argsort(values[candidates])[::-1]]
+
+
+def growth(current: float, previous: float) -> float:
+    """Percentage change, or 0 when there is nothing to compare against."""
+    return (current - previous) / previous * 100 if previous > 0 else 0.0
+
+
+# Dashboard -----------------------------------------------------------------
+
+
+def compute_dashboard(
+    cols: SalesColumns,
+    selected_product: str = "All Products",
+    selected_period: str = "All Time",
+    today: Optional[date] = None,
+    top: int = 5,
+) -> Dict[str, Any]:
+    """Every sales dashboard metric for one product/period selection.
+
+    Amounts (totals, average, chart and product revenue) are in cents.
+    """
+    today = today or date.today()
+    today_ordinal = today.toordinal()
+
+    product_code = None
+    if selected_product != "All Products":
+        product_code = cols.product_code(selected_product)
+
+    days = PERIOD_DAYS.get(selected_period, 0)
+    start_ordinal = today_ordinal - days if days > 0 else None
+    mask = filter_mask(cols, product_code, start_ordinal)
+
+    summary = totals_summary(cols, mask)
+    orders = summary["orders"]
+
+    day_ordinals, day_revenue = daily_sums(cols, mask)
+    revenue_by_product, quantity_by_product = product_sums(cols, mask)
+    sold = np.flatnonzero(np.bincount(cols.products[mask], minlength=len(cols.product_names)))
+    product_sales = [
+        {
+            "product": cols.product_names[code],
+            "revenue": int(revenue_by_product[code]),
+            "quantity": int(quantity_by_product[code]),
+            "fill": PRODUCT_COLORS[i % len(PRODUCT_COLORS)],
+        }
+        for i, code in enumerate(sold)
+    ]
+    top_codes = top_n(revenue_by_product[sold], top)
+
+    # Growth compares the selected window with the one before it (30 days for All Time).
+    window = days if days > 0 else 30
+    current = totals_summary(cols, filter_mask(cols, product_code, today_ordinal - window))
+    previous = totals_summary(
+        cols, filter_mask(cols, product_code, today_ordinal - 2 * window, today_ordinal - window)
+    )
+
+    return {
+        "total_revenue": summary["revenue"],
+        "total_orders": orders,
+        "average_order_value": divide_cents(summary["revenue"], orders),
+        "items_sold": summary["items"],
+        "daily_revenue_data": [
+            {"date": date.fromordinal(int(day)).isoformat(), "revenue": int(cents)}
+            for day, cents in zip(day_ordinals, day_revenue)
+        ],
+        "product_sales_data": product_sales,
+        "top_products_data": [product_sales[int(i)] for i in top_codes],
+        "revenue_growth": growth(current["revenue"], previous["revenue"]),
+        "orders_growth": growth(current["orders"], previous["orders"]),
+        # Growth window sums, for applying new sales with ``apply_sale``
+        "growth_window": {
+            "days": window,
+            "current_revenue": current["revenue"],
+            "current_orders": current["orders"],
+            "previous_revenue": previous["revenue"],
+            "previous_orders": previous["orders"],
+        },
+    }
+
+
+def apply_sale(
+    metrics: Dict[str, Any],
+    product: str,
+    quantity: int,
+    total: int,
+    sale_date: date,
+    selected_product: str = "All Products",
+    selected_period: str = "All Time",
+    today: Optional[date] = None,
+    top: int = 5,
+) -> Dict[str, Any]:
+    """Add one new sale (total in cents) to a ``compute_dashboard`` result.
+
+    Returns a new result; ``metrics`` may be shared and is not modified.
+    The result equals what ``compute_dashboard`` would return after the
+    sale, except for the order of products that sell for the first time.
+    """
+    if selected_product != "All Products" and product != selected_product:
+        return metrics
+    today = today or date.today()
+    age = (today - sale_date).days
+    metrics = dict(metrics)
+
+    window = dict(metrics["growth_window"])
+    if age <= window["days"]:
+        window["current_revenue"] += total
+        window["current_orders"] += 1
+    elif age <= 2 * window["days"]:
+        window["previous_revenue"] += total
+        window["previous_orders"] += 1
+    metrics["growth_window"] = window
+    metrics["revenue_growth"] = growth(window["current_revenue"], window["previous_revenue"])
+    metrics["orders_growth"] = growth(window["current_orders"], window["previous_orders"])
+
+    days = PERIOD_DAYS.get(selected_period, 0)
+    if days > 0 and age > days:
+        return metrics
+
+    metrics["total_revenue"] += total
+    metrics["total_orders"] += 1
+    metrics["items_sold"] += quantity
+    metrics["average_order_value"] = divide_cents(metrics["total_revenue"], metrics["total_orders"])
+
+    day = sale_date.isoformat()
+    daily = list(metrics["daily_revenue_data"])
+    for i, point in enumerate(daily):
+        if point["date"] == day:
+            daily[i] = {"date": day, "revenue": point["revenue"] + total}
+            break
+    else:
+        daily.append({"date": day, "revenue": total})
+        daily.sort(key=lambda point: point["date"])
+    metrics["daily_revenue_data"] = daily
+
+    products = list(metrics["product_sales_data"])
+    for i, entry in enumerate(products):
+        if entry["product"] == product:
+            products[i] = {
+                **entry,
+                "revenue": entry["revenue"] + total,
+                "quantity": entry["quantity"] + quantity,
+            }
+            break
+    else:
+        products.append({
+            "product": product,
+            "revenue": total,
+            "quantity": quantity,
+            "fill": PRODUCT_COLORS[len(products) % len(PRODUCT_COLORS)],
+        })
+    metrics["product_sales_data"] = products
+    metrics["top_products_data"] = sorted(products, key=lambda entry: entry["revenue"], reverse=True)[:top]
+    return metrics
+
+
+def get_dashboard(
+    selected_product: str = "All Products",
+    selected_period: str = "All Time",
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """``compute_dashboard`` for one selection, shared by all sessions of the tenant.
+
+    Computed once per data version and selection in the aggregate store.
+    """
+    today = today or date.today()
+    return aggregate_store.get_or_compute(
+        "dashboard",
+        (selected_product, selected_period, today.isoformat()),
+        ("penjualan", "produk", "arsip"),
+        lambda: compute_dashboard(get_sales_columns(), selected_product, selected_period, today),
+    )
+
+
+def _load_product_ids() -> Dict[str, int]:
+    db = ReadSessionLocal()
+    try:
+        rows = db.execute(
+            select(ProdukDB.nama_produk, ProdukDB.id_produk)
+            .where(ProdukDB.id_tenant == current_tenant())
+            .order_by(ProdukDB.id_produk)
+        ).all()
+    finally:
+        db.close()
+    return {nama or "": id_produk for nama, id_produk in rows}
+
+
+def get_product_ids() -> Dict[str, int]:
+    """The current tenant's product ids by name, in id order, shared by all its sessions."""
+    return aggregate_store.get_or_compute("product_ids", "all", ("produk",), _load_product_ids)
@@ -0,0 +1,437 @@
+"""Streaming anomaly detection on penjualan and belanja.
+
+Each tenant has its own detectors. Each product, each expense category and
+each ledger as a whole has a
+``SeriesDetector`` that keeps running (Welford) mean and variance of its
+entry amounts and of its daily totals. Detectors are seeded once from
+aggregate queries over the rows up to the highest id at that time. Later
+rows are then added in id order, each in O(1), by reading the rows past the
+last id added before flags are returned, so flagging never rescans history.
+Because every process reads the same rows in the same order, each backend
+worker arrives at the same statistics and flags, although they are kept in
+memory per process (a restart seeds them again). Detectors learn from the
+rows in the ledgers only: archived years (``archive.py``) keep no single
+amounts, so an archive run makes every process seed the tenant's
+detectors again from the rows that are left. A row that commits after
+a row with a higher id has been read is not added. A day is "open" until a
+later day is inserted;
+closing it folds its total (and any days without entries, as zeros) into
+the daily statistics.
+
+Flags:
+
+- ``entry``: a single sale or expense far from the usual amount.
+- ``day_high``: the open day's total is far above the usual daily total.
+- ``day_low``: a closed day's total was far below the usual daily total.
+- ``gap``: days without any entries where entries are expected.
+- ``duplicate``: the same expense entered twice on the same day.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import reflex as rx
+from sqlalchemy import Float, cast, func, select
+
+from .cache import data_version
+from .database import (
+    BelanjaDB,
+    KategoriPengeluaranDB,
+    PenjualanDB,
+    ProdukDB,
+    ReadSessionLocal,
+    SessionLocal,
+)
+from .money import cents_column
+from .tenant import current_tenant
+
+Z_THRESHOLD = 3.0
+MIN_DAYS = 7  # closed days needed before daily totals are judged
+MIN_ENTRIES = 10  # entries needed before single amounts are judged
+RECENT_DAYS = 35  # closed day totals kept so backdated entries can correct them
+MAX_FLAGS = 100
+
+ALL = 0  # detector key for a whole ledger
+
+
+class Anomaly(rx.Base):
+    """A flagged entry or day, amounts in cents."""
+    sumber: str  # "penjualan" or "belanja"
+    id_kunci: int  # product or category id, 0 for the whole ledger
+    nama: str
+    tanggal: str
+    jenis: str
+    jumlah: int
+    rata_rata: int
+    skor: float
+
+
+class RunningStats:
+    """Welford running mean and variance, with removal and batch merge."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    @classmethod
+    def from_sums(cls, count: int, total: float, squares: float) -> "RunningStats":
+        """Stats of ``count`` values given their sum and sum of squares."""
+        if not count:
+            return cls()
+        mean = total / count
+        return cls(count, mean, max(squares - total * mean, 0.0))
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def add_repeated(self, value: float, times: int):
+        """Add ``value`` ``times`` times in O(1)."""
+        if times <= 0:
+            return
+        total = self.count + times
+        delta = value - self.mean
+        self.mean += delta * times / total
+        self.m2 += delta * delta * self.count * times / total
+        self.count = total
+
+    def remove(self, value: float):
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        previous_mean = (self.count * self.mean - value) / (self.count - 1)
+        self.m2 = max(self.m2 - (value - self.mean) * (value - previous_mean), 0.0)
+        self.mean = previous_mean
+        self.count -= 1
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def zscore(self, value: float) -> Optional[float]:
+        std = self.std
+        return (value - self.mean) / std if std > 0 else None
+
+
+class SeriesDetector:
+    """Entry and daily-total statistics of one product, category or ledger."""
+
+    def __init__(self):
+        self.entries = RunningStats()
+        self.days = RunningStats()
+        self.first_day: Optional[int] = None
+        self.day: Optional[int] = None  # open day ordinal
+        self.total = 0  # open day total
+        self.recent: Dict[int, int] = {}  # closed day totals, last RECENT_DAYS days
+        self.fingerprints = set()  # open day entries, for duplicate detection
+
+    def add(self, day: int, amount: int, fingerprint=None, judge_entry: bool = True) -> List[Tuple[str, int, int, float, float]]:
+        """Record one entry.
+
+        Returns:
+            Flags as (kind, day, amount, expected, score) tuples.
+        """
+        flags = []
+        if judge_entry and self.entries.count >= MIN_ENTRIES:
+            z = self.entries.zscore(amount)
+            if z is not None and abs(z) > Z_THRESHOLD:
+                flags.append(("entry", day, amount, self.entries.mean, z))
+        self.entries.add(amount)
+
+        if self.day is None:
+            self.first_day = self.day = day
+            self.total = 0
+        elif day > self.day:
+            flags.extend(self._close(day))
+        elif day < self.day:
+            flags.extend(self._backdate(day, amount))
+            return flags
+
+        self.total += amount
+        if fingerprint is not None:
+            if fingerprint in self.fingerprints:
+                flags.append(("duplicate", day, amount, amount, 0.0))
+            self.fingerprints.add(fingerprint)
+        flags.extend(self.check_open_day())
+        return flags
+
+    def check_open_day(self):
+        if self.day is None or self.days.count < MIN_DAYS:
+            return []
+        z = self.days.zscore(self.total)
+        if z is not None and z > Z_THRESHOLD:
+            return [("day_high", self.day, self.total, self.days.mean, z)]
+        return []
+
+    def _close(self, new_day: int):
+        """Fold the open day and any empty days before ``new_day`` into the daily stats."""
+        flags = []
+        judged = self.days.count >= MIN_DAYS
+        z = self.days.zscore(self.total) if judged else None
+        if z is not None and z < -Z_THRESHOLD:
+            flags.append(("day_low", self.day, self.total, self.days.mean, z))
+        self.days.add(self.total)
+        self.recent[self.day] = self.total
+
+        empty = new_day - self.day - 1
+        if empty > 0:
+            z = self.days.zscore(0) if judged else None
+            if z is not None and z < -Z_THRESHOLD:
+                flags.append(("gap", self.day + 1, 0, self.days.mean, z))
+            self.days.add_repeated(0, empty)
+
+        self.day = new_day
+        self.total = 0
+        self.fingerprints = set()
+        cutoff = new_day - RECENT_DAYS
+        for old in [d for d in self.recent if d < cutoff]:
+            del self.recent[old]
+        return flags
+
+    def _backdate(self, day: int, amount: int):
+        """Correct a recent closed day; older days only count as entries."""
+        if self.first_day is None or day < max(self.first_day, self.day - RECENT_DAYS):
+            return []
+        before = self.recent.get(day, 0)
+        after = before + amount
+        self.days.remove(before)
+        self.days.add(after)
+        self.recent[day] = after
+        if self.days.count >= MIN_DAYS:
+            z = self.days.zscore(after)
+            if z is not None and z > Z_THRESHOLD:
+                return [("day_high", day, after, self.days.mean, z)]
+        return []
+
+
+class AnomalyDetector:
+    """Detectors for both ledgers of one tenant plus the most recent flags."""
+
+    def __init__(self, tenant: int, archive_version=None):
+        self.tenant = tenant
+        # Archive data version the detectors were created at
+        self.archive_version = archive_version
+        self.lock = threading.Lock()
+        self.seeded = False
+        # Highest id added per ledger
+        self.last_ids: Dict[str, int] = {}
+        self.detectors: Dict[Tuple[str, int], SeriesDetector] = {}
+        self.flags: "OrderedDict[tuple, Anomaly]" = OrderedDict()
+
+    def detector(self, sumber: str, key: int) -> SeriesDetector:
+        detector = self.detectors.get((sumber, key))
+        if detector is None:
+            detector = self.detectors[(sumber, key)] = SeriesDetector()
+        return detector
+
+    def record(self, sumber: str, key: int, flags):
+        for jenis, day, amount, expected, score in flags:
+            flag_key = (sumber, key, day, jenis)
+            self.flags.pop(flag_key, None)
+            self.flags[flag_key] = Anomaly(
+                sumber=sumber,
+                id_kunci=key,
+                nama="",
+                tanggal=date.fromordinal(day).isoformat(),
+                jenis=jenis,
+                jumlah=int(amount),
+                rata_rata=int(round(expected)),
+                skor=round(float(score), 1),
+            )
+        while len(self.flags) > MAX_FLAGS:
+            self.flags.popitem(last=False)
+
+    def add(self, sumber: str, key: int, day: int, amount: int, fingerprint=None):
+        """Update the entity's detector and the ledger-wide detector.
+
+        Single entries and duplicates are judged per entity only; the
+        ledger-wide detector judges daily totals.
+        """
+        self.record(sumber, key, self.detector(sumber, key).add(day, amount, fingerprint))
+        self.record(sumber, ALL, self.detector(sumber, ALL).add(day, amount, judge_entry=False))
+
+    def seed(self):
+        """Initialise all detectors from aggregate queries over the rows up to the current highest ids (once).
+
+        Reads the primary, like ``catch_up``: a replica could be missing rows
+        below the ids it returns.
+        """
+        today = date.today().toordinal()
+        db = SessionLocal()
+        try:
+            for sumber, model, id_column, key_column, date_column, _ in _LEDGERS:
+                tenant_filter = model.id_tenant == self.tenant
+                last_id = db.execute(select(func.max(id_column)).where(tenant_filter)).scalar() or 0
+                _seed_ledger(
+                    self, db, sumber, key_column, date_column, model.total,
+                    tenant_filter & (id_column <= last_id), today,
+                )
+                self.last_ids[sumber] = last_id
+        finally:
+            db.close()
+        for (sumber, key), detector in self.detectors.items():
+            self.record(sumber, key, detector.check_open_day())
+        self.seeded = True
+
+    def catch_up(self):
+        """Seed the detectors if needed, then add the rows stored since, in id order."""
+        if not self.seeded:
+            self.seed()
+            return
+        db = SessionLocal()
+        try:
+            for sumber, model, id_column, key_column, date_column, extra_columns in _LEDGERS:
+                rows = db.execute(
+                    select(id_column, key_column, date_column, cents_column(model.total), *extra_columns)
+                    .where(model.id_tenant == self.tenant, id_column > self.last_ids[sumber])
+                    .order_by(id_column)
+                ).all()
+                for row_id, key, day, amount, *extra in rows:
+                    fingerprint = None
+                    if extra:
+                        deskripsi, metode = extra
+                        fingerprint = ((deskripsi or "").lower(), amount, metode)
+                    self.add(sumber, key, day.toordinal(), amount, fingerprint)
+                    self.last_ids[sumber] = row_id
+        finally:
+            db.close()
+
+
+def _seed_ledger(
+    detector: AnomalyDetector, db, sumber: str, key_column, date_column, amount_column, tenant_filter, today: int
+):
+    amount = cents_column(amount_column)
+    squared = cast(amount, Float) * cast(amount, Float)
+
+    # Entry statistics per key; the ledger-wide ones are their sums.
+    totals = {ALL: [0, 0.0, 0.0]}
+    for key, count, total, squares in db.execute(
+        select(key_column, func.count(), func.sum(amount), func.sum(squared))
+        .where(tenant_filter)
+        .group_by(key_column)
+    ):
+        totals[key] = [count, float(total or 0), float(squares or 0)]
+        for i, value in enumerate(totals[key]):
+            totals[ALL][i] += value
+
+    # Daily total statistics over closed days (before today), per key and overall.
+    today_date = date.fromordinal(today)
+    closed = (date_column < today_date) & tenant_filter
+    per_key = select(
+        key_column.label("key"), date_column.label("day"), func.sum(amount).label("total")
+    ).where(closed).group_by(key_column, date_column).subquery()
+    overall = select(
+        date_column.label("day"), func.sum(amount).label("total")
+    ).where(closed).group_by(date_column).subquery()
+    daily = {}
+    for key, count, total, squares, first in db.execute(
+        select(
+            per_key.c.key, func.count(), func.sum(per_key.c.total),
+            func.sum(cast(per_key.c.total, Float) * cast(per_key.c.total, Float)), func.min(per_key.c.day),
+        ).group_by(per_key.c.key)
+    ):
+        daily[key] = (count, total, squares, first)
+    for count, total, squares, first in db.execute(
+        select(
+            func.count(), func.sum(overall.c.total),
+            func.sum(cast(overall.c.total, Float) * cast(overall.c.total, Float)), func.min(overall.c.day),
+        )
+    ):
+        if count:
+            daily[ALL] = (count, total, squares, first)
+
+    # Recent closed days and today's open totals.
+    recent: Dict[int, Dict[int, int]] = {}
+    for key, day, total in db.execute(
+        select(key_column, date_column, func.sum(amount))
+        .where(date_column >= today_date - timedelta(days=RECENT_DAYS), tenant_filter)
+        .group_by(key_column, date_column)
+    ):
+        for detector_key in (key, ALL):
+            days = recent.setdefault(detector_key, {})
+            days[day.toordinal()] = days.get(day.toordinal(), 0) + int(total or 0)
+
+    for key in set(totals) | set(daily) | set(recent):
+        series = detector.detector(sumber, key)
+        count, total, squares = totals.get(key, (0, 0.0, 0.0))
+        series.entries = RunningStats.from_sums(count, total, squares)
+        days = recent.get(key, {})
+        series.day = today
+        series.total = days.pop(today, 0)
+        series.recent = days
+        if key in daily:
+            count, total, squares, first = daily[key]
+            first = first if isinstance(first, date) else date.fromisoformat(str(first))
+            series.first_day = first.toordinal()
+            series.days = RunningStats.from_sums(count, float(total or 0), float(squares or 0))
+            series.days.add_repeated(0, (today - series.first_day) - count)
+        else:
+            series.first_day = today
+
+
+# Per ledger: model, id, key and date columns, and the columns of a duplicate fingerprint.
+_LEDGERS = (
+    (
+        "penjualan", PenjualanDB, PenjualanDB.id_penjualan, PenjualanDB.id_produk,
+        PenjualanDB.tanggal_penjualan, (),
+    ),
+    (
+        "belanja", BelanjaDB, BelanjaDB.id_belanja, BelanjaDB.id_kategori_pengeluaran,
+        BelanjaDB.tanggal_pengeluaran, (BelanjaDB.deskripsi, BelanjaDB.metode_pembayaran),
+    ),
+)
+
+_detectors: Dict[int, AnomalyDetector] = {}
+_detectors_lock = threading.Lock()
+
+
+def _tenant_detector(tenant: int) -> AnomalyDetector:
+    archive_version = data_version("arsip")
+    with _detectors_lock:
+        detector = _detectors.get(tenant)
+        if detector is None or detector.archive_version != archive_version:
+            detector = _detectors[tenant] = AnomalyDetector(tenant, archive_version)
+        return detector
+
+
+def get_anomalies(limit: int = 10) -> List[Anomaly]:
+    """The current tenant's most recent flags, newest first, with product/category names filled in."""
+    try:
+        tenant = current_tenant()
+        detector = _tenant_detector(tenant)
+        with detector.lock:
+            detector.catch_up()
+            flags = list(detector.flags.values())[-limit:][::-1]
+        if not flags:
+            return []
+        db = ReadSessionLocal()
+        try:
+            names = {
+                "penjualan": dict(db.execute(
+                    select(ProdukDB.id_produk, ProdukDB.nama_produk).where(ProdukDB.id_tenant == tenant)
+                ).all()),
+                "belanja": dict(db.execute(
+                    select(KategoriPengeluaranDB.id_kategori, KategoriPengeluaranDB.nama_kategori)
+                    .where(KategoriPengeluaranDB.id_tenant == tenant)
+                ).all()),
+            }
+        finally:
+            db.close()
+        return [
+            flag.copy(update={
+                "nama": "Semua " + flag.sumber if flag.id_kunci == ALL
+                else names[flag.sumber].get(flag.id_kunci) or f"#{flag.id_kunci}",
+            })
+            for flag in flags
+        ]
+    except Exception as e:
+        print(f"Error getting anomalies: {e}")
+        return []
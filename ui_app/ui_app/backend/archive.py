@@ -0,0 +1,357 @@
+"""Cold archive of closed ledger years.
+
+Penjualan and belanja rows of years that are no longer worked on are moved
+out of the database into zstd-compressed Parquet files, one per tenant, table
+and year (``ARCHIVE_DIR/<tenant>/<table>_<year>.parquet``). Daily totals per
+product or category stay behind in ``arsip_ringkasan``, so the reports in
+``reports.py`` keep covering archived years, and ``arsip_tahun`` records
+which years each tenant has archived.
+
+A year is closed once it is older than the last ``ARCHIVE_KEEP_YEARS``
+calendar years (the current one included). Run the archive from ``ui_app``::
+
+    python -m ui_app.backend.archive                 # every closed year
+    python -m ui_app.backend.archive 2021 2022       # only these years
+    python -m ui_app.backend.archive --vacuum        # and reclaim the space
+
+Archiving a year again (rows back-dated into it later) merges the new rows
+into its file. Needs ``pyarrow``.
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text
+
+from .cache import bump_version
+from .database import (
+    ArsipTahunDB,
+    BelanjaDB,
+    KategoriPengeluaranDB,
+    PenjualanDB,
+    ProdukDB,
+    SessionLocal,
+    get_engine,
+    record_arsip_ringkasan,
+)
+from .export import FETCH_SIZE, stream_parquet
+from .money import to_cents
+from .tenant import current_tenant, use_tenant
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_KEEP_YEARS = int(os.getenv("ARCHIVE_KEEP_YEARS", "2"))
+# Ids per DELETE statement.
+DELETE_CHUNK = 1000
+
+# (column name, value kind) of the archive files: the export columns plus
+# everything else needed to restore a row.
+PENJUALAN_ARCHIVE_COLUMNS = [
+    ("id_penjualan", "int"),
+    ("tanggal_penjualan", "date"),
+    ("waktu_penjualan", "datetime"),
+    ("id_produk", "int"),
+    ("nama_produk", "str"),
+    ("kuantitas", "int"),
+    ("harga_saat_penjualan", "money"),
+    ("total", "money"),
+    ("catatan", "str"),
+    ("idempotency_key", "str"),
+]
+BELANJA_ARCHIVE_COLUMNS = [
+    ("id_belanja", "int"),
+    ("tanggal_pengeluaran", "date"),
+    ("id_kategori_pengeluaran", "int"),
+    ("nama_kategori", "str"),
+    ("deskripsi", "str"),
+    ("total", "money"),
+    ("metode_pembayaran", "str"),
+    ("bukti_transaksi", "str"),
+    ("catatan", "str"),
+    ("idempotency_key", "str"),
+    ("id_produk", "int"),
+    ("kuantitas", "int"),
+]
+
+# Per table: model, id column, date column, rollup key column, archive columns.
+_LEDGERS = {
+    "penjualan": (
+        PenjualanDB,
+        PenjualanDB.id_penjualan,
+        PenjualanDB.tanggal_penjualan,
+        PenjualanDB.id_produk,
+        PENJUALAN_ARCHIVE_COLUMNS,
+    ),
+    "belanja": (
+        BelanjaDB,
+        BelanjaDB.id_belanja,
+        BelanjaDB.tanggal_pengeluaran,
+        BelanjaDB.id_kategori_pengeluaran,
+        BELANJA_ARCHIVE_COLUMNS,
+    ),
+}
+
+
+def archive_path(table: str, year: int, tenant: Optional[int] = None) -> str:
+    """Parquet file of one archived year of a table, for the current tenant by default."""
+    tenant = current_tenant() if tenant is None else tenant
+    return os.path.join(ARCHIVE_DIR, str(tenant), f"{table}_{year}.parquet")
+
+
+def _year_query(table: str, year: int):
+    """The current tenant's rows of a table in one year, in archive column order."""
+    model, id_column, date_column, _, _ = _LEDGERS[table]
+    if table == "penjualan":
+        query = select(
+            PenjualanDB.id_penjualan,
+            PenjualanDB.tanggal_penjualan,
+            PenjualanDB.waktu_penjualan,
+            PenjualanDB.id_produk,
+            ProdukDB.nama_produk,
+            PenjualanDB.kuantitas,
+            PenjualanDB.harga_saat_penjualan,
+            PenjualanDB.total,
+            PenjualanDB.catatan,
+            PenjualanDB.idempotency_key,
+        ).outerjoin(ProdukDB, PenjualanDB.id_produk == ProdukDB.id_produk)
+    else:
+        query = select(
+            BelanjaDB.id_belanja,
+            BelanjaDB.tanggal_pengeluaran,
+            BelanjaDB.id_kategori_pengeluaran,
+            KategoriPengeluaranDB.nama_kategori,
+            BelanjaDB.deskripsi,
+            BelanjaDB.total,
+            BelanjaDB.metode_pembayaran,
+            BelanjaDB.bukti_transaksi,
+            BelanjaDB.catatan,
+            BelanjaDB.idempotency_key,
+            BelanjaDB.id_produk,
+            BelanjaDB.kuantitas,
+        ).outerjoin(KategoriPengeluaranDB, BelanjaDB.id_kategori_pengeluaran == KategoriPengeluaranDB.id_kategori)
+    return (
+        query.where(
+            model.id_tenant == current_tenant(),
+            date_column >= date(year, 1, 1),
+            date_column <= date(year, 12, 31),
+        )
+        .order_by(id_column)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+
+
+def _write_file(path: str, chunks: Iterator[bytes]):
+    with open(path, "wb") as handle:
+        for chunk in chunks:
+            handle.write(chunk)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _merge_files(existing: str, new: str, id_name: str):
+    """Rewrite ``new`` as the rows of both files, the rows in ``new`` replacing those with the same id."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    added = pq.read_table(new)
+    kept = pq.read_table(existing)
+    kept = kept.filter(pc.invert(pc.is_in(kept[id_name], value_set=added[id_name])))
+    merged = pa.concat_tables([kept, added]).sort_by(id_name)
+    pq.write_table(merged, new, compression="zstd")
+
+
+def archive_year(table: str, year: int) -> int:
+    """Move the current tenant's rows of one closed year of a table to its Parquet file.
+
+    The file is written and synced before the rows are deleted, and the
+    deletes, the rollups and the ``arsip_tahun`` entry are committed in one
+    transaction, so an interrupted run loses nothing and can be repeated.
+
+    Returns:
+        The number of rows archived.
+
+    Raises:
+        ValueError: for an unknown table or a year that is not over yet.
+    """
+    if table not in _LEDGERS:
+        raise ValueError(f"Unknown table: {table}")
+    if year >= date.today().year:
+        raise ValueError(f"{year} is not closed yet")
+    model, id_column, date_column, key_column, columns = _LEDGERS[table]
+    names = [name for name, _ in columns]
+    date_at, key_at = names.index(date_column.key), names.index(key_column.key)
+    quantity_at, total_at = names.index("kuantitas"), names.index("total")
+
+    tenant = current_tenant()
+    path = archive_path(table, year)
+    partial = path + ".tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    ids: List[int] = []
+    # (tanggal, id_kunci) -> [transaksi, kuantitas, total_sen]
+    rollups: Dict[Tuple[date, int], List[int]] = {}
+
+    # The primary, not the replica: the rows deleted must be the rows written.
+    db = SessionLocal()
+    try:
+        def rows() -> Iterator[Tuple]:
+            for row in db.execute(_year_query(table, year)):
+                ids.append(row[0])
+                totals = rollups.setdefault((row[date_at], row[key_at]), [0, 0, 0])
+                totals[0] += 1
+                totals[1] += row[quantity_at] or 0
+                totals[2] += to_cents(row[total_at])
+                yield tuple(row)
+
+        _write_file(partial, stream_parquet(columns, rows()))
+        if not ids:
+            os.remove(partial)
+            return 0
+        if os.path.exists(path):
+            _merge_files(path, partial, names[0])
+
+        record_arsip_ringkasan(db, [
+            {
+                "id_tenant": tenant,
+                "tabel": table,
+                "tanggal": tanggal,
+                "id_kunci": id_kunci,
+                "transaksi": transaksi,
+                "kuantitas": kuantitas,
+                "total_sen": total_sen,
+            }
+            for (tanggal, id_kunci), (transaksi, kuantitas, total_sen) in rollups.items()
+        ])
+        for i in range(0, len(ids), DELETE_CHUNK):
+            db.execute(delete(model).where(id_column.in_(ids[i:i + DELETE_CHUNK])))
+        entry = db.get(ArsipTahunDB, (tenant, table, year))
+        if entry is None:
+            db.add(ArsipTahunDB(
+                id_tenant=tenant, tabel=table, tahun=year,
+                berkas=path, baris=len(ids), diarsipkan=datetime.now(),
+            ))
+        else:
+            entry.berkas = path
+            entry.baris += len(ids)
+            entry.diarsipkan = datetime.now()
+        # A crash between these two leaves a file with rows still in the
+        # database, which the next run merges away by id.
+        os.replace(partial, path)
+        db.commit()
+    except Exception:
+        db.rollback()
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        db.close()
+
+    bump_version(table, "arsip")
+    return len(ids)
+
+
+def closed_years(table: str, keep_years: int = ARCHIVE_KEEP_YEARS) -> List[int]:
+    """Years of the current tenant's rows in a table that are old enough to archive."""
+    model, _, date_column, _, _ = _LEDGERS[table]
+    first_open = date.today().year - max(keep_years, 1) + 1
+    with get_engine().connect() as conn:
+        oldest = conn.execute(
+            select(func.min(date_column)).where(model.id_tenant == current_tenant())
+        ).scalar()
+    if oldest is None:
+        return []
+    if isinstance(oldest, str):  # SQLite returns the bare value of MIN()
+        oldest = date.fromisoformat(oldest)
+    return list(range(oldest.year, first_open))
+
+
+def archived_years(table: str) -> List[int]:
+    """Years of a table the current tenant has archived, oldest first."""
+    with get_engine().connect() as conn:
+        return list(conn.execute(
+            select(ArsipTahunDB.tahun)
+            .where(ArsipTahunDB.id_tenant == current_tenant(), ArsipTahunDB.tabel == table)
+            .order_by(ArsipTahunDB.tahun)
+        ).scalars())
+
+
+def read_archive(table: str, year: int, columns: Optional[List[str]] = None):
+    """One archived year of the current tenant as a ``pyarrow.Table``, or None if it was not archived."""
+    import pyarrow.parquet as pq
+
+    path = archive_path(table, year)
+    if not os.path.exists(path):
+        return None
+    return pq.read_table(path, columns=columns)
+
+
+def _tenants() -> List[int]:
+    with get_engine().connect() as conn:
+        return sorted(conn.execute(
+            select(PenjualanDB.id_tenant).union(select(BelanjaDB.id_tenant))
+        ).scalars())
+
+
+def archive_closed_years(
+    keep_years: int = ARCHIVE_KEEP_YEARS,
+    years: Optional[List[int]] = None,
+) -> Dict[Tuple[int, str, int], int]:
+    """Archive the closed years (or the given ones) of every tenant's penjualan and belanja.
+
+    Returns:
+        Rows archived per (tenant, table, year).
+    """
+    archived = {}
+    for tenant in _tenants():
+        with use_tenant(tenant):
+            for table in _LEDGERS:
+                for year in years or closed_years(table, keep_years):
+                    archived[(tenant, table, year)] = archive_year(table, year)
+    return archived
+
+
+def vacuum():
+    """Return the space of deleted rows to the database (PostgreSQL: VACUUM ANALYZE)."""
+    engine = get_engine()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name == "postgresql":
+            for table in _LEDGERS:
+                conn.execute(text(f"VACUUM ANALYZE {table}"))
+        else:
+            conn.execute(text("VACUUM"))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Move closed ledger years to Parquet files.")
+    parser.add_argument("years", nargs="*", type=int, help="years to archive (default: every closed year)")
+    parser.add_argument("--keep-years", type=int, default=ARCHIVE_KEEP_YEARS,
+                        help="calendar years kept in the database, the current one included")
+    parser.add_argument("--vacuum", action="store_true", help="vacuum the database afterwards")
+    args = parser.parse_args(argv)
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("The archive needs pyarrow: pip install pyarrow")
+        return 1
+
+    try:
+        archived = archive_closed_years(args.keep_years, args.years or None)
+        for (tenant, table, year), count in archived.items():
+            if count:
+                print(f"Archived {count} {table} rows of {year} (tenant {tenant}) to {archive_path(table, year, tenant)}")
+        if not any(archived.values()):
+            print("Nothing to archive")
+        if args.vacuum:
+            vacuum()
+    except Exception as e:
+        print(f"Error archiving ledgers: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""Process-level caches invalidated by data versions.
+
+Every insert helper in ``database.py`` bumps the version of the table it
+wrote to. Cached results remember the versions they were computed from and
+are recomputed only when one of those tables has changed since.
+``TTLCache`` instead keeps entries for a fixed time, for hot reads that
+can tolerate a few seconds of staleness.
+
+Versions and cache entries are per tenant: a write by one business bumps
+only that business's versions, and every cache key is prefixed with the
+current tenant, so businesses never see each other's results.
+
+A version has a local part, counted in this process, and a shared part,
+counted in a version store that every process uses: the ``versi_data``
+table (``database.py``), or Redis when the aggregate store is on Redis.
+A write in this process invalidates its caches at once; writes by other
+backend workers, the archive CLI or the agent are seen once the shared
+versions are read again, at most ``DATA_VERSION_REFRESH_SECONDS`` later.
+Set ``SHARED_DATA_VERSIONS=false`` to count versions in this process only
+(the Redis aggregate store always shares them).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Protocol, Tuple
+
+from .metrics import record_cache
+from .tenant import current_tenant
+
+SHARED_DATA_VERSIONS = os.getenv("SHARED_DATA_VERSIONS", "true").lower() in ("1", "true", "yes")
+# Seconds to keep using the last shared versions after the store could not be read.
+VERSION_RETRY_SECONDS = 30
+
+# (local, shared) count of one table
+Version = Tuple[int, int]
+
+_versions: Dict[Tuple[int, str], int] = {}
+_versions_lock = threading.Lock()
+_version_listeners: List[Callable[[Tuple[str, ...]], None]] = []
+
+
+class VersionStore(Protocol):
+    """Version counters shared by every process."""
+
+    # Seconds a read of the shared versions may be reused.
+    refresh_seconds: float
+
+    def fetch(self, tenant: int) -> Dict[str, int]:
+        """All shared versions of a tenant, by table."""
+
+    def increment(self, tenant: int, tables: Tuple[str, ...]):
+        """Add one to the shared versions of a tenant's tables."""
+
+
+_version_store: Optional[VersionStore] = None
+_is_fallback_store = False
+# tenant -> (reuse until, shared versions by table)
+_shared: Dict[int, Tuple[float, Dict[str, int]]] = {}
+
+
+def set_version_store(store: VersionStore, fallback: bool = False):
+    """Count shared versions in ``store``; a ``fallback`` store never replaces another one."""
+    global _version_store, _is_fallback_store
+    if fallback and not SHARED_DATA_VERSIONS:
+        return
+    with _versions_lock:
+        if fallback and _version_store is not None:
+            return
+        if not fallback and _version_store is not None and not _is_fallback_store:
+            return
+        _version_store, _is_fallback_store = store, fallback
+        _shared.clear()
+
+
+def shared_versions_enabled() -> bool:
+    """Whether writes by other processes invalidate this process's caches."""
+    return _version_store is not None
+
+
+def _shared_versions(tenant: int) -> Dict[str, int]:
+    store = _version_store
+    if store is None:
+        return {}
+    now = time.monotonic()
+    with _versions_lock:
+        entry = _shared.get(tenant)
+    if entry is not None and now < entry[0]:
+        return entry[1]
+    try:
+        versions, reuse = store.fetch(tenant), store.refresh_seconds
+    except Exception as e:
+        print(f"Error reading shared data versions: {e}")
+        versions, reuse = (entry[1] if entry is not None else {}), VERSION_RETRY_SECONDS
+    with _versions_lock:
+        _shared[tenant] = (now + reuse, versions)
+    return versions
+
+
+def bump_version(*tables: str):
+    """Mark the current tenant's tables as changed, invalidating every cache that depends on them, in every process."""
+    tenant = current_tenant()
+    with _versions_lock:
+        for table in tables:
+            _versions[(tenant, table)] = _versions.get((tenant, table), 0) + 1
+    store = _version_store
+    if store is not None:
+        try:
+            store.increment(tenant, tables)
+        except Exception as e:
+            print(f"Error bumping shared data versions: {e}")
+        else:
+            # Our own bump is known without reading the store again.
+            with _versions_lock:
+                entry = _shared.get(tenant)
+                if entry is not None:
+                    versions = dict(entry[1])
+                    for table in tables:
+                        versions[table] = versions.get(table, 0) + 1
+                    _shared[tenant] = (entry[0], versions)
+    for listener in _version_listeners:
+        try:
+            listener(tables)
+        except Exception as e:
+            print(f"Error notifying version listener: {e}")
+
+
+def note_remote_change(*tables: str):
+    """Invalidate this process's caches of the current tenant's tables after another process wrote to them.
+
+    Unlike ``bump_version`` this neither counts in the shared store nor
+    calls the version listeners, since the writer already did.
+    """
+    tenant = current_tenant()
+    with _versions_lock:
+        for table in tables:
+            _versions[(tenant, table)] = _versions.get((tenant, table), 0) + 1
+        _shared.pop(tenant, None)
+
+
+def add_version_listener(listener: Callable[[Tuple[str, ...]], None]):
+    """Call ``listener(tables)`` after every ``bump_version``, in the bumping tenant's context."""
+    _version_listeners.append(listener)
+
+
+def data_version(*tables: str) -> Tuple[Version, ...]:
+    """Current version of each of the current tenant's tables, in the order given."""
+    tenant = current_tenant()
+    shared = _shared_versions(tenant)
+    with _versions_lock:
+        return tuple((_versions.get((tenant, table), 0), shared.get(table, 0)) for table in tables)
+
+
+def shared_version(*tables: str) -> Tuple[int, ...]:
+    """The shared part of ``data_version``, the same in every process."""
+    shared = _shared_versions(current_tenant())
+    return tuple(shared.get(table, 0) for table in tables)
+
+
+class VersionedCache:
+    """LRU cache whose entries are valid for one version of their source tables."""
+
+    def __init__(self, name: str, tables: Tuple[str, ...], max_entries: int = 256):
+        self.name = name
+        self.tables = tables
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[Version, ...], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the current tenant's cached value for key, computing it if missing or stale."""
+        return self.get_or_refresh(key, compute, lambda value, old, new: None)
+
+    def get_or_refresh(
+        self,
+        key: Hashable,
+        compute: Callable[[], Any],
+        refresh: Callable[[Any, Tuple[Version, ...], Tuple[Version, ...]], Any],
+    ) -> Any:
+        """Like ``get_or_compute``, but a stale value is first offered to ``refresh``.
+
+        ``refresh(value, old_version, new_version)`` returns the value brought
+        up to date, as a new object since the stale one may still be in use,
+        or None if it has to be computed from scratch.
+        """
+        key = (current_tenant(), key)
+        version = data_version(*self.tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                record_cache(self.name, True)
+                return entry[1]
+        record_cache(self.name, False)
+        value = refresh(entry[1], entry[0], version) if entry is not None else None
+        if value is None:
+            value = compute()
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TTLCache:
+    """Cache whose entries expire a fixed number of seconds after they were computed.
+
+    For results that may be slightly stale but are read on every page view,
+    so that concurrent sessions share one computation per ``ttl`` seconds.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 256):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the current tenant's cached value for key, computing it if missing or expired."""
+        key = (current_tenant(), key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[0]:
+                self._entries.move_to_end(key)
+                record_cache(self.name, True)
+                return entry[1]
+        record_cache(self.name, False)
+        value = compute()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,178 @@
+"""Change events for new penjualan and belanja rows.
+
+Every committed insert publishes one small event, e.g.::
+
+    {"table": "penjualan", "id_tenant": 1, "id_produk": 3, "kuantitas": 2,
+     "total": 3000000, "tanggal": "2025-01-31"}
+
+Subscribers (open dashboards) receive the events of their own tenant on an
+``asyncio.Queue`` and apply them as deltas instead of reloading. Within one backend process the
+events go through an in-process pub/sub. On PostgreSQL they are also sent
+with ``NOTIFY`` on ``CHANNEL``; every process that has subscribers
+``LISTEN``s there, invalidates its caches for events from other processes
+right away (rather than at the next shared version read, see ``cache.py``)
+and hands them to its own subscribers.
+"""
+
+import asyncio
+import json
+import select
+import threading
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+from .cache import note_remote_change
+from .database import get_engine, register_insert_hook
+from .money import to_cents
+from .tenant import current_tenant, use_tenant
+
+CHANNEL = "ledger_changes"
+
+# Data versions each table's inserts change, for events from other processes.
+_TABLE_VERSIONS: Dict[str, Tuple[str, ...]] = {
+    "penjualan": ("penjualan", "stok", "penjualan_jam"),
+    "belanja": ("belanja", "stok"),
+}
+
+_SOURCE = uuid.uuid4().hex  # tells our own NOTIFYs apart from other processes'
+
+
+class Subscription:
+    """Queue of one tenant's change events for one subscriber, bound to its event loop."""
+
+    def __init__(self, tenant: int):
+        self.tenant = tenant
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue()
+
+    def put(self, event: dict):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def drain(self) -> List[dict]:
+        """Events already waiting, without blocking."""
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+
+_subscriptions: Set[Subscription] = set()
+_subscriptions_lock = threading.Lock()
+_listener_started = False
+
+
+def subscribe(tenant: Optional[int] = None) -> Subscription:
+    """Start receiving change events of a tenant (default: the current one).
+
+    Must be called from a running event loop.
+    """
+    subscription = Subscription(current_tenant() if tenant is None else tenant)
+    with _subscriptions_lock:
+        _subscriptions.add(subscription)
+    if get_engine().dialect.name == "postgresql":
+        _start_listener()
+    return subscription
+
+
+def unsubscribe(subscription: Subscription):
+    with _subscriptions_lock:
+        _subscriptions.discard(subscription)
+
+
+def _deliver(event: dict):
+    with _subscriptions_lock:
+        subscriptions = list(_subscriptions)
+    for subscription in subscriptions:
+        if subscription.tenant != event.get("id_tenant"):
+            continue
+        try:
+            subscription.put(event)
+        except RuntimeError:
+            # The subscriber's event loop is closed.
+            unsubscribe(subscription)
+
+
+def publish(event: dict):
+    """Deliver an event to local subscribers and, on PostgreSQL, to other processes."""
+    _deliver(event)
+    if get_engine().dialect.name == "postgresql":
+        try:
+            with get_engine().begin() as conn:
+                conn.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": CHANNEL, "payload": json.dumps({**event, "source": _SOURCE})},
+                )
+        except Exception as e:
+            print(f"Error sending change notification: {e}")
+
+
+def _listen():
+    conn = get_engine().raw_connection()
+    try:
+        dbapi = conn.driver_connection
+        dbapi.autocommit = True
+        with dbapi.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        while True:
+            if select.select([dbapi], [], [], 60) == ([], [], []):
+                continue
+            dbapi.poll()
+            while dbapi.notifies:
+                notify = dbapi.notifies.pop(0)
+                event = json.loads(notify.payload)
+                if event.pop("source", None) == _SOURCE:
+                    continue
+                with use_tenant(event["id_tenant"]):
+                    note_remote_change(*_TABLE_VERSIONS.get(event.get("table"), ()))
+                _deliver(event)
+    finally:
+        conn.close()
+
+
+def _run_listener():
+    global _listener_started
+    try:
+        _listen()
+    except Exception as e:
+        print(f"Change listener stopped: {e}")
+    with _subscriptions_lock:
+        _listener_started = False
+
+
+def _start_listener():
+    global _listener_started
+    with _subscriptions_lock:
+        if _listener_started:
+            return
+        _listener_started = True
+    threading.Thread(target=_run_listener, name="change-listener", daemon=True).start()
+
+
+def _on_penjualan(values: dict):
+    publish({
+        "table": "penjualan",
+        "id_tenant": values["id_tenant"],
+        "id_produk": values["id_produk"],
+        "kuantitas": values["kuantitas"],
+        "total": values["kuantitas"] * to_cents(values["harga_saat_penjualan"]),
+        "tanggal": values["tanggal_penjualan"].isoformat(),
+    })
+
+
+def _on_belanja(values: dict):
+    publish({
+        "table": "belanja",
+        "id_tenant": values["id_tenant"],
+        "id_kategori": values["id_kategori_pengeluaran"],
+        "total": to_cents(values["total"]),
+        "tanggal": values["tanggal_pengeluaran"].isoformat(),
+    })
+
+
+register_insert_hook("penjualan", _on_penjualan)
+register_insert_hook("belanja", _on_belanja)
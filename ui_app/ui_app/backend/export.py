@@ -0,0 +1,394 @@
+"""Streaming export of the penjualan and belanja ledgers.
+
+Rows are read with a server-side cursor (``yield_per``) and written to the
+response in chunks, so memory use does not grow with the size of the export.
+Parquet needs ``pyarrow``; CSV and XLSX work without extra packages. Exports contain the rows of the tenant named by the
+request's ``X-Tenant-ID`` header.
+"""
+
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from sqlalchemy import select
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from .database import (
+    BelanjaDB,
+    KategoriPengeluaranDB,
+    PenjualanDB,
+    ProdukDB,
+    ReadSessionLocal,
+)
+from .tenant import current_tenant, tenant_from_headers, use_tenant
+
+# Rows fetched per round trip from the server-side cursor.
+FETCH_SIZE = 2000
+# Rows per Parquet row group, which is also the unit that is flushed to the client.
+PARQUET_BATCH_ROWS = 10000
+
+# (column name, value kind) in export order; the kind picks the Parquet type.
+PENJUALAN_COLUMNS = [
+    ("id_penjualan", "int"),
+    ("tanggal_penjualan", "date"),
+    ("id_produk", "int"),
+    ("nama_produk", "str"),
+    ("kuantitas", "int"),
+    ("harga_saat_penjualan", "money"),
+    ("total", "money"),
+    ("catatan", "str"),
+]
+BELANJA_COLUMNS = [
+    ("id_belanja", "int"),
+    ("tanggal_pengeluaran", "date"),
+    ("id_kategori_pengeluaran", "int"),
+    ("nama_kategori", "str"),
+    ("deskripsi", "str"),
+    ("total", "money"),
+    ("metode_pembayaran", "str"),
+    ("bukti_transaksi", "str"),
+    ("catatan", "str"),
+]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
+
+
+def iter_penjualan_rows(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    nama_produk: Optional[str] = None,
+) -> Iterator[Tuple]:
+    """Iterate over the current tenant's penjualan rows (in ``PENJUALAN_COLUMNS`` order) by date.
+
+    The query is built when this is called, so the rows are those of the
+    tenant at call time even if the iterator is consumed elsewhere.
+    """
+    query = (
+        select(
+            PenjualanDB.id_penjualan,
+            PenjualanDB.tanggal_penjualan,
+            PenjualanDB.id_produk,
+            ProdukDB.nama_produk,
+            PenjualanDB.kuantitas,
+            PenjualanDB.harga_saat_penjualan,
+            PenjualanDB.total,
+            PenjualanDB.catatan,
+        )
+        .join(ProdukDB, PenjualanDB.id_produk == ProdukDB.id_produk)
+        .where(PenjualanDB.id_tenant == current_tenant())
+        .order_by(PenjualanDB.tanggal_penjualan, PenjualanDB.id_penjualan)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+    if start:
+        query = query.where(PenjualanDB.tanggal_penjualan >= start)
+    if end:
+        query = query.where(PenjualanDB.tanggal_penjualan <= end)
+    if nama_produk:
+        query = query.where(ProdukDB.nama_produk == nama_produk)
+    return _stream_rows(query)
+
+
+def iter_belanja_rows(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    nama_kategori: Optional[str] = None,
+) -> Iterator[Tuple]:
+    """Iterate over the current tenant's belanja rows (in ``BELANJA_COLUMNS`` order) by date."""
+    query = (
+        select(
+            BelanjaDB.id_belanja,
+            BelanjaDB.tanggal_pengeluaran,
+            BelanjaDB.id_kategori_pengeluaran,
+            KategoriPengeluaranDB.nama_kategori,
+            BelanjaDB.deskripsi,
+            BelanjaDB.total,
+            BelanjaDB.metode_pembayaran,
+            BelanjaDB.bukti_transaksi,
+            BelanjaDB.catatan,
+        )
+        .join(KategoriPengeluaranDB, BelanjaDB.id_kategori_pengeluaran == KategoriPengeluaranDB.id_kategori)
+        .where(BelanjaDB.id_tenant == current_tenant())
+        .order_by(BelanjaDB.tanggal_pengeluaran, BelanjaDB.id_belanja)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+    if start:
+        query = query.where(BelanjaDB.tanggal_pengeluaran >= start)
+    if end:
+        query = query.where(BelanjaDB.tanggal_pengeluaran <= end)
+    if nama_kategori:
+        query = query.where(KategoriPengeluaranDB.nama_kategori == nama_kategori)
+    return _stream_rows(query)
+
+
+def _stream_rows(query) -> Iterator[Tuple]:
+    # The session is opened now, not on first iteration, so the replica is
+    # picked for the current tenant even if the rows are consumed elsewhere.
+    db = ReadSessionLocal()
+
+    def rows() -> Iterator[Tuple]:
+        try:
+            for row in db.execute(query):
+                yield tuple(row)
+        finally:
+            db.close()
+
+    return rows()
+
+
+def stream_csv(columns: List[Tuple[str, str]], rows: Iterable[Tuple]) -> Iterator[bytes]:
+    """Encode rows as CSV, yielding one chunk per ``FETCH_SIZE`` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= FETCH_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode("utf-8")
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are handed out and forgotten."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def arrow_schema(columns: List[Tuple[str, str]]):
+    """Arrow schema for a column spec such as ``PENJUALAN_COLUMNS``."""
+    import pyarrow as pa
+
+    types = {
+        "int": pa.int64(),
+        "date": pa.date32(),
+        "datetime": pa.timestamp("s"),
+        "str": pa.string(),
+        "money": pa.decimal128(12, 2),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def stream_parquet(columns: List[Tuple[str, str]], rows: Iterable[Tuple]) -> Iterator[bytes]:
+    """Encode rows as Parquet, flushing one row group at a time."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(columns)
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+
+    def write_batch(batch: List[Tuple]):
+        arrays = [
+            pa.array(list(values), type=field.type)
+            for values, field in zip(zip(*batch), schema)
+        ]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    batch: List[Tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= PARQUET_BATCH_ROWS:
+            write_batch(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write_batch(batch)
+    writer.close()
+    yield sink.drain()
+
+
+# The fixed parts of a one-sheet workbook. Style 1 shows a date serial as a date.
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="2"><xf/><xf numFmtId="14" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+_EXCEL_EPOCH = date(1899, 12, 30)
+# Characters XML 1.0 cannot carry.
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _xlsx_cell(value) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, datetime):
+        serial = (value - datetime(1899, 12, 30)).total_seconds() / 86400
+        return f'<c s="1"><v>{serial}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - _EXCEL_EPOCH).days}</v></c>'
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_XML_ILLEGAL.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values: Iterable) -> str:
+    return "<row>" + "".join(_xlsx_cell(value) for value in values) + "</row>"
+
+
+def stream_xlsx(columns: List[Tuple[str, str]], rows: Iterable[Tuple], sheet_name: str) -> Iterator[bytes]:
+    """Encode rows as a one-sheet XLSX workbook, yielding one chunk per ``FETCH_SIZE`` rows.
+
+    The workbook is a zip written straight to the response: the sheet is
+    compressed as rows arrive, so memory use does not grow with the export.
+    """
+    sink = _DrainableSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(name for name, _ in columns)
+            ).encode("utf-8"))
+            pending = []
+            for row in rows:
+                pending.append(_xlsx_row(row))
+                if len(pending) >= FETCH_SIZE:
+                    sheet.write("".join(pending).encode("utf-8"))
+                    pending = []
+                    yield sink.drain()
+            sheet.write(("".join(pending) + "</sheetData></worksheet>").encode("utf-8"))
+    yield sink.drain()
+
+
+def export_ledger(request: Request) -> StreamingResponse:
+    """Download the penjualan or belanja ledger as CSV, Parquet or XLSX.
+
+    Query parameters: ``format`` (csv, parquet or xlsx), ``start`` and ``end``
+    (ISO dates, inclusive) and ``filter``, a product name for penjualan and a
+    category name for belanja.
+    """
+    table = request.path_params["table"]
+    export_format = request.query_params.get("format", "csv")
+    start = request.query_params.get("start")
+    end = request.query_params.get("end")
+    name_filter = request.query_params.get("filter")
+    if export_format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported format")
+    start_date, end_date = _parse_date(start), _parse_date(end)
+    try:
+        tenant = tenant_from_headers(request.headers)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid X-Tenant-ID header")
+
+    with use_tenant(tenant):
+        if table == "penjualan":
+            columns = PENJUALAN_COLUMNS
+            rows = iter_penjualan_rows(start_date, end_date, name_filter or None)
+        elif table == "belanja":
+            columns = BELANJA_COLUMNS
+            rows = iter_belanja_rows(start_date, end_date, name_filter or None)
+        else:
+            raise HTTPException(status_code=404, detail="Unknown table")
+
+    if export_format == "csv":
+        body = stream_csv(columns, rows)
+    elif export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export is not available")
+        body = stream_parquet(columns, rows)
+    else:
+        body = stream_xlsx(columns, rows, sheet_name=table)
+
+    filename = f"{table}_{start or 'awal'}_{end or 'akhir'}.{export_format}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+routes = [Route("/export/{table}", export_ledger)]
@@ -0,0 +1,329 @@
+"""Daily revenue forecasting.
+
+Models are fitted on the zero-filled daily revenue series (in cents) of one
+product or of all products, built from the columnar sales in
+``analytics.get_sales_columns``:
+
+- ``moving_average``: mean of the last ``MA_WINDOW`` days.
+- ``exp_smoothing``: simple exponential smoothing.
+- ``holt_winters``: additive Holt-Winters with weekly seasonality.
+
+Smoothing parameters are chosen by a grid search that runs every candidate
+in lockstep as NumPy vectors. Only complete days (up to yesterday) are
+fitted, so sales made today do not touch the fit. When new days complete,
+the fitted state is advanced over just those days with the chosen
+parameters; the grid search is repeated every ``REFIT_EVERY_DAYS`` new days,
+or when older history changed (backdated sales). At most
+``FORECAST_FIT_CACHE_SIZE`` fits are kept, each for up to
+``FORECAST_FIT_TTL_SECONDS``.
+"""
+
+import os
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from .analytics import SalesColumns, get_sales_columns
+from .cache import TTLCache
+from .tenant import tenant_from_headers, use_tenant
+
+MODELS = ("moving_average", "exp_smoothing", "holt_winters")
+HORIZONS = (7, 30)
+
+SEASON = 7
+MA_WINDOW = 7
+REFIT_EVERY_DAYS = 7
+Z_95 = 1.96
+
+FIT_CACHE_SIZE = int(os.getenv("FORECAST_FIT_CACHE_SIZE", "256"))
+FIT_TTL_SECONDS = float(os.getenv("FORECAST_FIT_TTL_SECONDS", "3600"))
+
+_ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.5, 0.7])
+_BETAS = np.array([0.0, 0.01, 0.05, 0.1])
+_GAMMAS = np.array([0.05, 0.1, 0.2, 0.4])
+
+
+class FittedModel:
+    """Fitted state of one model over one daily series.
+
+    The series covers ``[start, end)`` as date ordinals. ``processed_total``
+    is the series sum at fit time, used to detect changes to the history.
+    """
+
+    def __init__(self, model: str, start: int):
+        self.model = model
+        self.start = start
+        self.end = start
+        self.processed_total = 0.0
+        self.days_since_refit = 0
+        # Smoothing state (exp_smoothing / holt_winters)
+        self.params = (0.0, 0.0, 0.0)
+        self.level = 0.0
+        self.trend = 0.0
+        self.seasonal = np.zeros(SEASON)  # indexed by ordinal % SEASON
+        # Moving average state
+        self.window = np.zeros(0)
+        # One-step-ahead error statistics
+        self.sse = 0.0
+        self.errors = 0
+
+    @property
+    def sigma(self) -> float:
+        return float(np.sqrt(self.sse / self.errors)) if self.errors else 0.0
+
+    def forecast(self, horizon: int) -> List[Dict]:
+        """Forecast the ``horizon`` days starting at ``end``, with 95% intervals."""
+        points = []
+        for h in range(1, horizon + 1):
+            day = self.end + h - 1
+            if self.model == "moving_average":
+                value = float(self.window.mean()) if len(self.window) else 0.0
+            else:
+                value = self.level + h * self.trend + self.seasonal[day % SEASON]
+            spread = Z_95 * self.sigma * np.sqrt(h)
+            value = max(value, 0.0)
+            points.append({
+                "date": date.fromordinal(day).isoformat(),
+                "forecast": int(round(value)),
+                "lower": int(round(max(value - spread, 0.0))),
+                "upper": int(round(value + spread)),
+            })
+        return points
+
+
+# Kernels -------------------------------------------------------------------
+
+
+def daily_series(cols: SalesColumns, product_code: Optional[int], end: int) -> Tuple[int, np.ndarray]:
+    """Zero-filled revenue per day (cents) from the first sale up to ``end``.
+
+    Returns:
+        (start ordinal, series) where ``series[i]`` is the revenue of day
+        ``start + i``.
+    """
+    mask = cols.dates < end
+    if product_code is not None:
+        mask &= cols.products == product_code
+    dates = cols.dates[mask]
+    if len(dates) == 0:
+        return end, np.zeros(0)
+    start = int(dates[0])  # columns are sorted by date
+    series = np.bincount(dates - start, weights=cols.totals[mask], minlength=end - start)
+    return start, series
+
+
+def _smooth(model: FittedModel, y: np.ndarray, alphas, betas, gammas, level, trend, seasonal):
+    """Run additive Holt-Winters over ``y`` for k parameter sets at once.
+
+    ``alphas``/``betas``/``gammas``/``level``/``trend`` have shape (k,),
+    ``seasonal`` has shape (k, SEASON). Simple exponential smoothing is the
+    special case beta = gamma = 0 with zero trend and season.
+
+    Returns:
+        (level, trend, seasonal, sse) after the last observation.
+    """
+    seasonal = seasonal.copy()
+    sse = np.zeros(len(alphas))
+    rows = np.arange(len(alphas))
+    for offset, value in enumerate(y):
+        slot = (model.end + offset) % SEASON
+        season = seasonal[rows, slot]
+        error = value - (level + trend + season)
+        sse += error * error
+        new_level = alphas * (value - season) + (1 - alphas) * (level + trend)
+        trend = betas * (new_level - level) + (1 - betas) * trend
+        seasonal[rows, slot] = gammas * (value - new_level) + (1 - gammas) * season
+        level = new_level
+    return level, trend, seasonal, sse
+
+
+def _initial_state(model: str, y: np.ndarray, start: int):
+    """Starting level, trend and season (ordinal-indexed) before ``y[0]``."""
+    seasonal = np.zeros(SEASON)
+    if model != "holt_winters":
+        return float(y[0]), 0.0, seasonal
+    first = y[:SEASON].mean()
+    second = y[SEASON:2 * SEASON].mean()
+    seasonal[(start + np.arange(SEASON)) % SEASON] = y[:SEASON] - first
+    return float(first), float((second - first) / SEASON), seasonal
+
+
+def _grid(model: str):
+    if model == "holt_winters":
+        a, b, g = np.meshgrid(_ALPHAS, _BETAS, _GAMMAS, indexing="ij")
+        return a.ravel(), b.ravel(), g.ravel()
+    zeros = np.zeros(len(_ALPHAS))
+    return _ALPHAS, zeros, zeros
+
+
+def _fit(model: str, start: int, y: np.ndarray) -> FittedModel:
+    """Fit from scratch, choosing parameters by one-step-ahead SSE."""
+    fitted = FittedModel(model, start)
+    if model == "moving_average":
+        _advance_moving_average(fitted, y)
+    else:
+        alphas, betas, gammas = _grid(model)
+        k = len(alphas)
+        level, trend, seasonal = _initial_state(model, y, start)
+        level_k, trend_k, seasonal_k, sse = _smooth(
+            fitted, y, alphas, betas, gammas,
+            np.full(k, level), np.full(k, trend), np.tile(seasonal, (k, 1)),
+        )
+        best = int(np.argmin(sse))
+        fitted.params = (float(alphas[best]), float(betas[best]), float(gammas[best]))
+        fitted.level = float(level_k[best])
+        fitted.trend = float(trend_k[best])
+        fitted.seasonal = seasonal_k[best]
+        fitted.sse = float(sse[best])
+        fitted.errors = len(y)
+        fitted.end += len(y)
+    fitted.processed_total = float(y.sum())
+    return fitted
+
+
+def _advance_moving_average(fitted: FittedModel, y: np.ndarray):
+    history = np.concatenate((fitted.window, y))
+    skip = len(fitted.window)
+    # Prediction for history[i] is the mean of the MA_WINDOW values before it.
+    sums = np.concatenate(([0.0], np.cumsum(history)))
+    index = np.arange(max(skip, 1), len(history))
+    counts = np.minimum(index, MA_WINDOW)
+    predictions = (sums[index] - sums[index - counts]) / counts
+    errors = history[index] - predictions
+    fitted.sse += float(errors @ errors)
+    fitted.errors += len(errors)
+    fitted.window = history[-MA_WINDOW:]
+    fitted.end += len(y)
+
+
+def _advance(fitted: FittedModel, y: np.ndarray):
+    """Feed newly completed days through the fitted model."""
+    if fitted.model == "moving_average":
+        _advance_moving_average(fitted, y)
+    else:
+        alpha, beta, gamma = fitted.params
+        level, trend, seasonal, sse = _smooth(
+            fitted, y, np.array([alpha]), np.array([beta]), np.array([gamma]),
+            np.array([fitted.level]), np.array([fitted.trend]), fitted.seasonal[None, :],
+        )
+        fitted.level = float(level[0])
+        fitted.trend = float(trend[0])
+        fitted.seasonal = seasonal[0]
+        fitted.sse += float(sse[0])
+        fitted.errors += len(y)
+        fitted.end += len(y)
+    fitted.processed_total += float(y.sum())
+    fitted.days_since_refit += len(y)
+
+
+def _usable_model(model: str, days: int) -> str:
+    """Fall back to a simpler model when the history is too short."""
+    if model == "holt_winters" and days < 2 * SEASON:
+        model = "exp_smoothing"
+    if model == "exp_smoothing" and days < 2:
+        model = "moving_average"
+    return model
+
+
+# Cached fits ---------------------------------------------------------------
+
+# One slot per (tenant, product, model), holding the fit that is advanced in place.
+_fits = TTLCache("forecast_fits", FIT_TTL_SECONDS, max_entries=FIT_CACHE_SIZE)
+_fits_lock = threading.Lock()
+
+
+def _forecast_points(
+    cols: SalesColumns, product: str, model: str, end: int, horizon: int
+) -> Optional[Tuple[str, List[Dict]]]:
+    """Fit (or reuse and advance) the cached model and forecast ``horizon`` days from ``end``.
+
+    The points are built while holding ``_fits_lock``, as other sessions
+    advance the same cached fit in place.
+
+    Returns:
+        (model used, points), or None without sales history.
+    """
+    product_code = None
+    if product != "All Products":
+        product_code = cols.product_code(product)
+        if product_code < 0:
+            return None
+    start, series = daily_series(cols, product_code, end)
+    if len(series) == 0:
+        return None
+    model = _usable_model(model, len(series))
+    slot: List[Optional[FittedModel]] = _fits.get_or_compute((product, model), lambda: [None])
+
+    with _fits_lock:
+        fitted = slot[0]
+        if fitted is not None and fitted.end == end:
+            if fitted.start != start or float(series.sum()) != fitted.processed_total:
+                fitted = None
+        elif (
+            fitted is not None
+            and fitted.start == start
+            and fitted.end < end
+            and fitted.days_since_refit < REFIT_EVERY_DAYS
+            and float(series[: fitted.end - start].sum()) == fitted.processed_total
+        ):
+            _advance(fitted, series[fitted.end - start:])
+        else:
+            fitted = None
+
+        if fitted is None:
+            fitted = _fit(model, start, series)
+            slot[0] = fitted
+        return fitted.model, fitted.forecast(horizon)
+
+
+def get_forecast(
+    product: str = "All Products",
+    horizon: int = 7,
+    model: str = "holt_winters",
+    today: Optional[date] = None,
+) -> Dict:
+    """Forecast daily revenue from today on.
+
+    Returns:
+        ``{"model": ..., "points": [{"date", "forecast", "lower", "upper"}]}``
+        with amounts in cents. ``model`` is the model actually used, which
+        is simpler than the requested one when the history is short.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model: {model}")
+    if horizon not in HORIZONS:
+        raise ValueError(f"Unsupported horizon: {horizon}")
+    end = (today or date.today()).toordinal()
+    try:
+        result = _forecast_points(get_sales_columns(), product, model, end, horizon)
+    except Exception as e:
+        print(f"Error fitting forecast: {e}")
+        result = None
+    if result is None:
+        return {"model": model, "points": []}
+    used, points = result
+    return {"model": used, "points": points}
+
+
+def forecast_endpoint(request: Request) -> JSONResponse:
+    """Serve ``/forecast?product=...&horizon=7|30&model=...`` as JSON."""
+    params = request.query_params
+    try:
+        horizon = int(params.get("horizon", "7"))
+        with use_tenant(tenant_from_headers(request.headers)):
+            result = get_forecast(
+                params.get("product", "All Products"),
+                horizon,
+                params.get("model", "holt_winters"),
+            )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"product": params.get("product", "All Products"), "horizon": horizon, **result})
+
+
+routes = [Route("/forecast", forecast_endpoint)]
@@ -0,0 +1,299 @@
+"""Full-text search over penjualan notes and belanja descriptions.
+
+PostgreSQL uses GIN indexes on ``to_tsvector('simple', ...)`` for ranked
+prefix matching plus ``pg_trgm`` indexes for fuzzy (misspelled) matches.
+SQLite uses FTS5 tables kept in sync with triggers, ranked by ``bm25``.
+Searches also match rows whose product (penjualan) or category (belanja)
+name contains the query.
+
+Only the current tenant's rows are searched.
+
+Highlighted text is returned HTML-escaped with the matches wrapped in
+``<mark>``, ready for ``rx.html``.
+"""
+
+import html
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import column, func, literal, literal_column, or_, select, table, text
+
+from .database import (
+    Belanja,
+    BelanjaDB,
+    KategoriPengeluaranDB,
+    Penjualan,
+    PenjualanDB,
+    ProdukDB,
+    belanja_model,
+    get_engine,
+    penjualan_model,
+)
+from .tenant import current_tenant
+
+MAX_TERMS = 8
+MAX_RANKED = 1000  # larger result sets are listed newest first instead of by relevance
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+# PostgreSQL: (table, index name, indexed expression, trigram column)
+_PG_INDEXES = [
+    ("penjualan", "ix_penjualan_fts", "to_tsvector('simple', coalesce(catatan, ''))", "catatan"),
+    ("belanja", "ix_belanja_fts", "to_tsvector('simple', coalesce(deskripsi, '') || ' ' || coalesce(catatan, ''))", "deskripsi"),
+]
+
+# SQLite: (table, id column, FTS columns)
+_SQLITE_TABLES = [
+    ("penjualan", "id_penjualan", ("catatan",)),
+    ("belanja", "id_belanja", ("deskripsi", "catatan")),
+]
+
+_trigram = False  # whether pg_trgm is available
+
+
+def create_search_indexes():
+    """Create the full-text indexes (PostgreSQL) or FTS5 tables (SQLite) if missing."""
+    global _trigram
+    engine = get_engine()
+    try:
+        if engine.dialect.name == "postgresql":
+            with engine.begin() as conn:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                    _trigram = True
+                except Exception as e:
+                    print(f"pg_trgm is not available, fuzzy search disabled: {e}")
+                for table_name, index, expression, trigram_column in _PG_INDEXES:
+                    conn.execute(text(
+                        f"CREATE INDEX IF NOT EXISTS {index} ON {table_name} USING gin (({expression}))"
+                    ))
+                    if _trigram:
+                        conn.execute(text(
+                            f"CREATE INDEX IF NOT EXISTS ix_{table_name}_{trigram_column}_trgm "
+                            f"ON {table_name} USING gin ({trigram_column} gin_trgm_ops)"
+                        ))
+        elif engine.dialect.name == "sqlite":
+            with engine.begin() as conn:
+                for table_name, id_column, columns in _SQLITE_TABLES:
+                    _create_fts5(conn, table_name, id_column, columns)
+    except Exception as e:
+        print(f"Error creating search indexes: {e}")
+
+
+def _create_fts5(conn, table_name: str, id_column: str, columns: Tuple[str, ...]):
+    fts = f"{table_name}_fts"
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts}
+    ).first()
+    if exists:
+        return
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    old_values = ", ".join(f"old.{c}" for c in columns)
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table_name}', "
+        f"content_rowid='{id_column}', tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table_name} BEGIN "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.{id_column}, {new_values}); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table_name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.{id_column}, {old_values}); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table_name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.{id_column}, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.{id_column}, {new_values}); END"
+    ))
+    conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+    print(f"Created full-text index {fts}")
+
+
+def _terms(search: str) -> List[str]:
+    """Lowercased words of ``search``; the last one is matched as a prefix (search as you type)."""
+    return _TERM.findall(search.lower())[:MAX_TERMS]
+
+
+def highlight_html(value: Optional[str], terms: List[str]) -> str:
+    """``value`` HTML-escaped with the matched words in ``<mark>``.
+
+    Returns "" when nothing is highlighted, so the plain value can be shown.
+    """
+    if not value or not terms:
+        return ""
+    words = [re.escape(term) + r"\b" for term in terms[:-1]] + [re.escape(terms[-1]) + r"\w*"]
+    pattern = re.compile(r"\b(?:" + "|".join(words) + ")", re.IGNORECASE)
+    parts, last = [], 0
+    for match in pattern.finditer(value):
+        parts.append(html.escape(value[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        last = match.end()
+    if not parts:
+        return ""
+    parts.append(html.escape(value[last:]))
+    return "".join(parts)
+
+
+def _text_matches(kind: str, terms: List[str], search: str):
+    """Select of (id, rank) for the current tenant's rows whose text matches the search terms."""
+    model = PenjualanDB if kind == "penjualan" else BelanjaDB
+    id_column, _ = _owner_columns(kind)
+    if get_engine().dialect.name == "sqlite":
+        fts_name = f"{kind}_fts"
+        fts = table(fts_name, column("rowid"))
+        fts_table = literal_column(fts_name)
+        return (
+            select(fts.c.rowid.label("id"), (-func.bm25(fts_table)).label("rank"))
+            .select_from(fts)
+            .join(model, id_column == fts.c.rowid)
+            .where(
+                fts_table.op("MATCH")(" ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])),
+                model.id_tenant == current_tenant(),
+            )
+        )
+
+    if kind == "penjualan":
+        shown = PenjualanDB.catatan
+        document = func.coalesce(PenjualanDB.catatan, literal_column("''"))
+    else:
+        shown = BelanjaDB.deskripsi
+        document = (
+            func.coalesce(BelanjaDB.deskripsi, literal_column("''"))
+            .op("||")(literal_column("' '"))
+            .op("||")(func.coalesce(BelanjaDB.catatan, literal_column("''")))
+        )
+    config = literal_column("'simple'")
+    vector = func.to_tsvector(config, document)
+    query = func.to_tsquery(config, " & ".join(terms[:-1] + [f"{terms[-1]}:*"]))
+    rank = func.ts_rank(vector, query)
+    condition = vector.op("@@")(query)
+    if _trigram:
+        rank = rank + func.word_similarity(search, shown)
+        condition = or_(condition, literal(search).op("<%")(shown))
+    return select(id_column.label("id"), rank.label("rank")).where(condition, model.id_tenant == current_tenant())
+
+
+def _name_ids(db, kind: str, search: str) -> List[int]:
+    """Ids of the tenant's products (penjualan) or categories (belanja) whose name contains ``search``."""
+    if kind == "penjualan":
+        model, id_column, name_column = ProdukDB, ProdukDB.id_produk, ProdukDB.nama_produk
+    else:
+        model, id_column, name_column = (
+            KategoriPengeluaranDB, KategoriPengeluaranDB.id_kategori, KategoriPengeluaranDB.nama_kategori
+        )
+    # "%" and "_" in the search are literal characters, not wildcards.
+    pattern = search.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return list(db.execute(
+        select(id_column).where(
+            name_column.ilike(f"%{pattern}%", escape="\\"), model.id_tenant == current_tenant()
+        )
+    ).scalars())
+
+
+def _owner_columns(kind: str):
+    if kind == "penjualan":
+        return PenjualanDB.id_penjualan, PenjualanDB.id_produk
+    return BelanjaDB.id_belanja, BelanjaDB.id_kategori_pengeluaran
+
+
+def _search_ids(db, kind: str, search: str, offset: int = 0, limit: Optional[int] = None) -> List[int]:
+    """Ids of one page of rows matching ``search``.
+
+    Rows match on their text or on their product/category name. Up to
+    ``MAX_RANKED`` text matches are ordered by relevance; larger result sets,
+    or ones including a whole product/category, are ordered newest first so
+    that not every match has to be scored or sorted.
+    """
+    id_column, owner_column = _owner_columns(kind)
+    matches = _text_matches(kind, _terms(search), search)
+    name_ids = _name_ids(db, kind, search)
+    end = None if limit is None else offset + limit
+
+    match_id = matches.selected_columns.id
+    newest = matches.order_by(match_id.desc())
+    if not name_ids:
+        # One pass: the newest matches, scored, tell whether there are few enough to rank.
+        window = MAX_RANKED + 1 if end is None else max(MAX_RANKED + 1, end)
+        scored = db.execute(newest.limit(window)).all()
+        if len(scored) <= MAX_RANKED:
+            scored.sort(key=lambda row: (row.rank, row.id), reverse=True)
+            return [row.id for row in scored[offset:end]]
+        if end is not None:
+            return [row.id for row in scored[offset:end]]
+
+    # The newest ``end`` rows overall are among the newest ``end`` of each kind of match.
+    ids = set(db.execute(newest.with_only_columns(match_id).limit(end)).scalars())
+    if name_ids:
+        ids.update(db.execute(
+            select(id_column).where(owner_column.in_(name_ids)).order_by(id_column.desc()).limit(end)
+        ).scalars())
+    return sorted(ids, reverse=True)[offset:end]
+
+
+def _search_rows(db, kind: str, search: str, base, offset: int = 0, limit: Optional[int] = None):
+    """Rows of ``base`` (a select from the table) for one page of matches, in match order."""
+    id_column, _ = _owner_columns(kind)
+    ids = _search_ids(db, kind, search, offset, limit)
+    if not ids:
+        return []
+    rows = {getattr(row[0], id_column.key): row for row in db.execute(base.where(id_column.in_(ids))).all()}
+    return [rows[id] for id in ids if id in rows]
+
+
+def _count_matches(db, kind: str, search: str) -> int:
+    terms = _terms(search)
+    if not terms:
+        return 0
+    id_column, owner_column = _owner_columns(kind)
+    matches = _text_matches(kind, terms, search).subquery()
+    name_ids = _name_ids(db, kind, search)
+    if not name_ids:
+        return db.execute(select(func.count()).select_from(matches)).scalar() or 0
+    # Rows of the matching products/categories plus text matches outside them.
+    owned = db.execute(select(func.count()).where(owner_column.in_(name_ids))).scalar() or 0
+    others = db.execute(
+        select(func.count())
+        .select_from(matches)
+        .join(id_column.table, id_column == matches.c.id)
+        .where(owner_column.not_in(name_ids))
+    ).scalar() or 0
+    return owned + others
+
+
+def search_penjualan(db, search: str, offset: int = 0, limit: Optional[int] = None) -> List[Penjualan]:
+    """Penjualan rows matching ``search``, most relevant first."""
+    terms = _terms(search)
+    if not terms:
+        return []
+    base = select(PenjualanDB, ProdukDB.nama_produk).join(ProdukDB, PenjualanDB.id_produk == ProdukDB.id_produk)
+    return [
+        penjualan_model(record, nama, highlight_html(record.catatan, terms))
+        for record, nama in _search_rows(db, "penjualan", search, base, offset, limit)
+    ]
+
+
+def search_belanja(db, search: str, offset: int = 0, limit: Optional[int] = None) -> List[Belanja]:
+    """Belanja rows matching ``search``, most relevant first."""
+    terms = _terms(search)
+    if not terms:
+        return []
+    base = select(BelanjaDB, KategoriPengeluaranDB.nama_kategori).join(
+        KategoriPengeluaranDB, BelanjaDB.id_kategori_pengeluaran == KategoriPengeluaranDB.id_kategori
+    )
+    return [
+        belanja_model(record, nama, highlight_html(record.deskripsi, terms))
+        for record, nama in _search_rows(db, "belanja", search, base, offset, limit)
+    ]
+
+
+def count_penjualan_matches(db, search: str) -> int:
+    """Number of penjualan rows matching ``search``."""
+    return _count_matches(db, "penjualan", search)
+
+
+def count_belanja_matches(db, search: str) -> int:
+    """Number of belanja rows matching ``search``."""
+    return _count_matches(db, "belanja", search)
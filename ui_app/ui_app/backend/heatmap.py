@@ -0,0 +1,123 @@
+"""Weekday x hour sales heatmap.
+
+Reads the ``penjualan_jam`` matrix, which the penjualan insert functions
+keep up to date. A heatmap is at most 7 x 24 rows per product, so reading it
+does not depend on how much sales history there is. Rows belong to the
+tenant of their product.
+"""
+
+from typing import List, Optional
+
+import reflex as rx
+from sqlalchemy import Integer, cast, func, select
+
+from .cache import VersionedCache
+from .database import PenjualanDB, PenjualanJamDB, ProdukDB, ReadSessionLocal, bump_all_tenants, get_engine
+from .tenant import current_tenant
+from .money import cents_column
+
+HARI = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]  # weekday 0 = Monday
+JAM = list(range(24))
+
+_heatmap_cache = VersionedCache("heatmap", ("penjualan_jam",))
+
+
+class HeatmapCell(rx.Base):
+    """One weekday/hour cell."""
+    jam: int
+    nilai: int
+    intensitas: float  # shade from 0 (no sales) to 1 (the busiest cell)
+    judul: str
+
+
+class HeatmapRow(rx.Base):
+    """One weekday of the heatmap."""
+    hari: str
+    cells: List[HeatmapCell]
+
+
+def _load_matrix(id_produk: Optional[int]):
+    query = select(
+        PenjualanJamDB.hari,
+        PenjualanJamDB.jam,
+        func.sum(PenjualanJamDB.transaksi),
+        func.sum(PenjualanJamDB.total_sen),
+    ).join(ProdukDB, PenjualanJamDB.id_produk == ProdukDB.id_produk).where(
+        ProdukDB.id_tenant == current_tenant()
+    ).group_by(PenjualanJamDB.hari, PenjualanJamDB.jam)
+    if id_produk is not None:
+        query = query.where(PenjualanJamDB.id_produk == id_produk)
+
+    orders = [[0] * 24 for _ in HARI]
+    revenue = [[0] * 24 for _ in HARI]
+    db = ReadSessionLocal()
+    try:
+        for hari, jam, transaksi, total in db.execute(query):
+            orders[hari][jam] = int(transaksi or 0)
+            revenue[hari][jam] = int(total or 0)
+    finally:
+        db.close()
+    return orders, revenue
+
+
+def get_heatmap_matrix(id_produk: Optional[int] = None):
+    """Orders and revenue (cents) per [weekday][hour], for one product or all of the current tenant's."""
+    return _heatmap_cache.get_or_compute(id_produk, lambda: _load_matrix(id_produk))
+
+
+def get_heatmap(id_produk: Optional[int] = None, metric: str = "orders") -> List[HeatmapRow]:
+    """Heatmap rows, Monday first, of orders or revenue for one product or all."""
+    try:
+        orders, revenue = get_heatmap_matrix(id_produk)
+    except Exception as e:
+        print(f"Error loading heatmap: {e}")
+        return []
+    matrix = revenue if metric == "revenue" else orders
+    peak = max(max(row) for row in matrix) or 1
+    return [
+        HeatmapRow(
+            hari=hari,
+            cells=[
+                HeatmapCell(
+                    jam=jam,
+                    nilai=matrix[i][jam],
+                    intensitas=round(0.12 + 0.88 * matrix[i][jam] / peak, 3) if matrix[i][jam] else 0.0,
+                    judul=f"{hari} {jam:02d}:00 - {orders[i][jam]} orders",
+                )
+                for jam in JAM
+            ],
+        )
+        for i, hari in enumerate(HARI)
+    ]
+
+
+def rebuild_heatmap() -> bool:
+    """Recompute the matrix of all tenants from penjualan (repair only)."""
+    if get_engine().dialect.name == "sqlite":
+        hari = (cast(func.strftime("%w", PenjualanDB.waktu_penjualan), Integer) + 6) % 7
+        jam = cast(func.strftime("%H", PenjualanDB.waktu_penjualan), Integer)
+    else:
+        hari = cast(func.extract("isodow", PenjualanDB.waktu_penjualan), Integer) - 1
+        jam = cast(func.extract("hour", PenjualanDB.waktu_penjualan), Integer)
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(PenjualanJamDB.__table__.delete())
+            conn.execute(
+                PenjualanJamDB.__table__.insert().from_select(
+                    ["id_produk", "hari", "jam", "transaksi", "total_sen"],
+                    select(
+                        PenjualanDB.id_produk,
+                        hari,
+                        jam,
+                        func.count(),
+                        func.sum(cents_column(PenjualanDB.total)),
+                    )
+                    .where(PenjualanDB.waktu_penjualan.is_not(None))
+                    .group_by(PenjualanDB.id_produk, hari, jam),
+                )
+            )
+        bump_all_tenants("penjualan_jam")
+        return True
+    except Exception as e:
+        print(f"Error rebuilding heatmap: {e}")
+        return False
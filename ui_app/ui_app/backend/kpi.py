@@ -0,0 +1,121 @@
+"""Month-over-month KPIs for the stats cards.
+
+Revenue, order count and average order value of the current month to date
+are compared with the same days of the previous month. Both months are
+summed from one daily rollup query (orders and revenue per day) over the
+two months, plus the rollups in ``arsip_ringkasan`` when last month's year
+has been archived (``archive.py``), and the result is kept in a short-TTL cache shared by all
+sessions of a tenant, so page views within ``KPI_TTL_SECONDS`` do not query the
+database. Entries are also keyed by the penjualan and archive data
+versions, so recorded sales show up immediately.
+"""
+
+import os
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import reflex as rx
+from sqlalchemy import func, select
+
+from .cache import TTLCache, data_version
+from .database import ArsipRingkasanDB, PenjualanDB, ReadSessionLocal
+from .money import cents_column, divide_cents
+from .tenant import current_tenant
+
+KPI_TTL_SECONDS = float(os.getenv("KPI_TTL_SECONDS", "30"))
+
+_kpi_cache = TTLCache("kpi", KPI_TTL_SECONDS, max_entries=256)
+
+
+class Kpi(rx.Base):
+    """One KPI for the current and the previous period."""
+    nama: str
+    nilai: int
+    sebelumnya: int
+    perubahan: float  # percent change from ``sebelumnya``
+    naik: bool
+
+
+def _month_windows(today: date) -> Tuple[date, date, date]:
+    """Start of this month, start of last month and the last comparable day of last month."""
+    start = today.replace(day=1)
+    previous_start = (start - timedelta(days=1)).replace(day=1)
+    previous_end = min(previous_start + timedelta(days=today.day - 1), start - timedelta(days=1))
+    return start, previous_start, previous_end
+
+
+def _daily_rollup(start: date, end: date) -> Dict[date, Tuple[int, int]]:
+    """Orders and revenue (cents) per day from ``start`` to ``end`` inclusive."""
+    query = (
+        select(
+            PenjualanDB.tanggal_penjualan,
+            func.count(),
+            func.sum(cents_column(PenjualanDB.total)),
+        )
+        .where(
+            PenjualanDB.id_tenant == current_tenant(),
+            PenjualanDB.tanggal_penjualan >= start,
+            PenjualanDB.tanggal_penjualan <= end,
+        )
+        .group_by(PenjualanDB.tanggal_penjualan)
+    )
+    archived = select(
+        ArsipRingkasanDB.tanggal,
+        func.sum(ArsipRingkasanDB.transaksi),
+        func.sum(ArsipRingkasanDB.total_sen),
+    ).where(
+        ArsipRingkasanDB.id_tenant == current_tenant(),
+        ArsipRingkasanDB.tabel == "penjualan",
+        ArsipRingkasanDB.tanggal >= start,
+        ArsipRingkasanDB.tanggal <= end,
+    ).group_by(ArsipRingkasanDB.tanggal)
+    rollup: Dict[date, Tuple[int, int]] = {}
+    db = ReadSessionLocal()
+    try:
+        for tanggal, orders, revenue in [*db.execute(query), *db.execute(archived)]:
+            previous_orders, previous_revenue = rollup.get(tanggal, (0, 0))
+            rollup[tanggal] = (previous_orders + int(orders or 0), previous_revenue + int(revenue or 0))
+    finally:
+        db.close()
+    return rollup
+
+
+def _kpi(nama: str, nilai: int, sebelumnya: int) -> Kpi:
+    if sebelumnya:
+        perubahan = round((nilai - sebelumnya) / sebelumnya * 100, 2)
+    else:
+        perubahan = 100.0 if nilai else 0.0
+    return Kpi(nama=nama, nilai=nilai, sebelumnya=sebelumnya, perubahan=perubahan, naik=nilai >= sebelumnya)
+
+
+def _compute_kpis(today: date) -> List[Kpi]:
+    start, previous_start, previous_end = _month_windows(today)
+    rollup = _daily_rollup(previous_start, today)
+
+    def totals(first: date, last: date) -> Tuple[int, int]:
+        days = [value for day, value in rollup.items() if first <= day <= last]
+        return sum(orders for orders, _ in days), sum(revenue for _, revenue in days)
+
+    orders, revenue = totals(start, today)
+    previous_orders, previous_revenue = totals(previous_start, previous_end)
+    return [
+        _kpi("Revenue", revenue, previous_revenue),
+        _kpi("Orders", orders, previous_orders),
+        _kpi(
+            "Average Order Value",
+            divide_cents(revenue, orders),
+            divide_cents(previous_revenue, previous_orders),
+        ),
+    ]
+
+
+def get_kpis(today: Optional[date] = None) -> List[Kpi]:
+    """Revenue (cents), orders and average order value (cents), month to date vs last month."""
+    today = today or date.today()
+    try:
+        return _kpi_cache.get_or_compute(
+            (today, data_version("penjualan", "arsip")), lambda: _compute_kpis(today)
+        )
+    except Exception as e:
+        print(f"Error computing KPIs: {e}")
+        return []
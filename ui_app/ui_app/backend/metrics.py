@@ -0,0 +1,356 @@
+"""Prometheus-style metrics for the backend.
+
+The registry is a small in-process implementation of counters, gauges and
+histograms that renders the Prometheus text exposition format. Recording a
+sample is a dict lookup plus a bisect, so it is safe to leave enabled under
+load.
+"""
+
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+
+# Buckets in seconds, tuned for event handlers and single queries.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+BYTE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Measuring the state delta means serializing it, so only every Nth event is sampled.
+DELTA_SAMPLE_EVERY = max(1, int(os.getenv("METRICS_DELTA_SAMPLE_EVERY", "10")))
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, values)} {value}"
+            for values, value in items
+        ]
+
+
+class Gauge:
+    """Gauge whose value is either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] = value
+
+    def collect(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                items = list(self.callback().items())
+            except Exception as e:
+                print(f"Error collecting gauge {self.name}: {e}")
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, values)} {value}"
+            for values, value in items
+        ]
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[label_values] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(values, list(counts), total[0]) for values, (counts, total) in self._series.items()]
+        lines = []
+        for values, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(self.labels, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += counts[-1]
+            inf = _format_labels(self.labels, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together on scrape."""
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+EVENT_DURATION = REGISTRY.register(Histogram(
+    "umkm_event_handler_duration_seconds",
+    "Time spent in state event handlers.",
+    labels=("handler",),
+))
+EVENT_ERRORS = REGISTRY.register(Counter(
+    "umkm_event_handler_errors_total",
+    "Event handlers that raised an exception.",
+    labels=("handler",),
+))
+STATE_DELTA_BYTES = REGISTRY.register(Histogram(
+    "umkm_state_delta_bytes",
+    "Serialized size of the state delta produced by an event handler (sampled).",
+    labels=("handler",),
+    buckets=BYTE_BUCKETS,
+))
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    "umkm_db_query_duration_seconds",
+    "Duration of SQL statements.",
+    labels=("statement",),
+))
+DB_ROWS_FETCHED = REGISTRY.register(Histogram(
+    "umkm_db_rows_fetched",
+    "Rows returned by SELECT statements.",
+    buckets=ROW_BUCKETS,
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "umkm_cache_requests_total",
+    "Cache lookups by cache name and result.",
+    labels=("cache", "result"),
+))
+DB_READS = REGISTRY.register(Counter(
+    "umkm_db_read_sessions_total",
+    "Read-only sessions by the engine they were routed to and why.",
+    labels=("role", "reason"),
+))
+
+# Instrumented engines by role ("primary", "replica")
+_engines: Dict[str, object] = {}
+
+
+def _pool_stats() -> Dict[LabelValues, float]:
+    stats = {}
+    for role, engine in list(_engines.items()):
+        for stat in ("size", "checkedout", "overflow", "checkedin"):
+            getter = getattr(engine.pool, stat, None)
+            if getter is not None:
+                stats[(role, engine.url.database or "default", stat)] = float(getter())
+    return stats
+
+
+REGISTRY.register(Gauge(
+    "umkm_db_pool_connections",
+    "Connection pool usage by engine role and statistic.",
+    labels=("role", "database", "stat"),
+    callback=_pool_stats,
+))
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup as a hit or a miss."""
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def _state_delta_size(state) -> Optional[int]:
+    """Serialized size of the pending delta of a state, or None if unavailable."""
+    try:
+        delta = state.get_delta()
+    except Exception:
+        return None
+    return len(json.dumps(delta, default=str).encode("utf-8"))
+
+
+def timed_event(fn):
+    """Decorate a state event handler to record its latency and delta size.
+
+    The handler is labelled by its qualified name, e.g. ``"TableState.submit_form"``.
+    """
+    name = fn.__qualname__
+    calls = itertools.count(1)
+
+    def _finish(state, start: float):
+        EVENT_DURATION.observe(time.perf_counter() - start, name)
+        if next(calls) % DELTA_SAMPLE_EVERY == 0:
+            size = _state_delta_size(state)
+            if size is not None:
+                STATE_DELTA_BYTES.observe(size, name)
+
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def async_gen_wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                async for update in fn(self, *args, **kwargs):
+                    yield update
+            except Exception:
+                EVENT_ERRORS.inc(name)
+                raise
+            finally:
+                _finish(self, start)
+        return async_gen_wrapper
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(self, *args, **kwargs)
+            except Exception:
+                EVENT_ERRORS.inc(name)
+                raise
+            finally:
+                _finish(self, start)
+        return async_wrapper
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def gen_wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                yield from fn(self, *args, **kwargs)
+            except Exception:
+                EVENT_ERRORS.inc(name)
+                raise
+            finally:
+                _finish(self, start)
+        return gen_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(self, *args, **kwargs)
+        except Exception:
+            EVENT_ERRORS.inc(name)
+            raise
+        finally:
+            _finish(self, start)
+    return wrapper
+
+
+def _statement_kind(statement: str) -> str:
+    """First keyword of a SQL statement, used as a low-cardinality label."""
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+def instrument_engine(engine, role: str = "primary"):
+    """Attach query timing listeners and pool gauges to a SQLAlchemy engine.
+
+    Args:
+        engine: The engine.
+        role: ``"primary"`` or ``"replica"``, the pool gauge label.
+    """
+    from sqlalchemy import event
+
+    # The start time lives on the statement's execution context, so a failed
+    # statement leaves nothing behind on the pooled connection.
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_query_start", None)
+        if start is None:
+            return
+        kind = _statement_kind(statement)
+        DB_QUERY_DURATION.observe(time.perf_counter() - start, kind)
+        if kind in ("SELECT", "WITH") and cursor.rowcount is not None and cursor.rowcount >= 0:
+            DB_ROWS_FETCHED.observe(cursor.rowcount)
+
+    _engines[role] = engine
+
+
+def metrics_endpoint(request: Request) -> PlainTextResponse:
+    """Serve all registered metrics in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+routes = [Route("/metrics", metrics_endpoint)]
@@ -0,0 +1,111 @@
+"""Fixed-point money helpers.
+
+Amounts are stored as ``Numeric(12, 2)`` in the database and handled as
+integer cents (1/100 rupiah) everywhere else: frontend models, aggregates,
+caches and rollups. Conversion to ``Decimal`` happens only when writing to
+the database, and to display strings only when rendering.
+"""
+
+import re
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any, Optional
+
+from sqlalchemy import BigInteger, cast, func
+
+CENTS = 100
+
+_CENT = Decimal("0.01")
+
+# Digits in groups of three after the first, e.g. "1.500.000" or "1,500".
+_GROUPED = re.compile(r"\d{1,3}(?:[.,]\d{3})+")
+
+
+def _normalize_amount(text: str) -> Optional[str]:
+    """User input as a plain decimal string, or None if it is ambiguous.
+
+    Both Indonesian ("1.500.000,50") and English ("1,500,000.50") notation
+    are accepted. With both separators the last one is the decimal point.
+    With one kind only, it separates thousands when every group after it has
+    three digits ("1.500", "1,500,000") and is the decimal point when it
+    occurs once ("15,5", "15000.50").
+    """
+    text = text.strip().removeprefix("Rp").strip().replace(" ", "")
+    negative = text.startswith("-")
+    digits = text.lstrip("+-")
+    if "," in digits and "." in digits:
+        decimal_point = "," if digits.rfind(",") > digits.rfind(".") else "."
+        whole, _, fraction = digits.rpartition(decimal_point)
+        if not _GROUPED.fullmatch(whole) and not whole.isdigit():
+            return None
+        digits = re.sub(r"[.,]", "", whole) + "." + fraction
+    elif _GROUPED.fullmatch(digits):
+        digits = re.sub(r"[.,]", "", digits)
+    elif digits.count(",") + digits.count(".") > 1:
+        return None
+    else:
+        digits = digits.replace(",", ".")
+    return ("-" if negative else "") + digits
+
+
+def to_cents(value: Any) -> int:
+    """Convert a database ``Decimal``, user input string or number to cents.
+
+    Strings are read with ``_normalize_amount``, so ``"15,5"`` is 15.50.
+    Empty, invalid or ambiguous values are 0. Amounts are rounded half-up to
+    the cent.
+    """
+    if value is None or isinstance(value, bool):
+        return 0
+    if isinstance(value, int):
+        return value * CENTS
+    if isinstance(value, (Decimal, float)):
+        amount = Decimal(str(value))
+    else:
+        text = _normalize_amount(str(value))
+        if not text:
+            return 0
+        try:
+            amount = Decimal(text)
+        except InvalidOperation:
+            return 0
+    if not amount.is_finite():
+        return 0
+    return int((amount * CENTS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> Decimal:
+    """Cents as a ``Decimal`` with two places, for writing ``Numeric`` columns."""
+    return (Decimal(cents) / CENTS).quantize(_CENT)
+
+
+def cents_column(column):
+    """SQL expression for a ``Numeric(12, 2)`` column as integer cents.
+
+    Summing this instead of the column keeps aggregates exact on SQLite,
+    which stores ``Numeric`` as floating point.
+    """
+    return cast(func.round(column * CENTS), BigInteger)
+
+
+def divide_cents(cents: int, count: int) -> int:
+    """Integer average of an amount, rounded half-up."""
+    if count <= 0:
+        return 0
+    return (2 * cents + count) // (2 * count)
+
+
+def format_amount(cents: int) -> str:
+    """Plain decimal string for form inputs, e.g. ``15000`` or ``15000.50``."""
+    amount = from_cents(cents)
+    return f"{amount:f}".removesuffix(".00")
+
+
+def format_rupiah(cents):
+    """Display string for an amount in cents, e.g. ``Rp 1,500,000``.
+
+    Also accepts a state var, in which case the formatting happens in the
+    browser.
+    """
+    if isinstance(cents, int):
+        return f"Rp {divide_cents(cents, CENTS) if cents >= 0 else -divide_cents(-cents, CENTS):,}"
+    return f"Rp {cents / CENTS:,.0f}"
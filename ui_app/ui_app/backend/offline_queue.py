@@ -0,0 +1,213 @@
+"""Durable local journal for sales submitted while the database is down.
+
+When a sale cannot be stored because the primary database is unreachable
+(the insert raised ``DatabaseUnavailable``), ``submit_penjualan``
+(``write_queue.py``) validates it and appends it to a
+local SQLite journal (``OFFLINE_JOURNAL_PATH``) instead of dropping it. A
+replay thread then checks every ``OFFLINE_REPLAY_SECONDS`` whether the
+database is back and stores the journaled sales in batches of
+``OFFLINE_REPLAY_BATCH`` with ``insert_penjualan_batch``, on behalf of the
+tenant that submitted them.
+
+Every journaled sale has an idempotency key: the journal keeps one entry
+per key, and replay skips keys that are already in the database, so a sale
+that reached the database before the connection dropped is not stored
+twice. Sales that the database rejects once it is reachable (e.g. their
+product was removed) stay in the journal as failed. ``backlog()`` reports
+the pending and failed counts, also exported as ``umkm_offline_backlog``.
+Each process keeps one connection to the journal, opened on first use.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from .database import DatabaseUnavailable, database_available, insert_penjualan_batch, penjualan_is_valid
+from .metrics import REGISTRY, Gauge, LabelValues
+from .tenant import current_tenant, use_tenant
+
+OFFLINE_QUEUE_ENABLED = os.getenv("OFFLINE_QUEUE_ENABLED", "true").lower() in ("1", "true", "yes")
+OFFLINE_JOURNAL_PATH = os.getenv("OFFLINE_JOURNAL_PATH", "offline_journal.db")
+REPLAY_INTERVAL_SECONDS = float(os.getenv("OFFLINE_REPLAY_SECONDS", "5"))
+REPLAY_BATCH = int(os.getenv("OFFLINE_REPLAY_BATCH", "100"))
+
+# Returned by submit_penjualan for a sale that was journaled, not stored.
+QUEUED_OFFLINE = "offline"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS antrian_penjualan (
+    idempotency_key TEXT PRIMARY KEY,
+    id_tenant INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    diterima REAL NOT NULL,
+    percobaan INTEGER NOT NULL DEFAULT 0,
+    galat TEXT
+)
+"""
+
+_lock = threading.Lock()
+_replayer: Optional[threading.Thread] = None
+# (process id, journal connection); a forked worker opens its own.
+_connection: Optional[Tuple[int, sqlite3.Connection]] = None
+
+
+def _journal() -> sqlite3.Connection:
+    """This process's journal connection, opened on first use. Call with ``_lock`` held."""
+    global _connection
+    if _connection is None or _connection[0] != os.getpid():
+        conn = sqlite3.connect(OFFLINE_JOURNAL_PATH, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(_SCHEMA)
+        _connection = (os.getpid(), conn)
+    return _connection[1]
+
+
+def journal_penjualan(data: dict) -> bool:
+    """Append a validated sale of the current tenant to the journal and start the replay.
+
+    The sale's date and time are fixed now, so a replay on a later day
+    stores it as of when it was made.
+
+    Returns:
+        True if the sale is in the journal (also when its key already was),
+        False if it is invalid.
+    """
+    data = dict(data)
+    now = datetime.now().replace(microsecond=0)
+    if not str(data.get("tanggal_penjualan") or "").strip():
+        data["tanggal_penjualan"] = date.today().isoformat()
+        if not str(data.get("waktu_penjualan") or "").strip():
+            data["waktu_penjualan"] = now.isoformat()
+    data["idempotency_key"] = str(data.get("idempotency_key") or "").strip() or uuid.uuid4().hex
+    if not penjualan_is_valid(data):
+        return False
+
+    with _lock:
+        conn = _journal()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO antrian_penjualan (idempotency_key, id_tenant, data, diterima) "
+                "VALUES (?, ?, ?, ?)",
+                (data["idempotency_key"], current_tenant(), json.dumps(data, default=str), time.time()),
+            )
+    print(f"Database unavailable, penjualan {data['idempotency_key']} saved to the offline journal")
+    _start_replayer()
+    return True
+
+
+def backlog() -> Dict[str, int]:
+    """Number of journaled sales waiting for replay (``pending``) and rejected on replay (``failed``).
+
+    Starts the replay if sales are waiting, e.g. after a restart.
+    """
+    with _lock:
+        if _connection is None and not os.path.exists(OFFLINE_JOURNAL_PATH):
+            return {"pending": 0, "failed": 0}
+        pending, failed = _journal().execute(
+            "SELECT COUNT(*) FILTER (WHERE galat IS NULL), COUNT(*) FILTER (WHERE galat IS NOT NULL) "
+            "FROM antrian_penjualan"
+        ).fetchone()
+    if pending:
+        _start_replayer()
+    return {"pending": pending, "failed": failed}
+
+
+def _next_batch() -> List[Tuple[str, int, dict]]:
+    with _lock:
+        rows = _journal().execute(
+            "SELECT idempotency_key, id_tenant, data FROM antrian_penjualan "
+            "WHERE galat IS NULL ORDER BY diterima LIMIT ?",
+            (REPLAY_BATCH,),
+        ).fetchall()
+    return [(key, tenant, json.loads(data)) for key, tenant, data in rows]
+
+
+def _settle(stored: List[str], rejected: List[str], retry: List[str]):
+    """Drop stored sales from the journal, mark rejected ones failed and count retries."""
+    with _lock:
+        conn = _journal()
+        with conn:
+            conn.executemany("DELETE FROM antrian_penjualan WHERE idempotency_key = ?", [(k,) for k in stored])
+            conn.executemany(
+                "UPDATE antrian_penjualan SET percobaan = percobaan + 1, galat = ? WHERE idempotency_key = ?",
+                [("rejected by the database", k) for k in rejected],
+            )
+            conn.executemany(
+                "UPDATE antrian_penjualan SET percobaan = percobaan + 1 WHERE idempotency_key = ?",
+                [(k,) for k in retry],
+            )
+
+
+def replay_once() -> int:
+    """Store one batch of journaled sales if the database is reachable.
+
+    Returns:
+        The number of sales taken out of the journal.
+    """
+    batch = _next_batch()
+    if not batch or not database_available():
+        return 0
+    tenants: Dict[int, List[Tuple[str, dict]]] = {}
+    for key, tenant, data in batch:
+        tenants.setdefault(tenant, []).append((key, data))
+
+    stored, rejected, retry = [], [], []
+    for tenant, rows in tenants.items():
+        try:
+            with use_tenant(tenant):
+                results = insert_penjualan_batch([data for _, data in rows])
+        except DatabaseUnavailable:
+            retry.extend(key for key, _ in rows)
+            continue
+        # A failure that is not about reaching the database is a rejection of the sale itself.
+        for (key, _), ok in zip(rows, results):
+            (stored if ok else rejected).append(key)
+    _settle(stored, rejected, retry)
+    if stored:
+        print(f"Replayed {len(stored)} penjualan records from the offline journal")
+    return len(stored)
+
+
+def _replay_loop():
+    global _replayer
+    while True:
+        try:
+            if replay_once() == 0:
+                time.sleep(REPLAY_INTERVAL_SECONDS)
+        except Exception as e:
+            print(f"Error replaying the offline journal: {e}")
+            time.sleep(REPLAY_INTERVAL_SECONDS)
+        with _lock:
+            pending = _journal().execute(
+                "SELECT COUNT(*) FROM antrian_penjualan WHERE galat IS NULL"
+            ).fetchone()[0]
+            if not pending:
+                _replayer = None
+                return
+
+
+def _start_replayer():
+    global _replayer
+    with _lock:
+        if _replayer is None:
+            _replayer = threading.Thread(target=_replay_loop, name="offline-journal-replay", daemon=True)
+            _replayer.start()
+
+
+def _backlog_gauge() -> Dict[LabelValues, float]:
+    counts = backlog()
+    return {(state,): float(count) for state, count in counts.items()}
+
+
+REGISTRY.register(Gauge(
+    "umkm_offline_backlog",
+    "Sales in the offline journal, waiting for replay or rejected on replay.",
+    labels=("state",),
+    callback=_backlog_gauge,
+))
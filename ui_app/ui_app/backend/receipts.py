@@ -0,0 +1,254 @@
+"""Content-addressed storage for expense receipts (``bukti_transaksi``).
+
+An uploaded receipt is stored once per tenant under the SHA-256 of its
+content (``RECEIPT_DIR/<tenant>/blobs/ab/abcd...``), so uploading the same
+photo twice keeps one file. The belanja row then holds the reference
+``sha256:<hex digest>`` in ``bukti_transaksi`` instead of free text.
+
+Files are copied to and from disk in ``CHUNK_SIZE`` pieces: Reflex state
+only ever holds the reference, and downloads are streamed by the
+``/receipts/<digest>`` route. Thumbnails are generated on first request
+with Pillow and cached next to the blobs; PDFs (and every receipt when
+Pillow is not installed) get a generic document icon instead. Blobs never change, so both routes can be cached
+by the browser indefinitely.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from typing import BinaryIO, Dict, Optional
+
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.routing import Route
+
+from .tenant import current_tenant, tenant_from_headers, use_tenant
+
+RECEIPT_DIR = os.getenv("RECEIPT_DIR", "receipts")
+RECEIPT_MAX_BYTES = int(os.getenv("RECEIPT_MAX_BYTES", str(10 * 1024 * 1024)))
+THUMBNAIL_SIZES = (128, 512)  # px, longest side
+CHUNK_SIZE = 64 * 1024
+REFERENCE_PREFIX = "sha256:"
+
+# Accepted file types by their leading bytes.
+MEDIA_TYPES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"GIF87a": "image/gif",
+    b"GIF89a": "image/gif",
+    b"%PDF-": "application/pdf",
+}
+EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "application/pdf": ".pdf",
+}
+
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+_IMMUTABLE = "private, max-age=31536000, immutable"
+
+# Shown for receipts without a thumbnail.
+_DOCUMENT_ICON = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="128" height="128" viewBox="0 0 24 24" '
+    'fill="none" stroke="#6b7280" stroke-width="1.5" stroke-linecap="round" stroke-linejoin="round">'
+    '<path d="M14 2H6a2 2 0 0 0-2 2v16a2 2 0 0 0 2 2h12a2 2 0 0 0 2-2V8z"/>'
+    '<path d="M14 2v6h6"/><path d="M16 13H8"/><path d="M16 17H8"/></svg>'
+)
+
+# One lock per thumbnail being generated, so concurrent requests render it once.
+_thumbnail_locks: Dict[str, threading.Lock] = {}
+_thumbnail_locks_lock = threading.Lock()
+
+
+def receipt_digest(value: Optional[str]) -> Optional[str]:
+    """The digest of a ``sha256:...`` receipt reference, or None for free text."""
+    if not value or not value.startswith(REFERENCE_PREFIX):
+        return None
+    digest = value[len(REFERENCE_PREFIX):]
+    return digest if _DIGEST.fullmatch(digest) else None
+
+
+def receipt_exists(value: str) -> bool:
+    """Whether a ``sha256:...`` reference names a blob of the current tenant."""
+    digest = receipt_digest(value)
+    return digest is not None and os.path.exists(blob_path(digest))
+
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    """Media type of a file from its first bytes, or None if it is not an accepted type."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, media_type in MEDIA_TYPES.items():
+        if head.startswith(signature):
+            return media_type
+    return None
+
+
+def _tenant_dir() -> str:
+    return os.path.join(RECEIPT_DIR, str(current_tenant()))
+
+
+def blob_path(digest: str) -> str:
+    """Path of the current tenant's blob with the given digest."""
+    return os.path.join(_tenant_dir(), "blobs", digest[:2], digest)
+
+
+def _thumbnail_path(digest: str, size: int) -> str:
+    return os.path.join(_tenant_dir(), "thumbnails", str(size), digest[:2], digest + ".jpg")
+
+
+def store_receipt(source: BinaryIO) -> str:
+    """Copy a receipt file into the current tenant's blob store.
+
+    Args:
+        source: A binary file object positioned at the start of the receipt.
+
+    Returns:
+        The ``sha256:...`` reference to keep in ``bukti_transaksi``.
+
+    Raises:
+        ValueError: if the file is empty, too large or not an accepted type.
+    """
+    tmp_dir = os.path.join(_tenant_dir(), "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        sha256 = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0 and sniff_media_type(chunk) is None:
+                    raise ValueError("Receipts must be JPEG, PNG, GIF, WebP or PDF files")
+                size += len(chunk)
+                if size > RECEIPT_MAX_BYTES:
+                    raise ValueError(f"Receipts can be at most {RECEIPT_MAX_BYTES // (1024 * 1024)} MB")
+                sha256.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise ValueError("The receipt file is empty")
+
+        digest = sha256.hexdigest()
+        path = blob_path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return REFERENCE_PREFIX + digest
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _media_type_of(path: str) -> Optional[str]:
+    with open(path, "rb") as f:
+        return sniff_media_type(f.read(16))
+
+
+def thumbnail(digest: str, size: int = THUMBNAIL_SIZES[0]) -> Optional[str]:
+    """Path of a JPEG thumbnail of the current tenant's receipt, generated on first use.
+
+    Returns None if the blob does not exist, is not an image, or Pillow is
+    not installed.
+    """
+    path = _thumbnail_path(digest, size)
+    if os.path.exists(path):
+        return path
+    source = blob_path(digest)
+    if not os.path.exists(source) or not (_media_type_of(source) or "").startswith("image/"):
+        return None
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    with _thumbnail_locks_lock:
+        lock = _thumbnail_locks.setdefault(path, threading.Lock())
+    with lock:
+        if os.path.exists(path):
+            return path
+        tmp_path = None
+        try:
+            with Image.open(source) as image:
+                # JPEGs are decoded at a reduced scale, so large photos are never held at full size.
+                image.draft("RGB", (size, size))
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((size, size))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+                with os.fdopen(fd, "wb") as out:
+                    image.convert("RGB").save(out, "JPEG", quality=80)
+                os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error generating receipt thumbnail {digest}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        finally:
+            with _thumbnail_locks_lock:
+                _thumbnail_locks.pop(path, None)
+    return path
+
+
+def _request_digest(request: Request) -> str:
+    digest = request.path_params["digest"]
+    if not _DIGEST.fullmatch(digest):
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return digest
+
+
+def _request_tenant(request: Request) -> int:
+    try:
+        return tenant_from_headers(request.headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def download_receipt(request: Request) -> FileResponse:
+    """Stream a receipt file of the request's tenant."""
+    digest = _request_digest(request)
+    with use_tenant(_request_tenant(request)):
+        path = blob_path(digest)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    media_type = _media_type_of(path) or "application/octet-stream"
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=f"bukti_{digest[:12]}{EXTENSIONS.get(media_type, '')}",
+        content_disposition_type="inline",
+        headers={"Cache-Control": _IMMUTABLE},
+    )
+
+
+def receipt_thumbnail(request: Request) -> Response:
+    """Serve a JPEG thumbnail of a receipt (a document icon if it is not an image); ``size`` is one of ``THUMBNAIL_SIZES``."""
+    digest = _request_digest(request)
+    try:
+        size = int(request.query_params.get("size", THUMBNAIL_SIZES[0]))
+    except ValueError:
+        size = 0
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {THUMBNAIL_SIZES}")
+    with use_tenant(_request_tenant(request)):
+        if not os.path.exists(blob_path(digest)):
+            raise HTTPException(status_code=404, detail="Receipt not found")
+        path = thumbnail(digest, size)
+    if path is None:
+        return Response(_DOCUMENT_ICON, media_type="image/svg+xml", headers={"Cache-Control": "private, max-age=300"})
+    return FileResponse(path, media_type="image/jpeg", headers={"Cache-Control": _IMMUTABLE})
+
+
+routes = [
+    Route("/receipts/{digest}", download_receipt),
+    Route("/receipts/{digest}/thumbnail", receipt_thumbnail),
+]
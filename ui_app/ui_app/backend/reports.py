@@ -0,0 +1,282 @@
+"""Laba-rugi (profit and loss) reporting and chart series over the current tenant's penjualan and belanja.
+
+Years moved to the cold archive (``archive.py``) are no longer in penjualan
+and belanja; when a report reaches back into them, their daily rollups from
+``arsip_ringkasan`` are added to the query.
+"""
+
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import reflex as rx
+from sqlalchemy import func, literal, literal_column, null, select, union_all
+
+from .analytics import PRODUCT_COLORS
+from .cache import VersionedCache
+from .database import (
+    ArsipRingkasanDB,
+    ArsipTahunDB,
+    BelanjaDB,
+    KategoriPengeluaranDB,
+    PenjualanDB,
+    ReadSessionLocal,
+    get_engine,
+)
+from .money import cents_column
+from .tenant import current_tenant
+
+PERIODS = ("day", "month", "year")
+
+# Period label formats, per dialect.
+_PG_FORMATS = {"day": "YYYY-MM-DD", "month": "YYYY-MM", "year": "YYYY"}
+_SQLITE_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+
+_laba_rugi_cache = VersionedCache(
+    "laba_rugi", ("penjualan", "belanja", "kategori_pengeluaran", "arsip")
+)
+
+
+class LabaRugi(rx.Base):
+    """Profit and loss for one period, amounts in cents."""
+    periode: str
+    pendapatan: int
+    pengeluaran: int
+    laba_bersih: int
+    pengeluaran_per_kategori: Dict[str, int]
+
+
+def _period_label(column, period: str):
+    """SQL expression that renders a date column as its period label.
+
+    The format is inlined rather than bound so that the expression in SELECT
+    and GROUP BY is textually identical, which PostgreSQL requires.
+    """
+    if get_engine().dialect.name == "sqlite":
+        return func.strftime(literal_column(f"'{_SQLITE_FORMATS[period]}'"), column)
+    return func.to_char(column, literal_column(f"'{_PG_FORMATS[period]}'"))
+
+
+def _reaches_archive(db, start: Optional[date]) -> bool:
+    """Whether a date range starting at ``start`` includes a year the current tenant has archived."""
+    last = db.execute(
+        select(func.max(ArsipTahunDB.tahun)).where(ArsipTahunDB.id_tenant == current_tenant())
+    ).scalar()
+    return last is not None and (start is None or start.year <= last)
+
+
+def _archived_filters(tabel: str, start: Optional[date], end: Optional[date]) -> list:
+    filters = [ArsipRingkasanDB.id_tenant == current_tenant(), ArsipRingkasanDB.tabel == tabel]
+    if start:
+        filters.append(ArsipRingkasanDB.tanggal >= start)
+    if end:
+        filters.append(ArsipRingkasanDB.tanggal <= end)
+    return filters
+
+
+def _laba_rugi_query(period: str, start: Optional[date], end: Optional[date], archived: bool = False):
+    """Revenue and per-category expense totals per period as one UNION ALL query.
+
+    Each side is aggregated in its own CTE, so the database scans penjualan
+    and belanja once each and returns one row per period (revenue) plus one
+    row per period and category (expenses). With ``archived``, the rollups
+    of archived years are added as two more CTEs of the same shape.
+    """
+    tenant = current_tenant()
+    revenue_filters = [PenjualanDB.id_tenant == tenant]
+    expense_filters = [BelanjaDB.id_tenant == tenant]
+    if start:
+        revenue_filters.append(PenjualanDB.tanggal_penjualan >= start)
+        expense_filters.append(BelanjaDB.tanggal_pengeluaran >= start)
+    if end:
+        revenue_filters.append(PenjualanDB.tanggal_penjualan <= end)
+        expense_filters.append(BelanjaDB.tanggal_pengeluaran <= end)
+
+    revenue_period = _period_label(PenjualanDB.tanggal_penjualan, period)
+    revenue = (
+        select(
+            revenue_period.label("periode"),
+            literal("pendapatan").label("jenis"),
+            null().label("kategori"),
+            func.sum(cents_column(PenjualanDB.total)).label("jumlah"),
+        )
+        .where(*revenue_filters)
+        .group_by(revenue_period)
+        .cte("pendapatan")
+    )
+
+    expense_period = _period_label(BelanjaDB.tanggal_pengeluaran, period)
+    expenses = (
+        select(
+            expense_period.label("periode"),
+            literal("pengeluaran").label("jenis"),
+            KategoriPengeluaranDB.nama_kategori.label("kategori"),
+            func.sum(cents_column(BelanjaDB.total)).label("jumlah"),
+        )
+        .join(KategoriPengeluaranDB, BelanjaDB.id_kategori_pengeluaran == KategoriPengeluaranDB.id_kategori)
+        .where(*expense_filters)
+        .group_by(expense_period, KategoriPengeluaranDB.nama_kategori)
+        .cte("pengeluaran")
+    )
+
+    parts = [select(revenue), select(expenses)]
+    if archived:
+        archived_period = _period_label(ArsipRingkasanDB.tanggal, period)
+        archived_revenue = (
+            select(
+                archived_period.label("periode"),
+                literal("pendapatan").label("jenis"),
+                null().label("kategori"),
+                func.sum(ArsipRingkasanDB.total_sen).label("jumlah"),
+            )
+            .where(*_archived_filters("penjualan", start, end))
+            .group_by(archived_period)
+            .cte("arsip_pendapatan")
+        )
+        archived_expenses = (
+            select(
+                archived_period.label("periode"),
+                literal("pengeluaran").label("jenis"),
+                KategoriPengeluaranDB.nama_kategori.label("kategori"),
+                func.sum(ArsipRingkasanDB.total_sen).label("jumlah"),
+            )
+            .join(KategoriPengeluaranDB, ArsipRingkasanDB.id_kunci == KategoriPengeluaranDB.id_kategori)
+            .where(*_archived_filters("belanja", start, end))
+            .group_by(archived_period, KategoriPengeluaranDB.nama_kategori)
+            .cte("arsip_pengeluaran")
+        )
+        parts += [select(archived_revenue), select(archived_expenses)]
+    return union_all(*parts)
+
+
+def _compute_laba_rugi(period: str, start: Optional[date], end: Optional[date]) -> List[LabaRugi]:
+    db = ReadSessionLocal()
+    try:
+        archived = _reaches_archive(db, start)
+        rows = db.execute(_laba_rugi_query(period, start, end, archived)).all()
+    finally:
+        db.close()
+
+    periods: "OrderedDict[str, dict]" = OrderedDict()
+    for periode, jenis, kategori, jumlah in sorted(rows, key=lambda row: row[0]):
+        entry = periods.setdefault(
+            periode, {"pendapatan": 0, "pengeluaran": 0, "kategori": {}}
+        )
+        amount = int(jumlah or 0)
+        if jenis == "pendapatan":
+            entry["pendapatan"] += amount
+        else:
+            entry["pengeluaran"] += amount
+            entry["kategori"][kategori] = entry["kategori"].get(kategori, 0) + amount
+
+    return [
+        LabaRugi(
+            periode=periode,
+            pendapatan=entry["pendapatan"],
+            pengeluaran=entry["pengeluaran"],
+            laba_bersih=entry["pendapatan"] - entry["pengeluaran"],
+            pengeluaran_per_kategori=entry["kategori"],
+        )
+        for periode, entry in periods.items()
+    ]
+
+
+def get_laba_rugi(
+    period: str = "month",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> List[LabaRugi]:
+    """Get the profit and loss per day, month or year, oldest period first.
+
+    Archived years are included. Results are cached until the next insert
+    into penjualan or belanja, or the next archive run.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+    try:
+        return _laba_rugi_cache.get_or_compute(
+            (period, start, end), lambda: _compute_laba_rugi(period, start, end)
+        )
+    except Exception as e:
+        print(f"Error computing laba rugi: {e}")
+        return []
+
+
+# Chart series ----------------------------------------------------------------
+
+CHART_MONTHS = 12  # months shown by the monthly charts
+
+_chart_cache = VersionedCache(
+    "chart_series", ("penjualan", "belanja", "kategori_pengeluaran", "arsip"), max_entries=64
+)
+
+
+def _period_start(period: str, today: date) -> date:
+    """First day of the period that contains today."""
+    return today.replace(month=1, day=1) if period == "year" else today.replace(day=1)
+
+
+def _compute_chart_series(period: str, today: date) -> Dict[str, List[Dict]]:
+    label = _period_label(PenjualanDB.tanggal_penjualan, period)
+    query = (
+        select(label, func.count(), func.sum(cents_column(PenjualanDB.total)))
+        .where(PenjualanDB.id_tenant == current_tenant())
+        .group_by(label)
+    )
+    first = None
+    if period == "month":
+        first = today.replace(day=1)
+        for _ in range(CHART_MONTHS - 1):
+            first = (first - timedelta(days=1)).replace(day=1)
+        query = query.where(PenjualanDB.tanggal_penjualan >= first)
+
+    db = ReadSessionLocal()
+    try:
+        series: Dict[str, List[int]] = {}
+        for periode, orders, revenue in db.execute(query):
+            series[periode] = [int(orders or 0), int(revenue or 0)]
+        if _reaches_archive(db, first):
+            archived_label = _period_label(ArsipRingkasanDB.tanggal, period)
+            archived = (
+                select(archived_label, func.sum(ArsipRingkasanDB.transaksi), func.sum(ArsipRingkasanDB.total_sen))
+                .where(*_archived_filters("penjualan", first, None))
+                .group_by(archived_label)
+            )
+            for periode, orders, revenue in db.execute(archived):
+                totals = series.setdefault(periode, [0, 0])
+                totals[0] += int(orders or 0)
+                totals[1] += int(revenue or 0)
+    finally:
+        db.close()
+    rows = sorted(series.items())
+
+    current = _compute_laba_rugi(period, _period_start(period, today), today)
+    kategori = current[-1].pengeluaran_per_kategori if current else {}
+    return {
+        "revenue": [{"Date": periode, "Revenue": revenue} for periode, (_, revenue) in rows],
+        "orders": [{"Date": periode, "Orders": orders} for periode, (orders, _) in rows],
+        "expenses": [
+            {"name": nama, "value": jumlah, "fill": PRODUCT_COLORS[i % len(PRODUCT_COLORS)]}
+            for i, (nama, jumlah) in enumerate(sorted(kategori.items(), key=lambda item: -item[1]))
+        ],
+    }
+
+
+def get_chart_series(period: str = "month", today: Optional[date] = None) -> Dict[str, List[Dict]]:
+    """Revenue and orders per month (last 12) or year, and this period's expenses per category.
+
+    Returns:
+        ``{"revenue": [{"Date", "Revenue"}], "orders": [{"Date", "Orders"}],
+        "expenses": [{"name", "value", "fill"}]}`` with amounts in cents.
+        Computed once per data version and shared by all sessions.
+    """
+    if period not in ("month", "year"):
+        raise ValueError(f"Unknown period: {period}")
+    today = today or date.today()
+    try:
+        return _chart_cache.get_or_compute(
+            (period, today), lambda: _compute_chart_series(period, today)
+        )
+    except Exception as e:
+        print(f"Error computing chart series: {e}")
+        return {"revenue": [], "orders": [], "expenses": []}
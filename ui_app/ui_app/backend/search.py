@@ -0,0 +1,94 @@
+"""Latest-wins execution of search and filter queries.
+
+Typing in a search box sends a burst of queries of which only the last one
+matters. ``QueryRunner`` runs each query in a worker thread on its own
+database connection and keeps track of the one in flight per owner (one
+browser session and input). Starting a new query for an owner cancels the
+previous one inside the database: ``sqlite3.Connection.interrupt()`` on
+SQLite and ``cancel()`` on PostgreSQL. The cancelled query raises
+``QueryCancelled`` instead of returning stale results. Queries are
+read-only and run on the read replica when one is configured.
+"""
+
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from .database import ReadSessionLocal
+
+
+class QueryCancelled(Exception):
+    """Raised for a query superseded by a newer one from the same owner."""
+
+
+class _Running:
+    def __init__(self, connection, dialect: str):
+        self.connection = connection
+        self.dialect = dialect
+        self.cancelled = False
+        # Set before the connection goes back to the pool, after which it may
+        # run another request's statements and must not be interrupted.
+        self.done = False
+        self._lock = threading.Lock()
+
+    def finish(self):
+        with self._lock:
+            self.done = True
+
+    def cancel(self):
+        with self._lock:
+            if self.done:
+                return
+            self.cancelled = True
+            try:
+                if self.dialect == "sqlite":
+                    self.connection.interrupt()
+                elif self.dialect == "postgresql":
+                    self.connection.cancel()
+            except Exception as e:
+                print(f"Error cancelling query: {e}")
+
+
+class QueryRunner:
+    """Run at most one query per owner; a newer query cancels the older one."""
+
+    def __init__(self):
+        self._running: Dict[Hashable, _Running] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, owner: Hashable, query: Callable[[Any], Any]) -> Any:
+        db = ReadSessionLocal()
+        try:
+            running = _Running(db.connection().connection.driver_connection, db.get_bind().dialect.name)
+            with self._lock:
+                previous = self._running.get(owner)
+                self._running[owner] = running
+            if previous is not None:
+                previous.cancel()
+            try:
+                return query(db)
+            except Exception:
+                if running.cancelled:
+                    raise QueryCancelled()
+                raise
+            finally:
+                running.finish()
+                with self._lock:
+                    if self._running.get(owner) is running:
+                        del self._running[owner]
+                if running.cancelled:
+                    raise QueryCancelled()
+        finally:
+            db.rollback()
+            db.close()
+
+    async def run(self, owner: Hashable, query: Callable[[Any], Any]) -> Any:
+        """Run ``query(session)`` in a worker thread, cancelling the owner's previous query.
+
+        Raises:
+            QueryCancelled: if a newer query for the same owner started first.
+        """
+        return await asyncio.to_thread(self._run, owner, query)
+
+
+query_runner = QueryRunner()
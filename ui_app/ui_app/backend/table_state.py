@@ -1,8 +1,12 @@
+import asyncio
 import csv
+import uuid
 from pathlib import Path
 from typing import List
+from urllib.parse import urlencode
 
 import reflex as rx
+from reflex.config import get_config
 from .database import (
     Penjualan, 
     Belanja, 
@@ -10,14 +14,34 @@ from .database import (
     KategoriPengeluaran,
     get_penjualan_data, 
     get_belanja_data, 
+    count_penjualan,
+    count_belanja,
+    query_penjualan,
+    query_belanja,
+    query_penjualan_count,
+    query_belanja_count,
     get_produk_data,
     get_kategori_pengeluaran_data,
-    insert_penjualan, 
+    get_stok_level,
     insert_belanja,
     insert_produk,
     create_tables,
-    seed_sample_categories
+    seed_sample_categories,
+    KATEGORI_BAHAN_BAKU,
 )
+from .metrics import timed_event
+from .money import format_amount, to_cents
+from .offline_queue import QUEUED_OFFLINE, backlog
+from .receipts import receipt_digest, store_receipt
+from .search import QueryCancelled, query_runner
+from .tenant import TenantState
+from .write_queue import COMMIT_PENDING, submit_penjualan
+
+# Virtual scroll mode: rows have a fixed height so the scroll offset maps to
+# a row index, and only a window of rows around the viewport is loaded.
+VIRTUAL_ROW_HEIGHT = 48  # px
+VIRTUAL_VIEWPORT_ROWS = 15
+VIRTUAL_OVERSCAN = 15  # rows loaded above and below the viewport
 
 
 class Item(rx.Base):
@@ -29,7 +53,7 @@ class Item(rx.Base):
     status: str
 
 
-class TableState(rx.State):
+class TableState(TenantState, rx.State):
     """The state class."""
 
     items: List[Item] = []
@@ -56,10 +80,13 @@ class TableState(rx.State):
     form_total_penjualan: str = ""
     form_catatan_penjualan: str = ""
     form_tanggal_penjualan: str = ""
+    form_waktu_penjualan: str = ""  # "HH:MM", optional
+    form_stok: int = 0  # on-hand stock of the selected product
     
     # Form fields for new product
     form_new_product_name: str = ""
     form_new_product_price: str = ""
+    form_new_product_stock: str = ""
     show_add_product_form: bool = False
     
     # Form fields for Belanja
@@ -67,18 +94,48 @@ class TableState(rx.State):
     form_id_kategori_pengeluaran: str = ""
     form_total_belanja: str = ""
     form_metode_pembayaran: str = ""
-    form_bukti_transaksi: str = ""
+    form_bukti_transaksi: str = ""  # free text, or a "sha256:..." reference to an uploaded receipt
+    receipt_uploading: bool = False
     form_catatan_belanja: str = ""
     form_tanggal_pengeluaran: str = ""
+    form_produk_belanja: str = ""  # restocked product, for Bahan Baku
+    form_kuantitas_belanja: str = ""
+    
+    # Idempotency key for the pending submission; retries of the same entry reuse it
+    form_idempotency_key: str = ""
+
+    # Sales saved to the offline journal and not yet stored in the database
+    offline_backlog: int = 0
+
+    # Export options
+    export_format: str = "csv"
+    export_start: str = ""
+    export_end: str = ""
+    export_filter: str = "Semua"
 
     search_value: str = ""
     sort_value: str = ""
+
+    # Pembukuan search; only the newest query of a burst is applied
+    search_query: str = ""
+    searching: bool = False
+    _search_generation: int = 0
     sort_reverse: bool = False
 
     total_items: int = 0
     offset: int = 0
     limit: int = 12  # Number of rows per page
-    
+
+    # Virtual scroll mode: the rows of the current window only
+    virtual_mode: bool = False
+    window_start: int = 0
+    window_total: int = 0
+    # Start of the newest window requested by scrolling; older fetches are dropped
+    _window_request: int = -1
+    penjualan_window: List[Penjualan] = []
+    belanja_window: List[Belanja] = []
+    
+    @timed_event
     def on_load(self):
         """Load data when the state is initialized."""
         self.load_data_from_db()
@@ -146,6 +203,39 @@ class TableState(rx.State):
         """Get category options for dropdown - show only category names."""
         return [k.nama_kategori for k in self.kategori_pengeluaran_data]
 
+    @rx.var(cache=True)
+    def is_bahan_baku(self) -> bool:
+        """Whether the selected expense category restocks products."""
+        return self.form_id_kategori_pengeluaran == KATEGORI_BAHAN_BAKU
+
+    @rx.var(cache=True)
+    def export_filter_options(self) -> List[str]:
+        """Products (penjualan) or categories (belanja) the export can be limited to."""
+        if self.selected_tab == "belanja":
+            return ["Semua"] + [k.nama_kategori for k in self.kategori_pengeluaran_data]
+        return ["Semua"] + [p.nama_produk for p in self.produk_data]
+
+    @rx.var(cache=True)
+    def export_url(self) -> str:
+        """Backend URL that streams the current tab's ledger with the chosen options."""
+        params = {"format": self.export_format}
+        if self.export_start:
+            params["start"] = self.export_start
+        if self.export_end:
+            params["end"] = self.export_end
+        if self.export_filter and self.export_filter != "Semua":
+            params["filter"] = self.export_filter
+        api_url = get_config().api_url.rstrip("/")
+        return f"{api_url}/export/{self.selected_tab}?{urlencode(params)}"
+
+    @rx.var(cache=True)
+    def form_receipt_url(self) -> str:
+        """Backend URL of the receipt uploaded in the belanja form, if any."""
+        digest = receipt_digest(self.form_bukti_transaksi)
+        if not digest:
+            return ""
+        return f"{get_config().api_url.rstrip('/')}/receipts/{digest}"
+
     @rx.var(cache=True)
     def get_penjualan_page(self) -> List[Penjualan]:
         """Get current page of penjualan data."""
@@ -160,44 +250,197 @@ class TableState(rx.State):
         end_index = start_index + self.limit
         return self.belanja_data[start_index:end_index]
 
+    @rx.var(cache=True)
+    def virtual_top_padding(self) -> str:
+        """Height of the rows above the loaded window."""
+        return f"{self.window_start * VIRTUAL_ROW_HEIGHT}px"
+
+    @rx.var(cache=True)
+    def virtual_bottom_padding(self) -> str:
+        """Height of the rows below the loaded window."""
+        loaded = len(self.penjualan_window) if self.selected_tab == "penjualan" else len(self.belanja_window)
+        return f"{max(0, self.window_total - self.window_start - loaded) * VIRTUAL_ROW_HEIGHT}px"
+
+    def load_window(self, start: int):
+        """Count the rows and load those from ``start`` into the virtual scroll window."""
+        size = VIRTUAL_VIEWPORT_ROWS + 2 * VIRTUAL_OVERSCAN
+        if self.selected_tab == "penjualan":
+            self.window_total = count_penjualan(self.search_query)
+            self.penjualan_window = get_penjualan_data(start, size, self.search_query)
+        else:
+            self.window_total = count_belanja(self.search_query)
+            self.belanja_window = get_belanja_data(start, size, self.search_query)
+        self.window_start = start
+        self._window_request = start
+
+    @timed_event
+    def on_table_scroll(self, scroll_top: int):
+        """Fetch a new window when the viewport gets near the edge of the loaded one."""
+        first = max(0, scroll_top // VIRTUAL_ROW_HEIGHT)
+        loaded = len(self.penjualan_window) if self.selected_tab == "penjualan" else len(self.belanja_window)
+        last = min(first + VIRTUAL_VIEWPORT_ROWS, self.window_total)
+        margin = VIRTUAL_OVERSCAN // 3
+        covered_from = self.window_start + (margin if self.window_start > 0 else 0)
+        covered_to = self.window_start + loaded - (margin if self.window_start + loaded < self.window_total else 0)
+        if covered_from <= first and last <= covered_to:
+            return
+        start = max(0, first - VIRTUAL_OVERSCAN)
+        if start == self._window_request:
+            return  # already being fetched
+        self._window_request = start
+        return TableState.fetch_window
+
+    @rx.event(background=True)
+    async def fetch_window(self):
+        """Load the rows of the requested window, keeping the count from the last search or load."""
+        async with self:
+            start = self._window_request
+            generation = self._search_generation
+            search = self.search_query
+            tab = self.selected_tab
+            owner = (self.router.session.client_token, "pembukuan-window")
+        size = VIRTUAL_VIEWPORT_ROWS + 2 * VIRTUAL_OVERSCAN
+        query_rows = query_penjualan if tab == "penjualan" else query_belanja
+        try:
+            rows = await query_runner.run(owner, lambda db: query_rows(db, start, size, search))
+        except QueryCancelled:
+            return
+        except Exception as e:
+            print(f"Error loading {tab} rows: {e}")
+            rows = None
+        async with self:
+            if start != self._window_request or generation != self._search_generation or tab != self.selected_tab:
+                return
+            if rows is None:
+                self._window_request = self.window_start  # let the next scroll retry
+                return
+            self.window_start = start
+            if tab == "penjualan":
+                self.penjualan_window = rows
+            else:
+                self.belanja_window = rows
+
+    @timed_event
+    def set_search_query(self, value: str):
+        """Set the Pembukuan search text and start a search for it.
+
+        The input debounces keystrokes in the browser; ``run_search`` then
+        drops or cancels whatever older search is still running.
+        """
+        self.search_query = value
+        self._search_generation += 1
+        return TableState.run_search
+
+    @rx.event(background=True)
+    async def run_search(self):
+        """Search the current tab, applying the result only if no newer search started."""
+        async with self:
+            generation = self._search_generation
+            search = self.search_query
+            tab = self.selected_tab
+            virtual = self.virtual_mode
+            owner = (self.router.session.client_token, "pembukuan")
+            self.searching = True
+        size = VIRTUAL_VIEWPORT_ROWS + 2 * VIRTUAL_OVERSCAN if virtual else None
+        query_rows = query_penjualan if tab == "penjualan" else query_belanja
+        query_count = query_penjualan_count if tab == "penjualan" else query_belanja_count
+
+        def query(db):
+            rows = query_rows(db, 0, size, search)
+            # Only the virtual window needs a count; otherwise every match is loaded.
+            return rows, query_count(db, search) if virtual else len(rows)
+
+        try:
+            rows, total = await query_runner.run(owner, query)
+        except QueryCancelled:
+            rows, total = None, 0
+        except Exception as e:
+            print(f"Error searching {tab}: {e}")
+            rows, total = [], 0
+        async with self:
+            # A newer search owns the spinner; otherwise this one ends it, whatever the outcome.
+            if generation != self._search_generation:
+                return
+            self.searching = False
+            if rows is None or tab != self.selected_tab:
+                return
+            self.offset = 0
+            self.window_start = 0
+            self._window_request = 0
+            self.window_total = total
+            if tab == "penjualan":
+                if virtual:
+                    self.penjualan_window = rows
+                else:
+                    self.penjualan_data = rows
+            elif virtual:
+                self.belanja_window = rows
+            else:
+                self.belanja_data = rows
+
+    @timed_event
+    def set_virtual_mode(self, enabled: bool):
+        """Switch between paged and virtual scroll display."""
+        self.virtual_mode = enabled
+        self.offset = 0
+        self.window_start = 0
+        self.load_data_from_db()
+
+    @timed_event
     def prev_page(self):
         if self.page_number > 1:
             self.offset -= self.limit
 
+    @timed_event
     def next_page(self):
         if self.page_number < self.total_pages:
             self.offset += self.limit
 
+    @timed_event
     def first_page(self):
         self.offset = 0
 
+    @timed_event
     def last_page(self):
         self.offset = (self.total_pages - 1) * self.limit
 
+    @timed_event
     def toggle_sort(self):
         self.sort_reverse = not self.sort_reverse
         self.load_entries()
     
+    @timed_event
     def set_selected_tab(self, tab):
         """Set the selected tab and reset pagination."""
         self.selected_tab = tab
         self.offset = 0  # Reset to first page when switching tabs
+        self.window_start = 0
+        self.export_filter = "Semua"  # Products and categories differ per tab
         self.load_data_from_db()
     
     def load_data_from_db(self):
         """Load data from database based on selected tab."""
+        self.offline_backlog = backlog()["pending"]
         try:
             create_tables()  # Ensure tables exist
             seed_sample_categories()  # Add sample categories if none exist
+            if self.virtual_mode:
+                # Only the rows around the viewport; the rest is fetched on scroll
+                self.penjualan_data = []
+                self.belanja_data = []
+                self.load_window(self.window_start)
             if self.selected_tab == "penjualan":
-                self.penjualan_data = get_penjualan_data()
+                if not self.virtual_mode:
+                    self.penjualan_data = get_penjualan_data(search=self.search_query)
                 self.produk_data = get_produk_data()  # Load products for dropdown
             elif self.selected_tab == "belanja":
-                self.belanja_data = get_belanja_data()
+                if not self.virtual_mode:
+                    self.belanja_data = get_belanja_data(search=self.search_query)
                 self.kategori_pengeluaran_data = get_kategori_pengeluaran_data()  # Load categories for dropdown
         except Exception as e:
             print(f"Error loading data from database: {e}")
     
+    @timed_event
     def open_add_modal(self):
         """Open the add data modal."""
         self.show_add_modal = True
@@ -205,6 +448,7 @@ class TableState(rx.State):
         self.form_success_message = ""  # Clear success message when opening modal
         self.clear_form()
     
+    @timed_event
     def close_add_modal(self):
         """Close the add data modal."""
         self.show_add_modal = False
@@ -229,10 +473,13 @@ class TableState(rx.State):
         self.form_total_penjualan = ""
         self.form_catatan_penjualan = ""
         self.form_tanggal_penjualan = ""
+        self.form_waktu_penjualan = ""
+        self.form_stok = 0
         
         # New product fields
         self.form_new_product_name = ""
         self.form_new_product_price = ""
+        self.form_new_product_stock = ""
         self.show_add_product_form = False
         
         # Belanja fields
@@ -243,9 +490,19 @@ class TableState(rx.State):
         self.form_bukti_transaksi = ""
         self.form_catatan_belanja = ""
         self.form_tanggal_pengeluaran = ""
+        self.form_produk_belanja = ""
+        self.form_kuantitas_belanja = ""
+        
+        # A cleared form is a new entry, so it gets a new idempotency key
+        self.form_idempotency_key = uuid.uuid4().hex
     
-    def submit_form(self):
-        """Submit the form data to database."""
+    @timed_event
+    async def submit_form(self):
+        """Submit the form data to database.
+
+        The insert runs in a worker thread, so waiting for the commit does
+        not hold up other sessions' events.
+        """
         success = False
         self.form_error_message = ""  # Clear any previous error
         
@@ -273,14 +530,15 @@ class TableState(rx.State):
             # Prepare data with proper validation (excluding total as it's computed)
             data = {
                 "tanggal_penjualan": self.form_tanggal_penjualan.strip() if self.form_tanggal_penjualan else "",
+                "waktu_penjualan": self.form_waktu_penjualan.strip() if self.form_waktu_penjualan else "",
                 "id_produk": product_id,
                 "kuantitas": self.form_kuantitas.strip() if self.form_kuantitas else "0",
                 "harga_saat_penjualan": self.form_harga_saat_penjualan.strip() if self.form_harga_saat_penjualan else "0",
                 "catatan": self.form_catatan_penjualan.strip() if self.form_catatan_penjualan else "",
+                "idempotency_key": self.form_idempotency_key,
             }
             
-            print(f"Submitting penjualan data: {data}")
-            success = insert_penjualan(data)
+            success = await asyncio.to_thread(submit_penjualan, data)
             
         elif self.selected_tab == "belanja":
             # Validate required fields
@@ -306,6 +564,14 @@ class TableState(rx.State):
                 self.form_error_message = "Category is required"
                 return
                 
+            # Bahan Baku purchases restock a product
+            restock_id = ""
+            if self.is_bahan_baku:
+                for produk in self.produk_data:
+                    if produk.nama_produk == self.form_produk_belanja.strip():
+                        restock_id = str(produk.id_produk)
+                        break
+            
             # Prepare data with proper validation
             data = {
                 "tanggal_pengeluaran": self.form_tanggal_pengeluaran.strip() if self.form_tanggal_pengeluaran else "",
@@ -315,20 +581,33 @@ class TableState(rx.State):
                 "metode_pembayaran": self.form_metode_pembayaran.strip(),
                 "bukti_transaksi": self.form_bukti_transaksi.strip() if self.form_bukti_transaksi else "",
                 "catatan": self.form_catatan_belanja.strip() if self.form_catatan_belanja else "",
+                "idempotency_key": self.form_idempotency_key,
+                "id_produk": restock_id,
+                "kuantitas": self.form_kuantitas_belanja.strip() if restock_id else "",
             }
             
-            print(f"Submitting belanja data: {data}")
-            success = insert_belanja(data)
+            success = await asyncio.to_thread(insert_belanja, data)
         
-        if success:
+        if success == COMMIT_PENDING:
+            # The form keeps its idempotency key, so submitting again cannot store the sale twice.
+            self.form_success_message = (
+                "The sale is still being saved and will appear in the table shortly. "
+                "Submitting it again will not add it twice."
+            )
+        elif success == QUEUED_OFFLINE:
+            self.offline_backlog = backlog()["pending"]
+            self.form_success_message = (
+                "Database unavailable: the sale was saved offline and will be stored when it is back."
+            )
+            self.clear_form()
+            self.form_error_message = ""
+        elif success:
             # Set success message based on tab
             if self.selected_tab == "penjualan":
                 self.form_success_message = "Penjualan data added successfully!"
             elif self.selected_tab == "belanja":
                 self.form_success_message = "Belanja data added successfully!"
             
-            print("Data added successfully!")
-            
             # Refresh data after successful insertion
             self.load_data_from_db()
             # Clear form fields but keep the modal open to show success message
@@ -338,6 +617,7 @@ class TableState(rx.State):
             self.form_error_message = "Failed to insert data. Please check your input and try again."
     
     # Form field setters for Penjualan
+    @timed_event
     def set_form_id_produk(self, value: str):
         # Store the product name for display
         self.form_id_produk = value
@@ -346,47 +626,58 @@ class TableState(rx.State):
         if value:
             for produk in self.produk_data:
                 if produk.nama_produk == value:
-                    self.form_harga_saat_penjualan = str(produk.harga_produk)
+                    self.form_harga_saat_penjualan = format_amount(produk.harga_produk)
+                    self.form_stok = get_stok_level(produk.id_produk)
                     break
     
+    @timed_event
     def set_form_kuantitas(self, value: str):
         self.form_kuantitas = value
         if self.form_success_message:  # Clear success message on user interaction
             self.form_success_message = ""
         self._calculate_total_penjualan()
     
+    @timed_event
     def set_form_harga_saat_penjualan(self, value: str):
         self.form_harga_saat_penjualan = value
         if self.form_success_message:  # Clear success message on user interaction
             self.form_success_message = ""
         self._calculate_total_penjualan()
     
+    @timed_event
     def set_form_total_penjualan(self, value: str):
         self.form_total_penjualan = value
     
+    @timed_event
     def set_form_catatan_penjualan(self, value: str):
         self.form_catatan_penjualan = value
     
+    @timed_event
     def set_form_tanggal_penjualan(self, value: str):
-        print(f"DEBUG tanggal_penjualan - Received value: {repr(value)}")
-        print(f"DEBUG tanggal_penjualan - Type: {type(value)}")
-        print(f"DEBUG tanggal_penjualan - Length: {len(value) if value else 'None'}")
-        if value:
-            print(f"DEBUG tanggal_penjualan - Is string: {isinstance(value, str)}")
-            print(f"DEBUG tanggal_penjualan - Contains date format: {'-' in value}")
-        
         self.form_tanggal_penjualan = value
     
+    @timed_event
+    def set_form_waktu_penjualan(self, value: str):
+        self.form_waktu_penjualan = value
+    
     # New product form setters
+    @timed_event
     def set_form_new_product_name(self, value: str):
         self.form_new_product_name = value
     
+    @timed_event
     def set_form_new_product_price(self, value: str):
         self.form_new_product_price = value
     
+    @timed_event
+    def set_form_new_product_stock(self, value: str):
+        self.form_new_product_stock = value
+    
+    @timed_event
     def toggle_add_product_form(self):
         self.show_add_product_form = not self.show_add_product_form
     
+    @timed_event
     def add_new_product(self):
         """Add a new product to the database."""
         if not self.form_new_product_name.strip():
@@ -396,6 +687,7 @@ class TableState(rx.State):
         data = {
             "nama_produk": self.form_new_product_name.strip(),
             "harga_produk": self.form_new_product_price.strip() if self.form_new_product_price else "0",
+            "stok_awal": self.form_new_product_stock.strip() if self.form_new_product_stock else "",
         }
         
         product_id = insert_produk(data)
@@ -406,9 +698,11 @@ class TableState(rx.State):
             product_name = self.form_new_product_name.strip()
             self.form_id_produk = product_name
             self.form_harga_saat_penjualan = self.form_new_product_price
+            self.form_stok = get_stok_level(product_id)
             # Clear and hide the form
             self.form_new_product_name = ""
             self.form_new_product_price = ""
+            self.form_new_product_stock = ""
             self.show_add_product_form = False
             self.form_error_message = ""
             # Show success message
@@ -419,35 +713,89 @@ class TableState(rx.State):
     def _calculate_total_penjualan(self):
         """Calculate total for penjualan."""
         try:
-            kuantitas = float(self.form_kuantitas) if self.form_kuantitas else 0
-            harga = float(self.form_harga_saat_penjualan) if self.form_harga_saat_penjualan else 0
-            self.form_total_penjualan = str(kuantitas * harga)
+            kuantitas = int(self.form_kuantitas) if self.form_kuantitas else 0
+            harga = to_cents(self.form_harga_saat_penjualan)
+            self.form_total_penjualan = format_amount(kuantitas * harga)
         except (ValueError, TypeError):
             self.form_total_penjualan = "0"
     
+    # Export option setters
+    @timed_event
+    def set_export_format(self, value: str):
+        self.export_format = value
+    
+    @timed_event
+    def set_export_start(self, value: str):
+        self.export_start = value
+    
+    @timed_event
+    def set_export_end(self, value: str):
+        self.export_end = value
+    
+    @timed_event
+    def set_export_filter(self, value: str):
+        self.export_filter = value
+    
     # Form field setters for Belanja
+    @timed_event
     def set_form_deskripsi(self, value: str):
         self.form_deskripsi = value
     
+    @timed_event
     def set_form_id_kategori_pengeluaran(self, value: str):
         self.form_id_kategori_pengeluaran = value
         if self.form_success_message:  # Clear success message on user interaction
             self.form_success_message = ""
     
+    @timed_event
     def set_form_total_belanja(self, value: str):
         self.form_total_belanja = value
         if self.form_success_message:  # Clear success message on user interaction
             self.form_success_message = ""
     
+    @timed_event
     def set_form_metode_pembayaran(self, value: str):
         self.form_metode_pembayaran = value
     
+    @timed_event
     def set_form_bukti_transaksi(self, value: str):
         self.form_bukti_transaksi = value
+
+    @timed_event
+    async def upload_receipt(self, files: List[rx.UploadFile]):
+        """Store an uploaded receipt and reference it from the belanja form.
+
+        The file is copied to the receipt store in chunks; only its
+        ``sha256:...`` reference is kept in the state.
+        """
+        if not files:
+            return
+        self.receipt_uploading = True
+        yield
+        try:
+            self.form_bukti_transaksi = await asyncio.to_thread(store_receipt, files[0].file)
+            self.form_error_message = ""
+        except ValueError as e:
+            self.form_error_message = str(e)
+        except Exception as e:
+            print(f"Error storing receipt: {e}")
+            self.form_error_message = "Failed to upload the receipt. Please try again."
+        finally:
+            self.receipt_uploading = False
     
+    @timed_event
     def set_form_catatan_belanja(self, value: str):
         self.form_catatan_belanja = value
     
+    @timed_event
+    def set_form_produk_belanja(self, value: str):
+        self.form_produk_belanja = value
+    
+    @timed_event
+    def set_form_kuantitas_belanja(self, value: str):
+        self.form_kuantitas_belanja = value
+    
+    @timed_event
     def set_form_tanggal_pengeluaran(self, value: str):
         self.form_tanggal_pengeluaran = value
     
@@ -491,11 +839,13 @@ class TableState(rx.State):
             # Fallback to original items for backwards compatibility
             return self.filtered_sorted_items
     
+    @timed_event
     def set_sort_value(self, value: str):
         """Set the sort value."""
         self.sort_value = value
         self.load_entries()
     
+    @timed_event
     def set_search_value(self, value: str):
         """Set the search value."""
         self.search_value = value
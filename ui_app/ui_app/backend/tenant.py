@@ -0,0 +1,117 @@
+"""The business (tenant) that the current request works for.
+
+One deployment serves several UMKM businesses. Each request names its
+tenant in the ``X-Tenant-ID`` header, which the reverse proxy sets per
+business (e.g. per subdomain); without it the request belongs to
+``DEFAULT_TENANT_ID``, so single-business deployments need no setup.
+
+The tenant is kept in a context variable. States that subclass
+``TenantState`` set it from the browser session's headers around every
+event handler, and the HTTP routes set it from the request, so database
+helpers and caches read it with ``current_tenant()`` instead of taking it
+as an argument. Worker threads
+started with ``asyncio.to_thread`` inherit it; other threads must capture it
+and enter ``use_tenant`` themselves.
+"""
+
+import functools
+import inspect
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Mapping, Optional
+
+import reflex as rx
+
+DEFAULT_TENANT_ID = int(os.getenv("DEFAULT_TENANT_ID", "1"))
+TENANT_HEADER = "x-tenant-id"
+
+_current: ContextVar[int] = ContextVar("tenant", default=DEFAULT_TENANT_ID)
+
+
+def current_tenant() -> int:
+    """Id of the tenant of the current request."""
+    return _current.get()
+
+
+@contextmanager
+def use_tenant(tenant_id: int) -> Iterator[int]:
+    """Run the enclosed block on behalf of ``tenant_id``."""
+    token = _current.set(tenant_id)
+    try:
+        yield tenant_id
+    finally:
+        _current.reset(token)
+
+
+def tenant_from_headers(headers: Mapping[str, str]) -> int:
+    """Tenant named by the ``X-Tenant-ID`` header, or the default tenant.
+
+    Raises:
+        ValueError: if the header is present but not a positive integer.
+    """
+    value: Optional[str] = headers.get(TENANT_HEADER)
+    if not value:
+        return DEFAULT_TENANT_ID
+    tenant_id = int(value)
+    if tenant_id <= 0:
+        raise ValueError(f"Invalid tenant id: {value}")
+    return tenant_id
+
+
+def tenant_of_state(state) -> int:
+    """Tenant of the browser session that sent an event to ``state``."""
+    try:
+        headers = state.router.headers.raw_headers
+    except AttributeError:
+        return DEFAULT_TENANT_ID
+    return tenant_from_headers(headers)
+
+
+def _in_session_tenant(fn):
+    """Wrap an event handler to run on behalf of the tenant of the session that sent the event."""
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def async_gen_wrapper(self, *args, **kwargs):
+            with use_tenant(tenant_of_state(self)):
+                async for update in fn(self, *args, **kwargs):
+                    yield update
+        return async_gen_wrapper
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(self, *args, **kwargs):
+            with use_tenant(tenant_of_state(self)):
+                return await fn(self, *args, **kwargs)
+        return async_wrapper
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def gen_wrapper(self, *args, **kwargs):
+            with use_tenant(tenant_of_state(self)):
+                yield from fn(self, *args, **kwargs)
+        return gen_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with use_tenant(tenant_of_state(self)):
+            return fn(self, *args, **kwargs)
+    return wrapper
+
+
+class TenantState(rx.State, mixin=True):
+    """Mixin for states whose event handlers read or write a tenant's data.
+
+    Every event handler a subclass defines, background tasks included, runs
+    inside ``use_tenant`` for the tenant of the session that sent the event::
+
+        class TableState(TenantState, rx.State):
+            ...
+    """
+
+    def __init_subclass__(cls, mixin: bool = False, **kwargs):
+        if not mixin:
+            for name, value in list(cls.__dict__.items()):
+                if rx.State._item_is_event_handler(name, value):
+                    setattr(cls, name, _in_session_tenant(value))
+        super().__init_subclass__(mixin=mixin, **kwargs)
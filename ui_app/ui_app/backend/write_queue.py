@@ -0,0 +1,235 @@
+"""Write-behind queue that group-commits sale inserts.
+
+When ``WRITE_BEHIND_ENABLED`` is set, ``submit_penjualan`` hands validated
+sales to a background flusher instead of opening a session per sale. The
+flusher commits whatever has accumulated every ``WRITE_BEHIND_FLUSH_MS``
+milliseconds, or as soon as ``WRITE_BEHIND_MAX_BATCH`` rows are waiting. Each
+caller still waits until its own row is committed, so a successful return
+means the sale is durable; a caller that gives up after
+``WRITE_BEHIND_ACK_TIMEOUT`` seconds gets ``COMMIT_PENDING``, as its row is
+still queued and may commit afterwards. Rows are committed on behalf of the
+tenant that submitted them, one group per tenant.
+
+The acknowledgement timeout is kept longer than ``DATABASE_CONNECT_TIMEOUT``,
+so a flush that cannot reach the database usually answers before the caller
+gives up. Either way the flusher itself moves such rows to the offline journal
+(``offline_queue.py``), so a sale reported as pending is not lost.
+
+``submit_penjualan`` blocks, so event handlers run it in a worker thread
+(``asyncio.to_thread``) to keep the event loop free for other sessions.
+
+Sales that cannot be stored because the database is down are kept in the
+offline journal and stored once it is back.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Union
+
+from .database import DATABASE_CONNECT_TIMEOUT, DatabaseUnavailable, insert_penjualan, insert_penjualan_batch
+from .metrics import REGISTRY, Histogram, ROW_BUCKETS
+from .offline_queue import OFFLINE_QUEUE_ENABLED, QUEUED_OFFLINE, journal_penjualan
+from .tenant import current_tenant, use_tenant
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes")
+FLUSH_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "5"))
+MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "100"))
+# How long a request waits for its commit acknowledgement; longer than a
+# failed connection attempt, so an outage is answered before the caller gives up.
+ACK_TIMEOUT_SECONDS = float(os.getenv("WRITE_BEHIND_ACK_TIMEOUT", str(DATABASE_CONNECT_TIMEOUT * 3)))
+if ACK_TIMEOUT_SECONDS <= DATABASE_CONNECT_TIMEOUT:
+    print(
+        f"WRITE_BEHIND_ACK_TIMEOUT={ACK_TIMEOUT_SECONDS:g} is not longer than "
+        f"DATABASE_CONNECT_TIMEOUT={DATABASE_CONNECT_TIMEOUT}, using {DATABASE_CONNECT_TIMEOUT * 3}"
+    )
+    ACK_TIMEOUT_SECONDS = float(DATABASE_CONNECT_TIMEOUT * 3)
+
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "umkm_write_behind_batch_rows",
+    "Rows committed per write-behind flush.",
+    buckets=ROW_BUCKETS,
+))
+
+# Returned by submit_penjualan for a sale whose commit was not acknowledged in time.
+COMMIT_PENDING = "pending"
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """In-process queue drained by a single flusher thread.
+
+    ``offline`` is called, under the submitting tenant, for each row of a
+    flush that raised ``DatabaseUnavailable``; it returns whether the row
+    was kept for later.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[dict]], List[bool]],
+        interval_ms: int = FLUSH_INTERVAL_MS,
+        max_batch: int = MAX_BATCH,
+        offline: Optional[Callable[[dict], bool]] = None,
+    ):
+        self._flush = flush
+        self._offline = offline
+        self._interval = interval_ms / 1000.0
+        self._max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _start_locked(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="write-behind-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def start(self):
+        """Start the flusher thread if it is not running yet."""
+        with self._lock:
+            self._start_locked()
+
+    def submit(self, data: dict) -> Future:
+        """Enqueue a row for the current tenant; the future resolves to True once it is committed.
+
+        If the flush could not reach the database the future resolves to
+        ``QUEUED_OFFLINE`` when ``offline`` kept the row, and False otherwise.
+        """
+        future: Future = Future()
+        # Checked and enqueued under the lock, so nothing is queued after shutdown's stop marker.
+        with self._lock:
+            if self._closed:
+                future.set_result(False)
+                return future
+            self._start_locked()
+            self._queue.put((current_tenant(), data, future))
+        return future
+
+    def shutdown(self, timeout: float = 10.0):
+        """Flush everything still queued and stop the flusher."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _collect(self) -> tuple:
+        """Block for the first item, then gather more until the window closes."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self._interval
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            if stopping:
+                # Drain anything that raced in before the stop marker.
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+            if batch:
+                BATCH_SIZE.observe(len(batch))
+                tenants: Dict[int, list] = {}
+                for tenant, data, future in batch:
+                    tenants.setdefault(tenant, []).append((data, future))
+                for tenant, rows in tenants.items():
+                    with use_tenant(tenant):
+                        self._commit(rows)
+
+    def _commit(self, batch: list):
+        try:
+            results = self._flush([data for data, _ in batch])
+        except DatabaseUnavailable:
+            # Kept here rather than by the caller, which may have stopped waiting.
+            for data, future in batch:
+                future.set_result(QUEUED_OFFLINE if self._keep_offline(data) else False)
+            return
+        except Exception as e:
+            print(f"Error flushing write-behind batch: {e}")
+            results = [False] * len(batch)
+        for (_, future), ok in zip(batch, results):
+            future.set_result(bool(ok))
+
+    def _keep_offline(self, data: dict) -> bool:
+        if self._offline is None:
+            return False
+        try:
+            return bool(self._offline(data))
+        except Exception as e:
+            print(f"Error keeping write-behind row offline: {e}")
+            return False
+
+
+_penjualan_queue: Optional[WriteBehindQueue] = None
+_queue_lock = threading.Lock()
+
+
+def _get_penjualan_queue() -> WriteBehindQueue:
+    global _penjualan_queue
+    with _queue_lock:
+        if _penjualan_queue is None:
+            _penjualan_queue = WriteBehindQueue(
+                insert_penjualan_batch, offline=journal_penjualan if OFFLINE_QUEUE_ENABLED else None
+            )
+            atexit.register(_penjualan_queue.shutdown)
+        return _penjualan_queue
+
+
+def _store_penjualan(data: dict) -> Union[bool, str]:
+    if not WRITE_BEHIND_ENABLED:
+        return bool(insert_penjualan(data))
+    future = _get_penjualan_queue().submit(data)
+    try:
+        return future.result(timeout=ACK_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        print("Timed out waiting for penjualan commit, the sale is still queued")
+        return COMMIT_PENDING
+
+
+def submit_penjualan(data: dict) -> Union[bool, str]:
+    """Insert a penjualan record, group-committed when write-behind is enabled.
+
+    Blocks until the sale is committed; call it from a worker thread in
+    async code.
+
+    Returns:
+        True once the sale is committed, ``COMMIT_PENDING`` if it is still
+        queued when the acknowledgement times out, ``QUEUED_OFFLINE`` if the
+        database is down and the sale was saved to the offline journal
+        instead, and False if it was rejected.
+    """
+    try:
+        return _store_penjualan(data)
+    except DatabaseUnavailable:
+        if OFFLINE_QUEUE_ENABLED and journal_penjualan(data):
+            return QUEUED_OFFLINE
+        return False
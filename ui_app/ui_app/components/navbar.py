@@ -34,6 +34,7 @@ def nav_item(text: str, url: str) -> rx.Component:
                 text,
                 ("Overview", nav_item_icon("home")),
                 ("Pembukuan", nav_item_icon("book-open")),
+                ("Laba Rugi", nav_item_icon("scale")),
                 ("About", nav_item_icon("book")),
                 ("Profile", nav_item_icon("user")),
                 ("Settings", nav_item_icon("settings")),
@@ -115,6 +116,7 @@ def menu_button() -> rx.Component:
     ordered_page_routes = [
         "/",
         "/Pembukuan",  # Your table page
+        "/laba-rugi",
         "/about",
         "/profile",
         "/settings",
@@ -190,6 +192,7 @@ def navbar() -> rx.Component:
     ordered_page_routes = [
         "/",
         "/Pembukuan",  # Your table page
+        "/laba-rugi",
         "/about", 
         "/profile",
         "/settings",
@@ -3,9 +3,10 @@
 from typing import Dict, Any, List
 import reflex as rx
 
+from ..backend.money import format_rupiah
 from ..components.card import card
 from ..components.notification import notification
-from ..states.sales_dashboard import SalesDashboardState
+from ..states.sales_dashboard import FORECAST_HORIZONS, FORECAST_MODELS, SalesDashboardState
 
 
 def stats_card(title: str, value: str, icon: str, color: str = "blue") -> rx.Component:
@@ -110,6 +111,33 @@ def sales_filters() -> rx.Component:
                 spacing="2",
                 align="start",
             ),
+            rx.vstack(
+                rx.hstack(
+                    rx.icon("chart-spline", size=18, color="var(--violet-9)"),
+                    rx.text("Forecast", size="3", weight="bold", color="var(--gray-12)"),
+                    align="center",
+                    spacing="2",
+                ),
+                rx.hstack(
+                    rx.select(
+                        list(FORECAST_HORIZONS.keys()),
+                        value=SalesDashboardState.forecast_horizon,
+                        on_change=SalesDashboardState.set_forecast_horizon,
+                        width="160px",
+                        size="3",
+                    ),
+                    rx.select(
+                        list(FORECAST_MODELS.keys()),
+                        value=SalesDashboardState.forecast_model,
+                        on_change=SalesDashboardState.set_forecast_model,
+                        width="220px",
+                        size="3",
+                    ),
+                    spacing="2",
+                ),
+                spacing="2",
+                align="start",
+            ),
             spacing="8",
             align="start",
             width="100%",
@@ -132,13 +160,29 @@ def daily_revenue_chart() -> rx.Component:
                 align="center",
                 spacing="2",
             ),
-            rx.recharts.line_chart(
+            rx.recharts.composed_chart(
+                rx.recharts.area(
+                    data_key="interval",
+                    name="Forecast range",
+                    stroke="none",
+                    fill="#8b5cf6",
+                    fill_opacity=0.15,
+                ),
                 rx.recharts.line(
                     data_key="revenue",
                     stroke="#3b82f6",
                     stroke_width=3,
                     dot={"fill": "#3b82f6", "stroke": "#ffffff", "strokeWidth": 2, "r": 5},
                     active_dot={"r": 7, "fill": "#1d4ed8", "stroke": "#ffffff", "strokeWidth": 2},
+                    name="Revenue",
+                ),
+                rx.recharts.line(
+                    data_key="forecast",
+                    stroke="#8b5cf6",
+                    stroke_width=2,
+                    stroke_dasharray="6 4",
+                    dot=False,
+                    name="Forecast",
                 ),
                 rx.recharts.x_axis(
                     data_key="date",
@@ -148,7 +192,7 @@ def daily_revenue_chart() -> rx.Component:
                     tick={"fontSize": 12, "fill": "#64748b"},
                 ),
                 rx.recharts.y_axis(
-                    tick_formatter=rx.Var.create("(value) => 'Rp ' + value.toLocaleString()"),
+                    tick_formatter=rx.Var.create("(value) => 'Rp ' + Math.round(value / 100).toLocaleString()"),
                     tick={"fontSize": 12, "fill": "#64748b"},
                 ),
                 rx.recharts.cartesian_grid(
@@ -157,7 +201,11 @@ def daily_revenue_chart() -> rx.Component:
                     opacity=0.6,
                 ),
                 rx.recharts.tooltip(
-                    formatter=rx.Var.create("(value, name) => ['Rp ' + value.toLocaleString(), 'Revenue']"),
+                    formatter=rx.Var.create(
+                        "(value, name) => [Array.isArray(value)"
+                        " ? value.map((v) => 'Rp ' + Math.round(v / 100).toLocaleString()).join(' - ')"
+                        " : 'Rp ' + Math.round(value / 100).toLocaleString(), name]"
+                    ),
                     label_formatter=rx.Var.create("(value) => new Date(value).toLocaleDateString()"),
                     content_style={
                         "backgroundColor": "#ffffff",
@@ -166,7 +214,7 @@ def daily_revenue_chart() -> rx.Component:
                         "boxShadow": "0 4px 12px rgba(0,0,0,0.1)"
                     },
                 ),
-                data=SalesDashboardState.daily_revenue_data,
+                data=SalesDashboardState.revenue_chart_data,
                 width="100%",
                 height=400,
                 margin={"top": 20, "right": 30, "left": 20, "bottom": 60},
@@ -405,6 +453,40 @@ def quick_insights() -> rx.Component:
                     padding="16px",
                     border="1px solid rgba(59, 130, 246, 0.1)",
                 ),
+                rx.cond(
+                    SalesDashboardState.low_stock.length() > 0,
+                    rx.box(
+                        rx.hstack(
+                            rx.box(
+                                rx.icon("package", size=18, color="white"),
+                                background="linear-gradient(135deg, #f59e0b 0%, #d97706 100%)",
+                                border_radius="10px",
+                                padding="8px",
+                            ),
+                            rx.vstack(
+                                rx.text("Low Stock", size="2", color="var(--gray-11)", weight="medium"),
+                                rx.foreach(
+                                    SalesDashboardState.low_stock,
+                                    lambda item: rx.text(
+                                        f"{item.nama_produk}: {item.jumlah} left",
+                                        size="2",
+                                        weight="bold",
+                                        color=rx.cond(item.jumlah > 0, "var(--orange-10)", "var(--red-9)"),
+                                    ),
+                                ),
+                                align="start",
+                                spacing="1",
+                            ),
+                            align="center",
+                            spacing="3",
+                            width="100%",
+                        ),
+                        background="rgba(245, 158, 11, 0.05)",
+                        border_radius="12px",
+                        padding="16px",
+                        border="1px solid rgba(245, 158, 11, 0.1)",
+                    ),
+                ),
                 spacing="4",
                 align="start",
                 width="100%",
@@ -421,6 +503,135 @@ def quick_insights() -> rx.Component:
     )
 
 
+def _heatmap_cell(cell) -> rx.Component:
+    return rx.box(
+        title=cell.judul,
+        background=rx.cond(
+            cell.nilai > 0,
+            f"rgba(59, 130, 246, {cell.intensitas})",
+            "var(--gray-3)",
+        ),
+        border_radius="4px",
+        height="24px",
+        width="100%",
+    )
+
+
+def peak_hours_heatmap() -> rx.Component:
+    """Create the weekday by hour sales heatmap."""
+    return rx.box(
+        rx.vstack(
+            rx.hstack(
+                rx.hstack(
+                    rx.icon("clock", size=20, color="var(--blue-9)"),
+                    rx.heading("Peak Hours", size="4", color="var(--gray-12)"),
+                    align="center",
+                    spacing="2",
+                ),
+                rx.select(
+                    ["Orders", "Revenue"],
+                    value=SalesDashboardState.heatmap_metric,
+                    on_change=SalesDashboardState.set_heatmap_metric,
+                    size="2",
+                ),
+                justify="between",
+                align="center",
+                width="100%",
+            ),
+            rx.grid(
+                rx.box(),
+                *[
+                    rx.text(f"{jam:02d}" if jam % 3 == 0 else "", size="1", color="var(--gray-10)")
+                    for jam in range(24)
+                ],
+                rx.foreach(
+                    SalesDashboardState.heatmap_rows,
+                    lambda row: rx.fragment(
+                        rx.text(row.hari, size="1", color="var(--gray-11)", weight="medium"),
+                        rx.foreach(row.cells, _heatmap_cell),
+                    ),
+                ),
+                grid_template_columns="40px repeat(24, minmax(0, 1fr))",
+                gap="3px",
+                align_items="center",
+                width="100%",
+            ),
+            spacing="4",
+            align="start",
+            width="100%",
+        ),
+        background="linear-gradient(135deg, #ffffff 0%, #f8fafc 100%)",
+        border_radius="16px",
+        padding="24px",
+        border="1px solid var(--gray-6)",
+        box_shadow="0 4px 20px rgba(0,0,0,0.08)",
+        width="100%",
+    )
+
+
+def anomaly_insights() -> rx.Component:
+    """Create the panel listing flagged sales and expenses."""
+    return rx.box(
+        rx.vstack(
+            rx.hstack(
+                rx.icon("triangle-alert", size=20, color="var(--red-9)"),
+                rx.heading("Anomalies", size="4", color="var(--gray-12)"),
+                align="center",
+                spacing="2",
+            ),
+            rx.cond(
+                SalesDashboardState.formatted_anomalies.length() > 0,
+                rx.vstack(
+                    rx.foreach(
+                        SalesDashboardState.formatted_anomalies,
+                        lambda item: rx.box(
+                            rx.hstack(
+                                rx.box(
+                                    rx.icon(
+                                        rx.cond(item["sumber"] == "penjualan", "shopping-cart", "receipt"),
+                                        size=18,
+                                        color="white",
+                                    ),
+                                    background="linear-gradient(135deg, #ef4444 0%, #dc2626 100%)",
+                                    border_radius="10px",
+                                    padding="8px",
+                                ),
+                                rx.vstack(
+                                    rx.text(item["title"], size="2", weight="bold", color="var(--gray-12)"),
+                                    rx.text(item["detail"], size="2", color="var(--gray-11)"),
+                                    align="start",
+                                    spacing="1",
+                                ),
+                                align="center",
+                                spacing="3",
+                                width="100%",
+                            ),
+                            background="rgba(239, 68, 68, 0.05)",
+                            border_radius="12px",
+                            padding="16px",
+                            border="1px solid rgba(239, 68, 68, 0.1)",
+                            width="100%",
+                        ),
+                    ),
+                    spacing="3",
+                    width="100%",
+                    max_height="360px",
+                    overflow_y="auto",
+                ),
+                rx.text("No unusual sales or expenses.", size="2", color="var(--gray-11)"),
+            ),
+            spacing="4",
+            align="start",
+            width="100%",
+        ),
+        background="linear-gradient(135deg, #ffffff 0%, #f8fafc 100%)",
+        border_radius="16px",
+        padding="24px",
+        border="1px solid var(--gray-6)",
+        box_shadow="0 4px 20px rgba(0,0,0,0.08)",
+    )
+
+
 def sales_dashboard_content() -> rx.Component:
     """Main sales dashboard content with enhanced styling."""
     return rx.box(
@@ -444,19 +655,33 @@ def sales_dashboard_content() -> rx.Component:
                         align="start",
                         spacing="2",
                     ),
-                    rx.button(
-                        rx.icon("refresh-cw", size=16),
-                        "Refresh Data",
-                        on_click=SalesDashboardState.load_data,
-                        variant="outline",
-                        size="3",
-                        color_scheme="gray",
-                        style={
-                            "background": "rgba(255,255,255,0.1)",
-                            "border": "1px solid rgba(255,255,255,0.2)",
-                            "color": "white",
-                            "backdrop_filter": "blur(10px)",
-                        },
+                    rx.hstack(
+                        rx.cond(
+                            SalesDashboardState.live,
+                            rx.badge(
+                                rx.icon("radio", size=14),
+                                "Live",
+                                color_scheme="grass",
+                                variant="solid",
+                                size="2",
+                            ),
+                        ),
+                        rx.button(
+                            rx.icon("refresh-cw", size=16),
+                            "Refresh Data",
+                            on_click=SalesDashboardState.load_data,
+                            variant="outline",
+                            size="3",
+                            color_scheme="gray",
+                            style={
+                                "background": "rgba(255,255,255,0.1)",
+                                "border": "1px solid rgba(255,255,255,0.2)",
+                                "color": "white",
+                                "backdrop_filter": "blur(10px)",
+                            },
+                        ),
+                        align="center",
+                        spacing="3",
                     ),
                     justify="between",
                     align="center",
@@ -476,7 +701,7 @@ def sales_dashboard_content() -> rx.Component:
             rx.grid(
                 stats_card(
                     "Total Revenue",
-                    f"Rp {SalesDashboardState.total_revenue:,.0f}",
+                    format_rupiah(SalesDashboardState.total_revenue),
                     "dollar-sign",
                     "green",
                 ),
@@ -488,7 +713,7 @@ def sales_dashboard_content() -> rx.Component:
                 ),
                 stats_card(
                     "Average Order Value",
-                    f"Rp {SalesDashboardState.average_order_value:,.0f}",
+                    format_rupiah(SalesDashboardState.average_order_value),
                     "trending-up",
                     "purple",
                 ),
@@ -512,11 +737,14 @@ def sales_dashboard_content() -> rx.Component:
                 width="100%",
             ),
             
+            peak_hours_heatmap(),
+            
             # Bottom Section
             rx.grid(
                 top_products_table(),
                 quick_insights(),
-                columns="2",
+                anomaly_insights(),
+                columns="3",
                 spacing="6",
                 width="100%",
             ),
@@ -529,4 +757,6 @@ def sales_dashboard_content() -> rx.Component:
         min_height="100vh",
         padding="24px",
         width="100%",
+        on_mount=SalesDashboardState.watch_changes,
+        on_unmount=SalesDashboardState.stop_live,
     )
@@ -81,6 +81,7 @@ def sidebar_item(text: str, url: str) -> rx.Component:
                 text,
                 ("Overview", sidebar_item_icon("home")),
                 ("Pembukuan", sidebar_item_icon("book-open")),  # Added for your table page
+                ("Laba Rugi", sidebar_item_icon("scale")),
                 ("About", sidebar_item_icon("book")),
                 ("Profile", sidebar_item_icon("user")),
                 ("Settings", sidebar_item_icon("settings")),
@@ -135,6 +136,7 @@ def sidebar() -> rx.Component:
     ordered_page_routes = [
         "/",
         "/Pembukuan",  # Your table page
+        "/laba-rugi",
         "/about", 
         "/profile",
         "/settings",
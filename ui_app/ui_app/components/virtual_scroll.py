@@ -0,0 +1,22 @@
+import reflex as rx
+from reflex.vars.base import Var
+
+
+def _scroll_top(e: Var) -> tuple[Var[int]]:
+    """Pass the container's scroll offset in pixels to the handler."""
+    return (Var(f"Math.round({e}.target.scrollTop)").to(int),)
+
+
+class ScrollBox(rx.el.Div):
+    """A div whose scroll handlers receive ``scrollTop``.
+
+    React fires ``on_scroll_capture`` for the same scroll events as
+    ``on_scroll``, so one can be throttled while the other is debounced to
+    deliver the final position a throttle drops.
+    """
+
+    on_scroll: rx.EventHandler[_scroll_top]
+    on_scroll_capture: rx.EventHandler[_scroll_top]
+
+
+scroll_box = ScrollBox.create
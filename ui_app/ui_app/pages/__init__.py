@@ -1,7 +1,8 @@
 from .about import about
 from .index import index
+from .laba_rugi import laba_rugi
 from .profile import profile
 from .settings import settings
 from .table import table
 
-__all__ = ["about", "index", "profile", "settings", "table"]
+__all__ = ["about", "index", "laba_rugi", "profile", "settings", "table"]
@@ -0,0 +1,36 @@
+"""The laba rugi (profit and loss) page."""
+
+import reflex as rx
+
+from ..states.laba_rugi import LabaRugiState
+from ..templates import template
+from ..views.laba_rugi import (
+    kategori_table,
+    laba_rugi_filters,
+    laba_rugi_summary,
+    laba_rugi_table,
+)
+
+
+@template(route="/laba-rugi", title="Laba Rugi", on_load=LabaRugiState.load_data)
+def laba_rugi() -> rx.Component:
+    """The profit and loss page.
+
+    Returns:
+        The UI for the laba rugi page.
+
+    """
+    return rx.vstack(
+        rx.heading("Laba Rugi", size="5"),
+        laba_rugi_filters(),
+        laba_rugi_summary(),
+        rx.grid(
+            laba_rugi_table(),
+            kategori_table(),
+            columns="2",
+            spacing="6",
+            width="100%",
+        ),
+        spacing="6",
+        width="100%",
+    )
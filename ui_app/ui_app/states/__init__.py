@@ -1,5 +1,7 @@
 """States package."""
 
+from .kpi import KpiState
+from .laba_rugi import LabaRugiState
 from .sales_dashboard import SalesDashboardState
 
-__all__ = ["SalesDashboardState"]
+__all__ = ["KpiState", "LabaRugiState", "SalesDashboardState"]
@@ -0,0 +1,20 @@
+"""State for the month-over-month KPI stats cards."""
+
+from typing import List
+
+import reflex as rx
+
+from ..backend.kpi import Kpi, get_kpis
+from ..backend.metrics import timed_event
+from ..backend.tenant import TenantState
+
+
+class KpiState(TenantState, rx.State):
+    """KPIs shown by ``views.stats_cards``, amounts in cents."""
+
+    kpis: List[Kpi] = []
+
+    @timed_event
+    def load_kpis(self):
+        """Load the KPIs from the shared KPI cache."""
+        self.kpis = get_kpis()
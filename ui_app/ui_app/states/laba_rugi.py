@@ -0,0 +1,98 @@
+"""Laba rugi (profit and loss) report state."""
+
+from datetime import date
+from typing import Dict, List, Optional
+
+import reflex as rx
+
+from ..backend.metrics import timed_event
+from ..backend.money import format_rupiah
+from ..backend.reports import LabaRugi, get_laba_rugi
+from ..backend.tenant import TenantState
+
+PERIOD_OPTIONS = {
+    "Harian": "day",
+    "Bulanan": "month",
+    "Tahunan": "year",
+}
+
+
+def _parse_date(value: str) -> Optional[date]:
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+class LabaRugiState(TenantState, rx.State):
+    """State for the profit and loss report."""
+
+    # Filters
+    selected_period: str = "Bulanan"
+    start_date: str = ""
+    end_date: str = ""
+
+    # Report rows, oldest period first
+    rows: List[LabaRugi] = []
+
+    # Totals over all rows, in cents
+    total_pendapatan: int = 0
+    total_pengeluaran: int = 0
+    total_laba: int = 0
+    pengeluaran_per_kategori: Dict[str, int] = {}
+
+    @timed_event
+    def load_data(self):
+        """Load the report for the selected period and date range."""
+        self.rows = get_laba_rugi(
+            PERIOD_OPTIONS.get(self.selected_period, "month"),
+            _parse_date(self.start_date),
+            _parse_date(self.end_date),
+        )
+        self.total_pendapatan = sum(row.pendapatan for row in self.rows)
+        self.total_pengeluaran = sum(row.pengeluaran for row in self.rows)
+        self.total_laba = self.total_pendapatan - self.total_pengeluaran
+        kategori: Dict[str, int] = {}
+        for row in self.rows:
+            for nama, jumlah in row.pengeluaran_per_kategori.items():
+                kategori[nama] = kategori.get(nama, 0) + jumlah
+        self.pengeluaran_per_kategori = kategori
+
+    @timed_event
+    def set_selected_period(self, period: str):
+        self.selected_period = period
+        self.load_data()
+
+    @timed_event
+    def set_start_date(self, value: str):
+        self.start_date = value
+        self.load_data()
+
+    @timed_event
+    def set_end_date(self, value: str):
+        self.end_date = value
+        self.load_data()
+
+    @rx.var
+    def formatted_rows(self) -> List[Dict[str, str]]:
+        """Report rows formatted for the table, newest period first."""
+        return [
+            {
+                "periode": row.periode,
+                "pendapatan": format_rupiah(row.pendapatan),
+                "pengeluaran": format_rupiah(row.pengeluaran),
+                "laba_bersih": format_rupiah(row.laba_bersih),
+                "rugi": "1" if row.laba_bersih < 0 else "",
+            }
+            for row in reversed(self.rows)
+        ]
+
+    @rx.var
+    def formatted_kategori(self) -> List[Dict[str, str]]:
+        """Expense per category over the whole range, largest first."""
+        return [
+            {"kategori": nama, "jumlah": format_rupiah(jumlah)}
+            for nama, jumlah in sorted(
+                self.pengeluaran_per_kategori.items(), key=lambda item: item[1], reverse=True
+            )
+        ]
@@ -1,28 +1,115 @@
 """Sales dashboard state management."""
 
-from datetime import date, timedelta
-from typing import List, Dict, Any
+import asyncio
+from datetime import date
+from typing import List, Dict, Any, Optional, Tuple
 
 import reflex as rx
+from reflex.utils.prerequisites import get_and_validate_app
 
-from ..backend.database import get_penjualan_data, get_produk_data, Penjualan, Produk
+from ..backend import events
+from ..backend.analytics import apply_sale, get_dashboard, get_product_ids
+from ..backend.anomaly import Anomaly, get_anomalies
+from ..backend.database import get_stok_rendah, StokSaldo
+from ..backend.forecast import get_forecast
+from ..backend.heatmap import HeatmapRow, get_heatmap
+from ..backend.metrics import timed_event
+from ..backend.money import format_rupiah
+from ..backend.tenant import TenantState
 
 
-class SalesDashboardState(rx.State):
+FORECAST_HORIZONS = {
+    "Off": 0,
+    "Next 7 Days": 7,
+    "Next 30 Days": 30,
+}
+
+FORECAST_MODELS = {
+    "Holt-Winters": "holt_winters",
+    "Exponential Smoothing": "exp_smoothing",
+    "Moving Average": "moving_average",
+}
+
+# How often a live dashboard with no incoming changes checks that its browser tab is still connected.
+LIVE_CHECK_SECONDS = 30
+
+ANOMALY_TITLES = {
+    "entry": "Unusual amount",
+    "day_high": "Unusually high day",
+    "day_low": "Unusually low day",
+    "gap": "No entries recorded",
+    "duplicate": "Possible duplicate",
+}
+
+
+def _client_connected(token: str) -> bool:
+    """Whether the browser tab with this client token still has its websocket open on this backend."""
+    namespace = get_and_validate_app().app.event_namespace
+    return namespace is None or token in namespace.token_to_sid
+
+
+def _heatmap_rows(product_ids: Dict[str, int], product: str, metric: str) -> List[HeatmapRow]:
+    product_id = None if product == "All Products" else product_ids.get(product)
+    return get_heatmap(product_id, "revenue" if metric == "Revenue" else "orders")
+
+
+def _forecast(product: str, horizon_label: str, model_label: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Forecast points and the model used, or nothing when the forecast is off."""
+    horizon = FORECAST_HORIZONS.get(horizon_label, 0)
+    if not horizon:
+        return [], ""
+    forecast = get_forecast(product, horizon, FORECAST_MODELS.get(model_label, "holt_winters"))
+    return forecast["points"], forecast["model"]
+
+
+def _apply_changes(
+    changes: List[Dict[str, Any]],
+    product_ids: Dict[str, int],
+    metrics: Dict[str, Any],
+    product: str,
+    period: str,
+) -> Tuple[Dict[str, int], Optional[Dict[str, Any]]]:
+    """Apply new penjualan rows to loaded dashboard results without reloading them.
+
+    Returns:
+        The product list (reloaded if a change names a new product) and the
+        updated results, or None if no change affects them.
+    """
+    names = {product_id: name for name, product_id in product_ids.items()}
+    updated = metrics
+    for change in changes:
+        if change.get("table") != "penjualan" or not updated:
+            continue
+        if change["id_produk"] not in names:
+            product_ids = get_product_ids()
+            names = {product_id: name for name, product_id in product_ids.items()}
+        updated = apply_sale(
+            updated,
+            names.get(change["id_produk"], ""),
+            change["kuantitas"],
+            change["total"],
+            date.fromisoformat(change["tanggal"]),
+            product,
+            period,
+        )
+    return product_ids, (updated if updated is not metrics else None)
+
+
+class SalesDashboardState(TenantState, rx.State):
     """State for the sales dashboard."""
     
-    # Data
-    sales_data: List[Penjualan] = []
-    products_data: List[Produk] = []
+    # Data: only small result payloads, the sales themselves stay in the
+    # shared aggregate store
+    product_ids: Dict[str, int] = {}
     
     # Filters
     selected_product: str = "All Products"
     selected_period: str = "All Time"
     
-    # Computed metrics
-    total_revenue: float = 0.0
+    # Computed metrics, amounts in cents
+    total_revenue: int = 0
     total_orders: int = 0
-    average_order_value: float = 0.0
+    average_order_value: int = 0
     items_sold: int = 0
     
     # Chart data
@@ -30,213 +117,242 @@ class SalesDashboardState(rx.State):
     product_sales_data: List[Dict[str, Any]] = []
     top_products_data: List[Dict[str, Any]] = []
     
+    # Forecast overlay, amounts in cents
+    forecast_horizon: str = "Next 7 Days"
+    forecast_model: str = "Holt-Winters"
+    forecast_data: List[Dict[str, Any]] = []
+    forecast_model_used: str = ""
+    
     # Quick insights
     revenue_growth: float = 0.0
     orders_growth: float = 0.0
+    anomalies: List[Anomaly] = []
+    low_stock: List[StokSaldo] = []
+    
+    # Weekday x hour heatmap
+    heatmap_metric: str = "Orders"
+    heatmap_rows: List[HeatmapRow] = []
+    
+    # Live updates from change events
+    live: bool = False
+    _metrics: Dict[str, Any] = {}
     
+    # Incremented by every watch_changes, so only the newest watcher keeps running
+    _live_generation: int = 0
+    
+    # Incremented on every filter change, so stale recomputations are dropped
+    _filter_generation: int = 0
+    
+    @timed_event
     def load_data(self):
-        """Load sales and product data."""
+        """Load the product list and dashboard results."""
         try:
-            self.sales_data = get_penjualan_data()
-            self.products_data = get_produk_data()
+            self.product_ids = get_product_ids()
             self.calculate_metrics()
-            self.generate_chart_data()
+            self.anomalies = get_anomalies()
+            self.low_stock = get_stok_rendah()
         except Exception as e:
             print(f"Error loading data: {e}")
-            self.sales_data = []
-            self.products_data = []
-    
-    def filter_sales_data(self) -> List[Penjualan]:
-        """Filter sales data based on selected filters."""
-        filtered_data = self.sales_data
-        
-        # Filter by product
-        if self.selected_product != "All Products":
-            filtered_data = [
-                sale for sale in filtered_data 
-                if sale.nama_produk == self.selected_product
-            ]
-        
-        # Filter by period
-        if self.selected_period != "All Time":
-            if self.selected_period == "Last 7 Days":
-                days = 7
-            elif self.selected_period == "Last 30 Days":
-                days = 30
-            elif self.selected_period == "Last 90 Days":
-                days = 90
-            else:
-                days = 0
-            
-            if days > 0:
-                cutoff_date = date.today() - timedelta(days=days)
-                filtered_data = [
-                    sale for sale in filtered_data 
-                    if date.fromisoformat(sale.tanggal_penjualan) >= cutoff_date
-                ]
-        
-        return filtered_data
+            self.product_ids = {}
     
     def calculate_metrics(self):
-        """Calculate key metrics."""
-        filtered_data = self.filter_sales_data()
-        
-        if not filtered_data:
-            self.total_revenue = 0.0
-            self.total_orders = 0
-            self.average_order_value = 0.0
-            self.items_sold = 0
-            return
-        
-        self.total_revenue = sum(sale.total for sale in filtered_data)
-        self.total_orders = len(filtered_data)
-        self.average_order_value = self.total_revenue / self.total_orders if self.total_orders > 0 else 0.0
-        self.items_sold = sum(sale.kuantitas for sale in filtered_data)
-        
-        # Calculate growth metrics
-        self.calculate_growth_metrics()
+        """Calculate all metrics and chart data for the selected filters."""
+        self._set_metrics(get_dashboard(self.selected_product, self.selected_period))
+        self.calculate_forecast()
+        self.calculate_heatmap()
+    
+    def _set_metrics(self, metrics: Dict[str, Any]):
+        self._metrics = metrics
+        self.total_revenue = metrics["total_revenue"]
+        self.total_orders = metrics["total_orders"]
+        self.average_order_value = metrics["average_order_value"]
+        self.items_sold = metrics["items_sold"]
+        self.daily_revenue_data = metrics["daily_revenue_data"]
+        self.product_sales_data = metrics["product_sales_data"]
+        self.top_products_data = metrics["top_products_data"]
+        self.revenue_growth = metrics["revenue_growth"]
+        self.orders_growth = metrics["orders_growth"]
+    
+    def calculate_heatmap(self):
+        """Load the weekday x hour heatmap of the selected product."""
+        self.heatmap_rows = _heatmap_rows(self.product_ids, self.selected_product, self.heatmap_metric)
     
-    def calculate_growth_metrics(self):
-        """Calculate growth metrics for quick insights."""
+    def calculate_forecast(self):
+        """Forecast daily revenue of the selected product (cached per product and model)."""
+        self.forecast_data, self.forecast_model_used = _forecast(
+            self.selected_product, self.forecast_horizon, self.forecast_model
+        )
+    
+    async def _apply_changes(self, generation: int, changes: List[Dict[str, Any]]) -> bool:
+        """Apply new penjualan/belanja rows to the dashboard, querying outside the state lock.
+
+        Returns:
+            False once a newer watcher or ``stop_live`` took over.
+        """
+        async with self:
+            if generation != self._live_generation:
+                return False
+            product_ids, metrics = self.product_ids, self._metrics
+            product, period, heatmap_metric = self.selected_product, self.selected_period, self.heatmap_metric
+
+        def load():
+            ids, updated = _apply_changes(changes, product_ids, metrics, product, period)
+            heatmap = _heatmap_rows(ids, product, heatmap_metric) if updated is not None else None
+            return ids, updated, heatmap, get_anomalies(), get_stok_rendah()
+
+        product_ids, updated, heatmap, anomalies, low_stock = await asyncio.to_thread(load)
+        async with self:
+            if generation != self._live_generation:
+                return False
+            self.product_ids = product_ids
+            # A filter change meanwhile reloads results that already include these rows.
+            if updated is not None and self._metrics is metrics:
+                self._set_metrics(updated)
+                if heatmap_metric == self.heatmap_metric:
+                    self.heatmap_rows = heatmap
+            self.anomalies = anomalies
+            self.low_stock = low_stock
+        return True
+    
+    @rx.event(background=True)
+    async def watch_changes(self):
+        """Push new sales and expenses to this dashboard while it is open.
+
+        Stops when the dashboard is closed, when its browser tab disconnects
+        (checked every ``LIVE_CHECK_SECONDS`` without changes) or when the
+        dashboard is opened again, which starts a new watcher.
+        """
+        async with self:
+            self._live_generation += 1
+            generation = self._live_generation
+            self.live = True
+            token = self.router.session.client_token
+        subscription = events.subscribe()
         try:
-            current_period_data = self.filter_sales_data()
-            
-            # Get previous period data for comparison
-            if self.selected_period == "All Time":
-                # Compare last 30 days vs previous 30 days
-                current_cutoff = date.today() - timedelta(days=30)
-                previous_cutoff = date.today() - timedelta(days=60)
-                
-                current_data = [
-                    sale for sale in self.sales_data 
-                    if date.fromisoformat(sale.tanggal_penjualan) >= current_cutoff
-                ]
-                previous_data = [
-                    sale for sale in self.sales_data 
-                    if previous_cutoff <= date.fromisoformat(sale.tanggal_penjualan) < current_cutoff
-                ]
-            else:
-                if self.selected_period == "Last 7 Days":
-                    days = 7
-                elif self.selected_period == "Last 30 Days":
-                    days = 30
-                elif self.selected_period == "Last 90 Days":
-                    days = 90
-                else:
-                    days = 30
-                
-                current_cutoff = date.today() - timedelta(days=days)
-                previous_cutoff = date.today() - timedelta(days=days*2)
-                
-                current_data = [
-                    sale for sale in self.sales_data 
-                    if date.fromisoformat(sale.tanggal_penjualan) >= current_cutoff
-                ]
-                previous_data = [
-                    sale for sale in self.sales_data 
-                    if previous_cutoff <= date.fromisoformat(sale.tanggal_penjualan) < current_cutoff
-                ]
-            
-            # Apply product filter to both periods
-            if self.selected_product != "All Products":
-                current_data = [
-                    sale for sale in current_data 
-                    if sale.nama_produk == self.selected_product
-                ]
-                previous_data = [
-                    sale for sale in previous_data 
-                    if sale.nama_produk == self.selected_product
-                ]
-            
-            # Calculate growth
-            current_revenue = sum(sale.total for sale in current_data)
-            previous_revenue = sum(sale.total for sale in previous_data)
-            
-            current_orders = len(current_data)
-            previous_orders = len(previous_data)
-            
-            self.revenue_growth = ((current_revenue - previous_revenue) / previous_revenue * 100) if previous_revenue > 0 else 0.0
-            self.orders_growth = ((current_orders - previous_orders) / previous_orders * 100) if previous_orders > 0 else 0.0
-            
-        except Exception as e:
-            print(f"Error calculating growth metrics: {e}")
-            self.revenue_growth = 0.0
-            self.orders_growth = 0.0
+            while True:
+                try:
+                    changes = [await asyncio.wait_for(subscription.get(), LIVE_CHECK_SECONDS)]
+                except asyncio.TimeoutError:
+                    if not _client_connected(token):
+                        break
+                    changes = []
+                changes += subscription.drain()
+                if changes:
+                    if not await self._apply_changes(generation, changes):
+                        return
+                    continue
+                async with self:
+                    if generation != self._live_generation:
+                        return
+        finally:
+            events.unsubscribe(subscription)
+        async with self:
+            if generation == self._live_generation:
+                self.live = False
     
-    def generate_chart_data(self):
-        """Generate data for charts."""
-        filtered_data = self.filter_sales_data()
-        
-        # Daily revenue data
-        daily_revenue = {}
-        for sale in filtered_data:
-            date_str = sale.tanggal_penjualan
-            if date_str not in daily_revenue:
-                daily_revenue[date_str] = 0.0
-            daily_revenue[date_str] += sale.total
-        
-        self.daily_revenue_data = [
-            {"date": date_str, "revenue": revenue}
-            for date_str, revenue in sorted(daily_revenue.items())
-        ]
-        
-        # Product sales data with enhanced colors
-        product_sales = {}
-        for sale in filtered_data:
-            product_name = sale.nama_produk
-            if product_name not in product_sales:
-                product_sales[product_name] = {"revenue": 0.0, "quantity": 0}
-            product_sales[product_name]["revenue"] += sale.total
-            product_sales[product_name]["quantity"] += sale.kuantitas
-        
-        # Enhanced color palette with better contrast and modern colors
-        colors = [
-            "#3b82f6",  # Blue
-            "#10b981",  # Emerald
-            "#f59e0b",  # Amber
-            "#ef4444",  # Red
-            "#8b5cf6",  # Violet
-            "#06b6d4",  # Cyan
-            "#f97316",  # Orange
-            "#84cc16",  # Lime
-            "#ec4899",  # Pink
-            "#6366f1",  # Indigo
-            "#14b8a6",  # Teal
-            "#f43f5e",  # Rose
-        ]
-        self.product_sales_data = [
-            {
-                "product": product, 
-                "revenue": data["revenue"], 
-                "quantity": data["quantity"],
-                "fill": colors[i % len(colors)]
-            }
-            for i, (product, data) in enumerate(product_sales.items())
-        ]
-        
-        # Top products data (keep raw values for table formatting)
-        self.top_products_data = sorted(
-            self.product_sales_data, 
-            key=lambda x: x["revenue"], 
-            reverse=True
-        )[:5]
+    @rx.event
+    def stop_live(self):
+        """Stop live updates when the dashboard is closed."""
+        self._live_generation += 1
+        self.live = False
     
+    @timed_event
     def set_selected_product(self, product: str):
         """Set selected product filter."""
         self.selected_product = product
-        self.calculate_metrics()
-        self.generate_chart_data()
+        self._filter_generation += 1
+        return SalesDashboardState.refresh_metrics
     
+    @timed_event
     def set_selected_period(self, period: str):
         """Set selected period filter."""
         self.selected_period = period
-        self.calculate_metrics()
-        self.generate_chart_data()
+        self._filter_generation += 1
+        return SalesDashboardState.refresh_metrics
+    
+    @rx.event(background=True)
+    async def refresh_metrics(self):
+        """Recompute the dashboard for the filters, unless they changed again meanwhile.
+
+        Only the result for the latest filter selection is applied; results
+        of superseded selections are dropped.
+        """
+        async with self:
+            generation = self._filter_generation
+            product = self.selected_product
+            period = self.selected_period
+            product_ids = self.product_ids
+            horizon, model, heatmap_metric = self.forecast_horizon, self.forecast_model, self.heatmap_metric
+
+        def load():
+            return (
+                get_dashboard(product, period),
+                _forecast(product, horizon, model),
+                _heatmap_rows(product_ids, product, heatmap_metric),
+            )
+
+        metrics, (forecast_data, forecast_model_used), heatmap = await asyncio.to_thread(load)
+        async with self:
+            if generation != self._filter_generation:
+                return
+            self._set_metrics(metrics)
+            if (horizon, model) == (self.forecast_horizon, self.forecast_model):
+                self.forecast_data, self.forecast_model_used = forecast_data, forecast_model_used
+            if heatmap_metric == self.heatmap_metric:
+                self.heatmap_rows = heatmap
+
+    @timed_event
+    def set_forecast_horizon(self, horizon: str):
+        """Set the forecast horizon."""
+        self.forecast_horizon = horizon
+        self.calculate_forecast()
+    
+    @timed_event
+    def set_heatmap_metric(self, metric: str):
+        """Show orders or revenue in the heatmap."""
+        self.heatmap_metric = metric
+        self.calculate_heatmap()
+    
+    @timed_event
+    def set_forecast_model(self, model: str):
+        """Set the forecast model."""
+        self.forecast_model = model
+        self.calculate_forecast()
+
+    @rx.var
+    def revenue_chart_data(self) -> List[Dict[str, Any]]:
+        """Daily revenue followed by the forecast, with its interval as a [lower, upper] band."""
+        return self.daily_revenue_data + [
+            {
+                "date": point["date"],
+                "forecast": point["forecast"],
+                "interval": [point["lower"], point["upper"]],
+            }
+            for point in self.forecast_data
+        ]
+
+    @rx.var
+    def formatted_anomalies(self) -> List[Dict[str, str]]:
+        """Flagged sales and expenses for the insights panel, newest first."""
+        rows = []
+        for anomaly in self.anomalies:
+            if anomaly.jenis == "gap":
+                detail = f"Nothing recorded since {anomaly.tanggal} (usually {format_rupiah(anomaly.rata_rata)} a day)"
+            elif anomaly.jenis == "duplicate":
+                detail = f"{format_rupiah(anomaly.jumlah)} entered twice on {anomaly.tanggal}"
+            else:
+                detail = f"{format_rupiah(anomaly.jumlah)} on {anomaly.tanggal} (usually {format_rupiah(anomaly.rata_rata)})"
+            rows.append({
+                "title": f"{ANOMALY_TITLES.get(anomaly.jenis, anomaly.jenis)}: {anomaly.nama}",
+                "detail": detail,
+                "sumber": anomaly.sumber,
+            })
+        return rows
 
     @rx.var
     def product_options(self) -> List[str]:
         """Get list of product options for the filter."""
-        return ["All Products"] + [product.nama_produk for product in self.products_data]
+        return ["All Products"] + list(self.product_ids)
 
     @rx.var
     def pie_chart_colors(self) -> List[str]:
@@ -251,7 +367,7 @@ class SalesDashboardState(rx.State):
             {
                 "rank": str(i + 1),
                 "product": item["product"],
-                "revenue": f"Rp {item['revenue']:,.0f}",
+                "revenue": format_rupiah(item["revenue"]),
                 "quantity": f"{item['quantity']:,}"
             }
             for i, item in enumerate(self.top_products_data)
@@ -2,12 +2,18 @@
 
 # Import all the pages.
 import reflex as rx
+from starlette.applications import Starlette
 
 from . import styles
+from .backend import export, forecast, metrics, receipts
 from .pages import *
 
+# Extra backend routes served alongside the Reflex app.
+api = Starlette(routes=[*metrics.routes, *export.routes, *forecast.routes, *receipts.routes])
+
 # Create the app.
 app = rx.App(
     style=styles.base_style,
     stylesheets=styles.base_stylesheets,
+    api_transformer=api,
 )
@@ -1,21 +1,33 @@
 import datetime
 import random
 
+from typing import Any, Dict, List
+
 import reflex as rx
 from reflex.components.radix.themes.base import (
     LiteralAccentColor,
 )
 
+from ..backend.metrics import timed_event
+from ..backend.reports import get_chart_series
+from ..backend.tenant import TenantState
+
+RUPIAH_FORMATTER = "(value) => 'Rp ' + Math.round(value / 100).toLocaleString()"
+
+
+TIMEFRAME_PERIODS = {"Monthly": "month", "Yearly": "year"}
+
+
+class StatsState(TenantState, rx.State):
+    """Chart data; pages showing these charts load it with ``on_load=StatsState.load_data``."""
 
-class StatsState(rx.State):
     area_toggle: bool = True
     selected_tab: str = "users"
     timeframe: str = "Monthly"
-    users_data = []
-    revenue_data = []
-    orders_data = []
-    device_data = []
-    yearly_device_data = []
+    users_data: List[Dict[str, Any]] = []
+    revenue_data: List[Dict[str, Any]] = []  # Revenue in cents
+    orders_data: List[Dict[str, Any]] = []
+    expense_data: List[Dict[str, Any]] = []  # expenses per category in cents
 
     @rx.event
     def set_selected_tab(self, tab: str | list[str]):
@@ -24,52 +36,37 @@ class StatsState(rx.State):
     def toggle_areachart(self):
         self.area_toggle = not self.area_toggle
 
+    @timed_event
+    def set_timeframe(self, timeframe: str):
+        self.timeframe = timeframe
+        self.load_data()
+
+    @timed_event
+    def load_data(self):
+        """Load the revenue, orders and expense series for the timeframe.
+
+        The series come from a cache shared by all sessions and are
+        recomputed only after penjualan or belanja change.
+        """
+        series = get_chart_series(TIMEFRAME_PERIODS.get(self.timeframe, "month"))
+        self.revenue_data = series["revenue"]
+        self.orders_data = series["orders"]
+        self.expense_data = series["expenses"]
+        self.randomize_data()
+
     def randomize_data(self):
-        # If data is already populated, don't randomize
+        # There is no user table, so the users chart stays a demo.
         if self.users_data:
             return
 
-        for i in range(30, -1, -1):  # Include today's data
-            self.revenue_data.append(
-                {
-                    "Date": (
-                        datetime.datetime.now() - datetime.timedelta(days=i)
-                    ).strftime("%m-%d"),
-                    "Revenue": random.randint(1000, 5000),
-                }
-            )
-        for i in range(30, -1, -1):
-            self.orders_data.append(
-                {
-                    "Date": (
-                        datetime.datetime.now() - datetime.timedelta(days=i)
-                    ).strftime("%m-%d"),
-                    "Orders": random.randint(100, 500),
-                }
-            )
-
-        for i in range(30, -1, -1):
-            self.users_data.append(
-                {
-                    "Date": (
-                        datetime.datetime.now() - datetime.timedelta(days=i)
-                    ).strftime("%m-%d"),
-                    "Users": random.randint(100, 500),
-                }
-            )
-
-        self.device_data = [
-            {"name": "Desktop", "value": 23, "fill": "var(--blue-8)"},
-            {"name": "Mobile", "value": 47, "fill": "var(--green-8)"},
-            {"name": "Tablet", "value": 25, "fill": "var(--purple-8)"},
-            {"name": "Other", "value": 5, "fill": "var(--red-8)"},
-        ]
-
-        self.yearly_device_data = [
-            {"name": "Desktop", "value": 34, "fill": "var(--blue-8)"},
-            {"name": "Mobile", "value": 46, "fill": "var(--green-8)"},
-            {"name": "Tablet", "value": 21, "fill": "var(--purple-8)"},
-            {"name": "Other", "value": 9, "fill": "var(--red-8)"},
+        self.users_data = [
+            {
+                "Date": (
+                    datetime.datetime.now() - datetime.timedelta(days=i)
+                ).strftime("%m-%d"),
+                "Users": random.randint(100, 500),
+            }
+            for i in range(30, -1, -1)  # Include today's data
         ]
 
 
@@ -113,7 +110,8 @@ def _create_gradient(color: LiteralAccentColor, id: str) -> rx.Component:
     )
 
 
-def _custom_tooltip(color: LiteralAccentColor) -> rx.Component:
+def _custom_tooltip(color: LiteralAccentColor, formatter: str = "") -> rx.Component:
+    extra = {"formatter": rx.Var.create(formatter)} if formatter else {}
     return (
         rx.recharts.graphing_tooltip(
             separator=" : ",
@@ -126,6 +124,7 @@ def _custom_tooltip(color: LiteralAccentColor) -> rx.Component:
                 "boxShadow": "0 4px 6px -1px rgb(0 0 0 / 0.1), 0 2px 4px -2px rgb(0 0 0 / 0.1)",
             },
             is_animation_active=True,
+            **extra,
         ),
     )
 
@@ -175,7 +174,7 @@ def revenue_chart() -> rx.Component:
         StatsState.area_toggle,
         rx.recharts.area_chart(
             _create_gradient("green", "colorGreen"),
-            _custom_tooltip("green"),
+            _custom_tooltip("green", RUPIAH_FORMATTER),
             rx.recharts.cartesian_grid(
                 stroke_dasharray="3 3",
             ),
@@ -186,13 +185,13 @@ def revenue_chart() -> rx.Component:
                 type_="monotone",
             ),
             rx.recharts.x_axis(data_key="Date", scale="auto"),
-            rx.recharts.y_axis(),
+            rx.recharts.y_axis(tick_formatter=rx.Var.create(RUPIAH_FORMATTER)),
             rx.recharts.legend(),
             data=StatsState.revenue_data,
             height=425,
         ),
         rx.recharts.bar_chart(
-            _custom_tooltip("green"),
+            _custom_tooltip("green", RUPIAH_FORMATTER),
             rx.recharts.cartesian_grid(
                 stroke_dasharray="3 3",
             ),
@@ -202,7 +201,7 @@ def revenue_chart() -> rx.Component:
                 fill=rx.color("green", 7),
             ),
             rx.recharts.x_axis(data_key="Date", scale="auto"),
-            rx.recharts.y_axis(),
+            rx.recharts.y_axis(tick_formatter=rx.Var.create(RUPIAH_FORMATTER)),
             rx.recharts.legend(),
             data=StatsState.revenue_data,
             height=425,
@@ -251,38 +250,22 @@ def orders_chart() -> rx.Component:
 
 
 def pie_chart() -> rx.Component:
-    return rx.cond(
-        StatsState.timeframe == "Yearly",
-        rx.recharts.pie_chart(
-            rx.recharts.pie(
-                data=StatsState.yearly_device_data,
-                data_key="value",
-                name_key="name",
-                cx="50%",
-                cy="50%",
-                padding_angle=1,
-                inner_radius="70",
-                outer_radius="100",
-                label=True,
-            ),
-            rx.recharts.legend(),
-            height=300,
-        ),
-        rx.recharts.pie_chart(
-            rx.recharts.pie(
-                data=StatsState.device_data,
-                data_key="value",
-                name_key="name",
-                cx="50%",
-                cy="50%",
-                padding_angle=1,
-                inner_radius="70",
-                outer_radius="100",
-                label=True,
-            ),
-            rx.recharts.legend(),
-            height=300,
+    """Expenses per category in the current month or year."""
+    return rx.recharts.pie_chart(
+        rx.recharts.pie(
+            data=StatsState.expense_data,
+            data_key="value",
+            name_key="name",
+            cx="50%",
+            cy="50%",
+            padding_angle=1,
+            inner_radius="70",
+            outer_radius="100",
+            label=False,
         ),
+        rx.recharts.tooltip(formatter=rx.Var.create(RUPIAH_FORMATTER)),
+        rx.recharts.legend(),
+        height=300,
     )
 
 
@@ -0,0 +1,127 @@
+import reflex as rx
+
+from ..backend.money import format_rupiah
+from ..states.laba_rugi import PERIOD_OPTIONS, LabaRugiState
+
+
+def _summary_card(title: str, value, icon: str, color: str) -> rx.Component:
+    return rx.card(
+        rx.hstack(
+            rx.badge(
+                rx.icon(tag=icon, size=28),
+                color_scheme=color,
+                radius="full",
+                padding="0.6rem",
+            ),
+            rx.vstack(
+                rx.text(title, size="2", color=rx.color("gray", 11), weight="medium"),
+                rx.heading(format_rupiah(value), size="5", weight="bold"),
+                spacing="1",
+                align_items="start",
+            ),
+            spacing="4",
+            align="center",
+        ),
+        size="3",
+        width="100%",
+    )
+
+
+def laba_rugi_filters() -> rx.Component:
+    """Period and date range selection."""
+    return rx.hstack(
+        rx.select(
+            list(PERIOD_OPTIONS.keys()),
+            value=LabaRugiState.selected_period,
+            on_change=LabaRugiState.set_selected_period,
+            size="3",
+        ),
+        rx.input(
+            type="date",
+            value=LabaRugiState.start_date,
+            on_change=LabaRugiState.set_start_date,
+            size="3",
+        ),
+        rx.text("s/d", color=rx.color("gray", 11)),
+        rx.input(
+            type="date",
+            value=LabaRugiState.end_date,
+            on_change=LabaRugiState.set_end_date,
+            size="3",
+        ),
+        spacing="3",
+        align="center",
+        wrap="wrap",
+    )
+
+
+def laba_rugi_summary() -> rx.Component:
+    """Totals for the selected range."""
+    return rx.grid(
+        _summary_card("Pendapatan", LabaRugiState.total_pendapatan, "trending-up", "green"),
+        _summary_card("Pengeluaran", LabaRugiState.total_pengeluaran, "trending-down", "tomato"),
+        _summary_card("Laba Bersih", LabaRugiState.total_laba, "wallet", "blue"),
+        columns="3",
+        spacing="4",
+        width="100%",
+    )
+
+
+def laba_rugi_table() -> rx.Component:
+    """Profit and loss per period."""
+    return rx.table.root(
+        rx.table.header(
+            rx.table.row(
+                rx.table.column_header_cell("Periode"),
+                rx.table.column_header_cell("Pendapatan"),
+                rx.table.column_header_cell("Pengeluaran"),
+                rx.table.column_header_cell("Laba Bersih"),
+            ),
+        ),
+        rx.table.body(
+            rx.foreach(
+                LabaRugiState.formatted_rows,
+                lambda row: rx.table.row(
+                    rx.table.row_header_cell(row["periode"]),
+                    rx.table.cell(row["pendapatan"]),
+                    rx.table.cell(row["pengeluaran"]),
+                    rx.table.cell(
+                        rx.text(
+                            row["laba_bersih"],
+                            weight="bold",
+                            color=rx.cond(row["rugi"] == "1", rx.color("red", 9), rx.color("green", 9)),
+                        )
+                    ),
+                    align="center",
+                ),
+            )
+        ),
+        variant="surface",
+        size="3",
+        width="100%",
+    )
+
+
+def kategori_table() -> rx.Component:
+    """Expense per category over the selected range."""
+    return rx.table.root(
+        rx.table.header(
+            rx.table.row(
+                rx.table.column_header_cell("Kategori"),
+                rx.table.column_header_cell("Pengeluaran"),
+            ),
+        ),
+        rx.table.body(
+            rx.foreach(
+                LabaRugiState.formatted_kategori,
+                lambda row: rx.table.row(
+                    rx.table.row_header_cell(row["kategori"]),
+                    rx.table.cell(row["jumlah"]),
+                    align="center",
+                ),
+            )
+        ),
+        variant="surface",
+        size="3",
+        width="100%",
+    )
@@ -2,26 +2,28 @@ import reflex as rx
 from reflex.components.radix.themes.base import LiteralAccentColor
 
 from .. import styles
+from ..backend.kpi import Kpi
+from ..backend.money import format_rupiah
+from ..states.kpi import KpiState
+
+# Icon and color per KPI name.
+KPI_ICONS = {
+    "Revenue": ("dollar-sign", "green"),
+    "Orders": ("shopping-cart", "purple"),
+    "Average Order Value": ("receipt", "blue"),
+}
 
 
 def stats_card(
     stat_name: str,
-    value: int,
-    prev_value: int,
+    value: rx.Var,
+    percentage_change: rx.Var,
+    increased: rx.Var,
     icon: str,
     icon_color: LiteralAccentColor,
-    extra_char: str = "",
 ) -> rx.Component:
-    percentage_change = (
-        round(((value - prev_value) / prev_value) * 100, 2)
-        if prev_value != 0
-        else 0
-        if value == 0
-        else float("inf")
-    )
-    change = "increase" if value > prev_value else "decrease"
-    arrow_icon = "trending-up" if value > prev_value else "trending-down"
-    arrow_color = "grass" if value > prev_value else "tomato"
+    change = rx.cond(increased, "increase", "decrease")
+    arrow_color = rx.cond(increased, "grass", "tomato")
     return rx.card(
         rx.vstack(
             rx.hstack(
@@ -33,7 +35,7 @@ def stats_card(
                 ),
                 rx.vstack(
                     rx.heading(
-                        f"{extra_char}{value:,}",
+                        value,
                         size="6",
                         weight="bold",
                     ),
@@ -50,10 +52,10 @@ def stats_card(
             ),
             rx.hstack(
                 rx.hstack(
-                    rx.icon(
-                        tag=arrow_icon,
-                        size=24,
-                        color=rx.color(arrow_color, 9),
+                    rx.cond(
+                        increased,
+                        rx.icon(tag="trending-up", size=24, color=rx.color("grass", 9)),
+                        rx.icon(tag="trending-down", size=24, color=rx.color("tomato", 9)),
                     ),
                     rx.text(
                         f"{percentage_change}%",
@@ -80,30 +82,32 @@ def stats_card(
     )
 
 
+def kpi_card(kpi: Kpi) -> rx.Component:
+    """Stats card for one KPI from ``KpiState.kpis``."""
+    return rx.match(
+        kpi.nama,
+        *[
+            (
+                nama,
+                stats_card(
+                    stat_name=nama,
+                    value=kpi.nilai.to_string() if nama == "Orders" else format_rupiah(kpi.nilai),
+                    percentage_change=kpi.perubahan,
+                    increased=kpi.naik,
+                    icon=icon,
+                    icon_color=icon_color,
+                ),
+            )
+            for nama, (icon, icon_color) in KPI_ICONS.items()
+        ],
+        rx.fragment(),
+    )
+
+
 def stats_cards() -> rx.Component:
+    """Month-over-month revenue, orders and average order value, loaded on mount."""
     return rx.grid(
-        stats_card(
-            stat_name="Users",
-            value=4200,
-            prev_value=3000,
-            icon="users",
-            icon_color="blue",
-        ),
-        stats_card(
-            stat_name="Revenue",
-            value=12000,
-            prev_value=15000,
-            icon="dollar-sign",
-            icon_color="green",
-            extra_char="$",
-        ),
-        stats_card(
-            stat_name="Orders",
-            value=300,
-            prev_value=250,
-            icon="shopping-cart",
-            icon_color="purple",
-        ),
+        rx.foreach(KpiState.kpis, kpi_card),
         gap="1rem",
         grid_template_columns=[
             "1fr",
@@ -113,4 +117,5 @@ def stats_cards() -> rx.Component:
             "repeat(3, 1fr)",
         ],
         width="100%",
+        on_mount=KpiState.load_kpis,
     )
@@ -1,8 +1,98 @@
 import reflex as rx
+from reflex.config import get_config
 
-from ..backend.table_state import Item, TableState
+from ..backend.table_state import (
+    VIRTUAL_ROW_HEIGHT,
+    VIRTUAL_VIEWPORT_ROWS,
+    Item,
+    TableState,
+)
 from ..backend.database import Penjualan, Belanja
+from ..backend.money import format_rupiah
+from ..backend.receipts import EXTENSIONS, RECEIPT_MAX_BYTES
 from ..components.status_badge import status_badge
+from ..components.virtual_scroll import scroll_box
+
+SEARCH_DEBOUNCE_MS = 300  # search inputs send their value after this pause in typing
+SCROLL_THROTTLE_MS = 100  # virtual tables report the scroll position at most this often
+SCROLL_SETTLE_MS = 150  # and once more after scrolling stops, for the final position
+
+# Fixed row style for virtual scroll mode; long text is cut off, not wrapped.
+_VIRTUAL_ROW_STYLE = {
+    "height": f"{VIRTUAL_ROW_HEIGHT}px",
+    "white_space": "nowrap",
+    "overflow": "hidden",
+    "text_overflow": "ellipsis",
+}
+
+RECEIPT_UPLOAD_ID = "receipt_upload"
+_RECEIPTS_URL = f"{get_config().api_url.rstrip('/')}/receipts/"
+
+
+def _receipt_field() -> rx.Component:
+    """Receipt text input with an upload button and a thumbnail of the uploaded file."""
+    return rx.hstack(
+        rx.input(
+            placeholder="Receipt/Proof",
+            value=TableState.form_bukti_transaksi,
+            on_change=TableState.set_form_bukti_transaksi,
+            size="2",
+            flex="1",
+        ),
+        rx.upload(
+            rx.button(
+                rx.icon("upload", size=16),
+                "Upload",
+                loading=TableState.receipt_uploading,
+                size="2",
+                variant="soft",
+                type="button",
+            ),
+            id=RECEIPT_UPLOAD_ID,
+            accept={media_type: [extension] for media_type, extension in EXTENSIONS.items()},
+            max_files=1,
+            max_size=RECEIPT_MAX_BYTES,
+            no_drag=True,
+            on_drop=TableState.upload_receipt(rx.upload_files(upload_id=RECEIPT_UPLOAD_ID)),
+            border="none",
+            padding="0",
+        ),
+        rx.cond(
+            TableState.form_receipt_url != "",
+            rx.link(
+                rx.image(
+                    src=TableState.form_receipt_url + "/thumbnail",
+                    alt="Receipt",
+                    height="32px",
+                    border_radius="4px",
+                ),
+                href=TableState.form_receipt_url,
+                is_external=True,
+            ),
+        ),
+        width="100%",
+        spacing="3",
+        align="center",
+    )
+
+
+def _receipt_cell(item: Belanja) -> rx.Component:
+    """Thumbnail linking to the uploaded receipt, or the free-text proof."""
+    return rx.cond(
+        item.bukti_sha256 != "",
+        rx.link(
+            rx.image(
+                src=_RECEIPTS_URL + item.bukti_sha256 + "/thumbnail",
+                alt="Receipt",
+                height="32px",
+                loading="lazy",
+                border_radius="4px",
+            ),
+            href=_RECEIPTS_URL + item.bukti_sha256,
+            is_external=True,
+        ),
+        rx.text(item.bukti_transaksi),
+    )
 
 
 def add_data_modal() -> rx.Component:
@@ -84,6 +174,14 @@ def add_data_modal() -> rx.Component:
                             size="2",
                             width="100%",
                         ),
+                        rx.cond(
+                            TableState.form_id_produk != "",
+                            rx.text(
+                                f"Stock on hand: {TableState.form_stok}",
+                                size="1",
+                                color=rx.cond(TableState.form_stok > 0, rx.color("gray", 11), rx.color("red", 11)),
+                            ),
+                        ),
                         rx.button(
                             rx.icon("plus", size=16),
                             "Add New Product",
@@ -119,6 +217,13 @@ def add_data_modal() -> rx.Component:
                                         on_change=TableState.set_form_new_product_price,
                                         size="2",
                                     ),
+                                    rx.input(
+                                        placeholder="Initial Stock",
+                                        type="number",
+                                        value=TableState.form_new_product_stock,
+                                        on_change=TableState.set_form_new_product_stock,
+                                        size="2",
+                                    ),
                                     width="100%",
                                     spacing="2",
                                 ),
@@ -195,7 +300,15 @@ def add_data_modal() -> rx.Component:
                             value=TableState.form_tanggal_penjualan,
                             on_change=TableState.set_form_tanggal_penjualan,
                             size="2",
-                            width="50%",
+                            width="30%",
+                        ),
+                        rx.input(
+                            placeholder="Time",
+                            type="time",
+                            value=TableState.form_waktu_penjualan,
+                            on_change=TableState.set_form_waktu_penjualan,
+                            size="2",
+                            width="20%",
                         ),
                         width="100%",
                         spacing="3",
@@ -240,6 +353,30 @@ def add_data_modal() -> rx.Component:
                         width="100%",
                         spacing="3",
                     ),
+                    # Bahan Baku purchases restock a product
+                    rx.cond(
+                        TableState.is_bahan_baku,
+                        rx.hstack(
+                            rx.select(
+                                TableState.product_options,
+                                placeholder="Restocked Product",
+                                value=TableState.form_produk_belanja,
+                                on_change=TableState.set_form_produk_belanja,
+                                size="2",
+                                width="50%",
+                            ),
+                            rx.input(
+                                placeholder="Quantity",
+                                type="number",
+                                value=TableState.form_kuantitas_belanja,
+                                on_change=TableState.set_form_kuantitas_belanja,
+                                size="2",
+                                width="50%",
+                            ),
+                            width="100%",
+                            spacing="3",
+                        ),
+                    ),
                     rx.hstack(
                         rx.select(
                             ["Cash", "Credit", "Debit", "Transfer", "Other"],
@@ -260,17 +397,7 @@ def add_data_modal() -> rx.Component:
                         width="100%",
                         spacing="3",
                     ),
-                    rx.hstack(
-                        rx.input(
-                            placeholder="Receipt/Proof",
-                            value=TableState.form_bukti_transaksi,
-                            on_change=TableState.set_form_bukti_transaksi,
-                            size="2",
-                            width="100%",
-                        ),
-                        width="100%",
-                        spacing="3",
-                    ),
+                    _receipt_field(),
                     rx.text_area(
                         placeholder="Notes (optional)",
                         value=TableState.form_catatan_belanja,
@@ -309,6 +436,97 @@ def add_data_modal() -> rx.Component:
     )
 
 
+def export_dialog() -> rx.Component:
+    """Dialog for downloading the selected ledger as CSV, Parquet or XLSX."""
+    return rx.dialog.root(
+        rx.dialog.trigger(
+            rx.button(
+                rx.icon("arrow-down-to-line", size=20),
+                "Export",
+                size="3",
+                variant="surface",
+            ),
+        ),
+        rx.dialog.content(
+            rx.dialog.title(
+                rx.cond(
+                    TableState.selected_tab == "penjualan",
+                    "Export Penjualan",
+                    "Export Belanja"
+                )
+            ),
+            rx.dialog.description(
+                "Leave the dates empty to export the whole ledger.",
+            ),
+            rx.vstack(
+                rx.hstack(
+                    rx.input(
+                        placeholder="From (YYYY-MM-DD)",
+                        type="date",
+                        value=TableState.export_start,
+                        on_change=TableState.set_export_start,
+                        size="2",
+                        width="50%",
+                    ),
+                    rx.input(
+                        placeholder="To (YYYY-MM-DD)",
+                        type="date",
+                        value=TableState.export_end,
+                        on_change=TableState.set_export_end,
+                        size="2",
+                        width="50%",
+                    ),
+                    width="100%",
+                    spacing="3",
+                ),
+                rx.hstack(
+                    rx.select(
+                        TableState.export_filter_options,
+                        value=TableState.export_filter,
+                        on_change=TableState.set_export_filter,
+                        size="2",
+                        width="50%",
+                    ),
+                    rx.select(
+                        ["csv", "parquet", "xlsx"],
+                        value=TableState.export_format,
+                        on_change=TableState.set_export_format,
+                        size="2",
+                        width="50%",
+                    ),
+                    width="100%",
+                    spacing="3",
+                ),
+                spacing="4",
+                width="100%",
+                margin_top="16px",
+            ),
+            rx.flex(
+                rx.dialog.close(
+                    rx.button(
+                        "Cancel",
+                        variant="soft",
+                        color_scheme="gray",
+                    ),
+                ),
+                rx.dialog.close(
+                    rx.button(
+                        rx.icon("download", size=16),
+                        "Download",
+                        variant="solid",
+                        color_scheme="blue",
+                        on_click=rx.download(url=TableState.export_url),
+                    ),
+                ),
+                spacing="3",
+                margin_top="16px",
+                justify="end",
+            ),
+            style={"max_width": "450px"},
+        ),
+    )
+
+
 def _header_cell_penjualan(text: str, icon: str) -> rx.Component:
     """Header cell for Penjualan table."""
     return rx.table.column_header_cell(
@@ -426,7 +644,7 @@ def _pagination_view() -> rx.Component:
         )
 
 
-def _show_penjualan_item(item: Penjualan, index: int) -> rx.Component:
+def _show_penjualan_item(item: Penjualan, index: int, fixed_height: bool = False) -> rx.Component:
     """Display a penjualan item row."""
     bg_color = rx.cond(
         index % 2 == 0,
@@ -441,16 +659,16 @@ def _show_penjualan_item(item: Penjualan, index: int) -> rx.Component:
     return rx.table.row(
         rx.table.row_header_cell(item.nama_produk),
         rx.table.cell(item.kuantitas),  # Display quantity directly
-        rx.table.cell(f"Rp {item.harga_saat_penjualan:,.0f}"),  # Indonesian currency format
-        rx.table.cell(f"Rp {item.total:,.0f}"),  # Indonesian currency format
+        rx.table.cell(format_rupiah(item.harga_saat_penjualan)),
+        rx.table.cell(format_rupiah(item.total)),
         rx.table.cell(item.tanggal_penjualan),
-        rx.table.cell(item.catatan),
-        style={"_hover": {"bg": hover_color}, "bg": bg_color},
+        rx.table.cell(rx.cond(item.sorotan != "", rx.html(item.sorotan), item.catatan)),
+        style={"_hover": {"bg": hover_color}, "bg": bg_color, **(_VIRTUAL_ROW_STYLE if fixed_height else {})},
         align="center",
     )
 
 
-def _show_belanja_item(item: Belanja, index: int) -> rx.Component:
+def _show_belanja_item(item: Belanja, index: int, fixed_height: bool = False) -> rx.Component:
     """Display a belanja item row."""
     bg_color = rx.cond(
         index % 2 == 0,
@@ -463,72 +681,129 @@ def _show_belanja_item(item: Belanja, index: int) -> rx.Component:
         rx.color("accent", 3),
     )
     return rx.table.row(
-        rx.table.row_header_cell(item.deskripsi),
+        rx.table.row_header_cell(rx.cond(item.sorotan != "", rx.html(item.sorotan), item.deskripsi)),
         rx.table.cell(item.nama_kategori),  # Show category name instead of ID
-        rx.table.cell(f"Rp {item.total:,.0f}"),  # Indonesian currency format
+        rx.table.cell(format_rupiah(item.total)),
         rx.table.cell(item.metode_pembayaran),
         rx.table.cell(item.tanggal_pengeluaran),
-        rx.table.cell(item.bukti_transaksi),
-        style={"_hover": {"bg": hover_color}, "bg": bg_color},
+        rx.table.cell(_receipt_cell(item)),
+        style={"_hover": {"bg": hover_color}, "bg": bg_color, **(_VIRTUAL_ROW_STYLE if fixed_height else {})},
         align="center",
     )
 
 
-def penjualan_table() -> rx.Component:
-    """Penjualan table with database data."""
+def _penjualan_header() -> rx.Component:
+    return rx.table.header(
+        rx.table.row(
+            _header_cell_penjualan("Produk", "package"),
+            _header_cell_penjualan("Kuantitas", "hash"),
+            _header_cell_penjualan("Harga", "dollar-sign"),
+            _header_cell_penjualan("Total", "calculator"),
+            _header_cell_penjualan("Tanggal", "calendar"),
+            _header_cell_penjualan("Catatan", "notebook-pen"),
+        ),
+    )
+
+
+def _belanja_header() -> rx.Component:
+    return rx.table.header(
+        rx.table.row(
+            _header_cell_belanja("Deskripsi", "shopping-cart"),
+            _header_cell_belanja("Kategori", "tag"),
+            _header_cell_belanja("Total", "dollar-sign"),
+            _header_cell_belanja("Pembayaran", "credit-card"),
+            _header_cell_belanja("Tanggal", "calendar"),
+            _header_cell_belanja("Bukti", "receipt"),
+        ),
+    )
+
+
+def _virtual_table(header: rx.Component, rows, show_item) -> rx.Component:
+    """Table that renders only the loaded window of rows.
+
+    Spacer rows above and below the window keep the scrollbar the size of
+    the whole table; scrolling asks the server for a new window when the
+    viewport nears the edge of the loaded one. The position is sent while
+    scrolling and once more when it stops, so the final one always loads.
+    """
     return rx.box(
-        rx.table.root(
-            rx.table.header(
-                rx.table.row(
-                    _header_cell_penjualan("Produk", "package"),
-                    _header_cell_penjualan("Kuantitas", "hash"),
-                    _header_cell_penjualan("Harga", "dollar-sign"),
-                    _header_cell_penjualan("Total", "calculator"),
-                    _header_cell_penjualan("Tanggal", "calendar"),
-                    _header_cell_penjualan("Catatan", "notebook-pen"),
+        scroll_box(
+            rx.table.root(
+                header,
+                rx.table.body(
+                    rx.table.row(height=TableState.virtual_top_padding),
+                    rx.foreach(
+                        rows,
+                        lambda item, index: show_item(item, TableState.window_start + index, fixed_height=True),
+                    ),
+                    rx.table.row(height=TableState.virtual_bottom_padding),
                 ),
+                variant="surface",
+                size="3",
+                width="100%",
             ),
-            rx.table.body(
-                rx.foreach(
-                    TableState.get_penjualan_page,
-                    lambda item, index: _show_penjualan_item(item, index),
-                )
-            ),
-            variant="surface",
-            size="3",
+            on_scroll=TableState.on_table_scroll.throttle(SCROLL_THROTTLE_MS),
+            on_scroll_capture=TableState.on_table_scroll.debounce(SCROLL_SETTLE_MS),
+            height=f"{VIRTUAL_ROW_HEIGHT * (VIRTUAL_VIEWPORT_ROWS + 1)}px",
+            overflow_y="auto",
             width="100%",
         ),
-        _pagination_view(),
+        rx.text(
+            TableState.window_total,
+            " rows",
+            size="2",
+            color=rx.color("gray", 10),
+            margin_top="1em",
+        ),
         width="100%",
     )
 
 
+def penjualan_table() -> rx.Component:
+    """Penjualan table with database data."""
+    return rx.cond(
+        TableState.virtual_mode,
+        _virtual_table(_penjualan_header(), TableState.penjualan_window, _show_penjualan_item),
+        rx.box(
+            rx.table.root(
+                _penjualan_header(),
+                rx.table.body(
+                    rx.foreach(
+                        TableState.get_penjualan_page,
+                        lambda item, index: _show_penjualan_item(item, index),
+                    )
+                ),
+                variant="surface",
+                size="3",
+                width="100%",
+            ),
+            _pagination_view(),
+            width="100%",
+        ),
+    )
+
+
 def belanja_table() -> rx.Component:
     """Belanja table with database data."""
-    return rx.box(
-        rx.table.root(
-            rx.table.header(
-                rx.table.row(
-                    _header_cell_belanja("Deskripsi", "shopping-cart"),
-                    _header_cell_belanja("Kategori", "tag"),
-                    _header_cell_belanja("Total", "dollar-sign"),
-                    _header_cell_belanja("Pembayaran", "credit-card"),
-                    _header_cell_belanja("Tanggal", "calendar"),
-                    _header_cell_belanja("Bukti", "receipt"),
+    return rx.cond(
+        TableState.virtual_mode,
+        _virtual_table(_belanja_header(), TableState.belanja_window, _show_belanja_item),
+        rx.box(
+            rx.table.root(
+                _belanja_header(),
+                rx.table.body(
+                    rx.foreach(
+                        TableState.get_belanja_page,
+                        lambda item, index: _show_belanja_item(item, index),
+                    )
                 ),
+                variant="surface",
+                size="3",
+                width="100%",
             ),
-            rx.table.body(
-                rx.foreach(
-                    TableState.get_belanja_page,
-                    lambda item, index: _show_belanja_item(item, index),
-                )
-            ),
-            variant="surface",
-            size="3",
+            _pagination_view(),
             width="100%",
         ),
-        _pagination_view(),
-        width="100%",
     )
 
 
@@ -544,7 +819,47 @@ def main_table_with_tabs() -> rx.Component:
                 on_change=TableState.set_selected_tab,
                 size="3",
             ),
-            add_data_modal(),
+            rx.hstack(
+                rx.debounce_input(
+                    rx.input(
+                        rx.input.slot(rx.icon("search")),
+                        rx.input.slot(
+                            rx.cond(TableState.searching, rx.spinner(size="2")),
+                            justify="end",
+                        ),
+                        value=TableState.search_query,
+                        placeholder="Search...",
+                        size="3",
+                        max_width=["150px", "150px", "200px", "250px"],
+                        width="100%",
+                        variant="surface",
+                        color_scheme="gray",
+                        on_change=TableState.set_search_query,
+                    ),
+                    debounce_timeout=SEARCH_DEBOUNCE_MS,
+                ),
+                rx.cond(
+                    TableState.offline_backlog > 0,
+                    rx.tooltip(
+                        rx.badge(
+                            rx.icon("cloud-off", size=14),
+                            TableState.offline_backlog,
+                            color_scheme="orange",
+                            size="2",
+                        ),
+                        content="Sales saved offline, waiting for the database",
+                    ),
+                ),
+                rx.text("Virtual scroll", size="2"),
+                rx.switch(
+                    checked=TableState.virtual_mode,
+                    on_change=TableState.set_virtual_mode,
+                ),
+                export_dialog(),
+                add_data_modal(),
+                align="center",
+                spacing="3",
+            ),
             justify="between",
             align="center",
             width="100%",
@@ -594,23 +909,26 @@ def main_table() -> rx.Component:
                     size="3",
                     on_change=TableState.set_sort_value,
                 ),
-                rx.input(
-                    rx.input.slot(rx.icon("search")),
-                    rx.input.slot(
-                        rx.icon("x"),
-                        justify="end",
-                        cursor="pointer",
-                        on_click=TableState.setvar("search_value", ""),
-                        display=rx.cond(TableState.search_value, "flex", "none"),
+                rx.debounce_input(
+                    rx.input(
+                        rx.input.slot(rx.icon("search")),
+                        rx.input.slot(
+                            rx.icon("x"),
+                            justify="end",
+                            cursor="pointer",
+                            on_click=TableState.setvar("search_value", ""),
+                            display=rx.cond(TableState.search_value, "flex", "none"),
+                        ),
+                        value=TableState.search_value,
+                        placeholder="Search here...",
+                        size="3",
+                        max_width=["150px", "150px", "200px", "250px"],
+                        width="100%",
+                        variant="surface",
+                        color_scheme="gray",
+                        on_change=TableState.set_search_value,
                     ),
-                    value=TableState.search_value,
-                    placeholder="Search here...",
-                    size="3",
-                    max_width=["150px", "150px", "200px", "250px"],
-                    width="100%",
-                    variant="surface",
-                    color_scheme="gray",
-                    on_change=TableState.set_search_value,
+                    debounce_timeout=SEARCH_DEBOUNCE_MS,
                 ),
                 align="center",
                 justify="end",